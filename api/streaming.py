@@ -0,0 +1,75 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 1000
+
+
+def stream_json(fields, list_key, items, chunk_size = STREAM_CHUNK_SIZE):
+    """
+    Serialises a JSON object incrementally, so that a response can be streamed without materialising items.
+    The object contains fields and, last, list_key holding every element of items
+
+    :param fields: [Dict] JSON-serialisable fields of the object
+    :param list_key: [String] key of the streamed list
+    :param items: Iterator of JSON-serialisable elements
+    :param chunk_size: elements serialised per yielded chunk
+    :return: Iterator[String]
+    """
+    head = json.dumps(dict(fields, **{list_key: []}))
+
+    # fields are emitted first, then the list is left open for the streamed elements
+    yield head[:head.rindex('[') + 1]
+
+    chunk = []
+    first = True
+
+    try:
+        for item in items:
+            chunk.append(json.dumps(item))
+
+            if len(chunk) == chunk_size:
+                yield ('' if first else ',') + ','.join(chunk)
+
+                first = False
+                chunk = []
+
+        if chunk:
+            yield ('' if first else ',') + ','.join(chunk)
+    except Exception as error:
+        # headers are already sent, the truncated body is the only signal left to the client
+        logger.error(f'Failed while streaming {list_key}, error: {error}')
+        raise
+
+    yield ']}'
+
+
+class RecordError(ValueError):
+    """
+    Raised when a line of an NDJSON stream is not a JSON record
+    """
+
+    def __init__(self, line_number, error):
+        super().__init__(f'Line {line_number}: {error}')
+
+        self.line_number = line_number
+
+
+def parse_ndjson(lines):
+    """
+    Parses newline-delimited JSON incrementally, one record per line. Blank lines are skipped
+
+    :param lines: Iterator[bytes], e.g. a request read line by line
+    :return: Iterator of the parsed records
+    """
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+
+        if not line:
+            continue
+
+        try:
+            yield json.loads(line.decode('utf-8'))
+        except ValueError as error:
+            raise RecordError(line_number, error)
@@ -1,3 +1,35 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from api.streaming import RecordError, parse_ndjson
+
+
+class ParseNdjsonTest(SimpleTestCase):
+    def test_parses_one_record_per_line(self):
+        lines = [b'{"source_vertex_id": "a", "target_vertex_id": "b", "weight": 0.5}\n', b'\n',
+                 b'  {"source_vertex_id": "b", "target_vertex_id": "\xc3\xa9", "weight": null}\r\n']
+
+        self.assertEqual(list(parse_ndjson(lines)), [
+            {'source_vertex_id': 'a', 'target_vertex_id': 'b', 'weight': 0.5},
+            {'source_vertex_id': 'b', 'target_vertex_id': 'é', 'weight': None},
+        ])
+
+    def test_malformed_line(self):
+        records = parse_ndjson([b'{"weight": 0.5}\n', b'\n', b'{"weight": \n', b'{"weight": 0.7}\n'])
+
+        self.assertEqual(next(records), {'weight': 0.5})
+
+        # line numbers count blank lines, so that they point into the uploaded body
+        with self.assertRaisesRegex(RecordError, '^Line 3: ') as context:
+            next(records)
+
+        self.assertEqual(context.exception.line_number, 3)
+
+    def test_invalid_utf8(self):
+        with self.assertRaises(RecordError) as context:
+            list(parse_ndjson([b'{"weight": "\xff"}\n']))
+
+        self.assertEqual(context.exception.line_number, 1)
+
+    def test_record_error_is_value_error(self):
+        # views report ValueErrors raised while ingesting as payload errors
+        self.assertTrue(issubclass(RecordError, ValueError))
@@ -1,8 +1,16 @@
 from restless.views import Endpoint
+import itertools
 import json
-from django.http import HttpResponseBadRequest, HttpResponseServerError
+from django.http import HttpResponseBadRequest, HttpResponseServerError, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from django.views.generic import View
 
+from api.streaming import parse_ndjson, stream_json
 from temporal_graph_engine.temporal_graph_engine import TemporalGraphEngine
+from temporal_graph_engine.analytics import ANALYSES
+from temporal_graph_engine.version_index import unix_timestamp
+from temporal_graph.instrumentation import metrics
 
 import logging
 
@@ -22,6 +30,15 @@ class GraphConstructionView(Endpoint):
 
             commit            = body['commit']
 
+            # optional: number of edges written per backend statement
+            batch_size        = int(body['batch_size']) if body.get('batch_size') else None
+
+            # optional: construct the version as a delta of a committed version
+            parent_version_id = int(body['parent_version_id']) if body.get('parent_version_id') else None
+
+            # optional: number of partitions of the payload written in parallel
+            shards            = int(body['shards']) if body.get('shards') else None
+
         except:
             err_msg = f'Error parsing body of the message: {body}. ' \
                       f'Ensure fields and format of body is correct. See docs.'
@@ -32,7 +49,8 @@ class GraphConstructionView(Endpoint):
         try:
             tge = TemporalGraphEngine()
 
-            success = tge.construct_graph(temporal_graph_id, weight_id, version_id, graph_elements, commit)
+            success = tge.construct_graph(temporal_graph_id, weight_id, version_id, graph_elements, commit,
+                                          batch_size, parent_version_id, shards)
         except:
             err_msg = f'Payload error. Ensure payload format is correct: {graph_elements}'
 
@@ -43,6 +61,159 @@ class GraphConstructionView(Endpoint):
         return { 'success': success, 'temporal_graph_id': weight_id, 'version_id': version_id }
 
 
+class ConstructionJobView(Endpoint):
+    """
+    Queues the construction of a graph version for the construction workers (see run_construction_workers),
+    with the body of GraphConstructionView. Large payloads are written in parallel batches after the response
+    """
+    def post(self, request, temporal_graph_id, weight_id):
+
+        try:
+            decoded_body_unicode = request.body.decode('utf-8')
+            body = json.loads(decoded_body_unicode)
+
+            version_id        = int(body['version_id'])
+
+            # payload contains graph elements to update
+            graph_elements    = body['payload']
+
+            commit            = body['commit']
+
+            # optional: number of edges written per backend statement
+            batch_size        = int(body['batch_size']) if body.get('batch_size') else None
+
+            # optional: construct the version as a delta of a committed version
+            parent_version_id = int(body['parent_version_id']) if body.get('parent_version_id') else None
+
+            # optional: number of edges per batch claimed by a worker
+            job_batch_size    = int(body['job_batch_size']) if body.get('job_batch_size') else None
+
+        except:
+            err_msg = f'Error parsing body of the message: {request.body}. ' \
+                      f'Ensure fields and format of body is correct. See docs.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+
+        try:
+            tge = TemporalGraphEngine()
+
+            job = tge.enqueue_construction_job(temporal_graph_id, weight_id, version_id, graph_elements, commit,
+                                               batch_size, parent_version_id, job_batch_size)
+        except (ValueError, KeyError, TypeError) as e:
+            err_msg = f'Payload error: {e}. Ensure payload format is correct.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+        except:
+            err_msg = f'Application error while queueing construction job for request {request}.'
+
+            logger.error(err_msg)
+            return HttpResponseServerError(err_msg)
+
+        return { 'success': job is not None, 'job_id': job.pk if job else None,
+                 'temporal_graph_id': temporal_graph_id, 'weight_id': weight_id, 'version_id': version_id,
+                 'num_batches': job.num_batches if job else 0 }
+
+
+class ConstructionJobStatusView(Endpoint):
+    def get(self, request, job_id):
+        try:
+            tge = TemporalGraphEngine()
+
+            status = tge.get_construction_job_status(int(job_id))
+        except:
+            err_msg = f'Application error while getting construction job status for request {request}.'
+
+            logger.error(err_msg)
+            return HttpResponseServerError(err_msg)
+
+        return status or { 'job_id': int(job_id), 'status': None }
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class GraphStreamView(View):
+    """
+    Streamed upload of a graph version as NDJSON, one edge record per line:
+        { "source_vertex_id": "vert1", "target_vertex_id": "vert2", "weight": 0.65 }
+
+    A plain View, since restless Endpoints read the whole request body. The body is parsed line by line and
+    written in batches. The response and GET report ingested_records, the resume token: an interrupted upload
+    is resumed by sending the records from that position on, with offset=ingested_records
+    """
+    def get(self, request, temporal_graph_id, weight_id):
+        try:
+            version_id = int(request.GET['version_id'])
+        except:
+            err_msg = f'Error parsing URL params: {request.GET}. version_id must be Int. See docs.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+
+        try:
+            tge = TemporalGraphEngine()
+
+            ingested_records = tge.get_ingestion_progress(temporal_graph_id, weight_id, version_id)
+        except:
+            err_msg = f'Application error while getting ingestion progress for request {request}.'
+
+            logger.error(err_msg)
+            return HttpResponseServerError(err_msg)
+
+        return JsonResponse({ 'temporal_graph_id': temporal_graph_id, 'weight_id': weight_id,
+                              'version_id': version_id, 'ingested_records': ingested_records })
+
+    def post(self, request, temporal_graph_id, weight_id):
+        try:
+            version_id        = int(request.GET['version_id'])
+
+            commit            = request.GET.get('commit', 'false').lower() == 'true'
+
+            # optional: position in the upload of the first record of the body, when resuming
+            offset            = int(request.GET.get('offset', 0))
+
+            # optional: number of edges written per backend statement
+            batch_size        = request.GET.get('batch_size', None)
+            batch_size        = int(batch_size) if batch_size else None
+
+            # optional: construct the version as a delta of a committed version
+            parent_version_id = request.GET.get('parent_version_id', None)
+            parent_version_id = int(parent_version_id) if parent_version_id else None
+
+            # optional: number of partitions of each batch written in parallel
+            shards            = request.GET.get('shards', None)
+            shards            = int(shards) if shards else None
+        except:
+            err_msg = f'Error parsing URL params: {request.GET}. version_id, offset, batch_size, ' \
+                      f'parent_version_id and shards must be Int. See docs.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+
+        tge = TemporalGraphEngine()
+
+        try:
+            success, ingested_records = tge.ingest_graph(temporal_graph_id, weight_id, version_id,
+                                                         parse_ndjson(request), offset, commit, batch_size,
+                                                         parent_version_id, shards)
+        except (ValueError, KeyError, TypeError) as e:
+            ingested_records = tge.get_ingestion_progress(temporal_graph_id, weight_id, version_id)
+
+            err_msg = f'Payload error: {e}. Ensure every line is an edge record. ' \
+                      f'Resume from record {ingested_records}'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+        except:
+            err_msg = f'Application error while ingesting graph for request {request}.'
+
+            logger.error(err_msg)
+            return HttpResponseServerError(err_msg)
+
+        return JsonResponse({ 'success': success, 'temporal_graph_id': temporal_graph_id, 'weight_id': weight_id,
+                              'version_id': version_id, 'ingested_records': ingested_records })
+
+
 class WeightView(Endpoint):
     def get(self, request, temporal_graph_id, weight_id, source_vertex_id, target_vertex_id):
 
@@ -64,8 +235,6 @@ class WeightView(Endpoint):
             weight = tge.get_edge_weight(temporal_graph_id, weight_id,
                                          source_vertex_id, target_vertex_id,
                                          version_id, timestamp)
-
-            weight = float(weight) if weight else None
         except:
             err_msg = f'Application error while getting edge weight for request {request}.'
 
@@ -76,6 +245,122 @@ class WeightView(Endpoint):
                 'target_vertex_id': target_vertex_id, 'timestamp': timestamp, 'version_id': version_id, 'weight': weight }
 
 
+class BulkWeightView(Endpoint):
+    def post(self, request, temporal_graph_id, weight_id):
+        try:
+            decoded_body_unicode = request.body.decode('utf-8')
+            body = json.loads(decoded_body_unicode)
+
+            timestamp  = body.get('timestamp', None)
+            timestamp  = int(timestamp) if timestamp else None
+
+            version_id = body.get('version_id', None)
+            version_id = int(version_id) if version_id else None
+
+            # edges: List[{"source_vertex_id": "vert1", "target_vertex_id": "vert2"}]
+            edge_pairs = [(edge['source_vertex_id'], edge['target_vertex_id']) for edge in body['edges']]
+        except:
+            err_msg = f'Error parsing body of the message: {request.body}. ' \
+                      f'Ensure fields and format of body is correct. See docs.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+
+        try:
+            tge = TemporalGraphEngine()
+
+            weights = tge.get_edge_weights(temporal_graph_id, weight_id, edge_pairs, version_id, timestamp)
+
+            weights = weights if weights is not None else [None] * len(edge_pairs)
+        except:
+            err_msg = f'Application error while getting edge weights for request {request}.'
+
+            logger.error(err_msg)
+            return HttpResponseServerError(err_msg)
+
+        return { 'temporal_graph_id': temporal_graph_id, 'weight_id': weight_id,
+                 'timestamp': timestamp, 'version_id': version_id,
+                 'weights': [{ 'source_vertex_id': source_vertex_id, 'target_vertex_id': target_vertex_id,
+                               'weight': weight }
+                             for (source_vertex_id, target_vertex_id), weight in zip(edge_pairs, weights)] }
+
+
+class MultiWeightView(Endpoint):
+    def get(self, request, temporal_graph_id, source_vertex_id, target_vertex_id):
+        try:
+            timestamp  = request.GET.get('timestamp', None)
+            timestamp  = int(timestamp) if timestamp else None
+
+            version_id = request.GET.get('version_id', None)
+            version_id = int(version_id) if version_id else None
+
+            # optional: comma separated weights to read, every weight of the edge if absent
+            weight_ids = request.GET.get('weight_ids', None)
+            weight_ids = weight_ids.split(',') if weight_ids else None
+        except:
+            err_msg = f'Error parsing URL params: {request.GET}. timestamp and version must be Int. See docs.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+
+        try:
+            tge = TemporalGraphEngine()
+
+            weights = tge.get_edge_weight_maps(temporal_graph_id, [(source_vertex_id, target_vertex_id)], weight_ids,
+                                               version_id, timestamp)
+        except:
+            err_msg = f'Application error while getting edge weights for request {request}.'
+
+            logger.error(err_msg)
+            return HttpResponseServerError(err_msg)
+
+        return { 'temporal_graph_id': temporal_graph_id, 'source_vertex_id': source_vertex_id,
+                 'target_vertex_id': target_vertex_id, 'timestamp': timestamp, 'version_id': version_id,
+                 'weights': weights[0] if weights else None }
+
+    def post(self, request, temporal_graph_id):
+        try:
+            decoded_body_unicode = request.body.decode('utf-8')
+            body = json.loads(decoded_body_unicode)
+
+            timestamp  = body.get('timestamp', None)
+            timestamp  = int(timestamp) if timestamp else None
+
+            version_id = body.get('version_id', None)
+            version_id = int(version_id) if version_id else None
+
+            # optional: weights to read, every weight of the edges if absent
+            weight_ids = body.get('weight_ids', None)
+            weight_ids = [str(weight_id) for weight_id in weight_ids] if weight_ids else None
+
+            # edges: List[{"source_vertex_id": "vert1", "target_vertex_id": "vert2"}]
+            edge_pairs = [(edge['source_vertex_id'], edge['target_vertex_id']) for edge in body['edges']]
+        except:
+            err_msg = f'Error parsing body of the message: {request.body}. ' \
+                      f'Ensure fields and format of body is correct. See docs.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+
+        try:
+            tge = TemporalGraphEngine()
+
+            weights = tge.get_edge_weight_maps(temporal_graph_id, edge_pairs, weight_ids, version_id, timestamp)
+
+            weights = weights if weights is not None else [None] * len(edge_pairs)
+        except:
+            err_msg = f'Application error while getting edge weights for request {request}.'
+
+            logger.error(err_msg)
+            return HttpResponseServerError(err_msg)
+
+        return { 'temporal_graph_id': temporal_graph_id, 'timestamp': timestamp, 'version_id': version_id,
+                 'weight_ids': weight_ids,
+                 'edges': [{ 'source_vertex_id': source_vertex_id, 'target_vertex_id': target_vertex_id,
+                             'weights': edge_weights }
+                           for (source_vertex_id, target_vertex_id), edge_weights in zip(edge_pairs, weights)] }
+
+
 class UserWeightView(Endpoint):
     def get(self, request, temporal_graph_id, weight_id, source_vertex_id, target_vertex_id):
         try:
@@ -100,7 +385,6 @@ class UserWeightView(Endpoint):
             weight = tge.get_user_edge_weight(temporal_graph_id, weight_id,
                                               source_vertex_id, target_vertex_id,
                                               user_id, version_id, timestamp)
-            weight = float(weight) if weight else None
 
         except:
             err_msg = f'Application error while getting user edge weight for request {request}.'
@@ -121,6 +405,9 @@ class UserWeightView(Endpoint):
 
             # payload contains graph elements to update
             graph_elements    = body['payload']
+
+            # bulk mode reports success per user-edge instead of failing the request
+            bulk              = bool(body.get('bulk', False))
         except:
             err_msg = f'Error parsing body of the message: {body}. ' \
                       f'Ensure fields and format of body is correct. See docs.'
@@ -130,6 +417,19 @@ class UserWeightView(Endpoint):
 
         try:
             tge = TemporalGraphEngine()
+
+            if bulk:
+                results = tge.set_user_edge_weights(temporal_graph_id, weight_id, graph_elements)
+
+                if results is None:
+                    err_msg = f'Failed to write user-edge weights. ' \
+                              f'Ensure committed temporal graph with id: {temporal_graph_id} exists.'
+
+                    logger.error(err_msg)
+                    return HttpResponseBadRequest(err_msg)
+
+                return { 'temporal_graph_id': temporal_graph_id, 'success': all(results), 'results': results }
+
             success = tge.set_user_edge_weight(temporal_graph_id, weight_id, graph_elements)
 
             if not success:
@@ -148,9 +448,280 @@ class UserWeightView(Endpoint):
 
 
 
-class AdjacencyView(Endpoint):
+class UserNeighboursView(Endpoint):
+    def get(self, request, temporal_graph_id, weight_id, source_vertex_id):
+        try:
+            timestamp  = request.GET.get('timestamp', None)
+            timestamp  = int(timestamp) if timestamp else None
+
+            version_id = request.GET.get('version_id', None)
+            version_id = int(version_id) if version_id else None
+
+            user_id    = int(request.GET['user_id'])
+
+            k          = int(request.GET.get('k', 10))
+        except:
+            err_msg = f'Error parsing URL params: {request.GET}. user_id is required, timestamp, version_id, ' \
+                      f'user_id and k must be Int. See docs.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+
+        try:
+            tge = TemporalGraphEngine()
+
+            neighbours = tge.get_user_top_neighbours(temporal_graph_id, weight_id, source_vertex_id, user_id, k,
+                                                     version_id, timestamp) or []
+        except:
+            err_msg = f'Application error while getting user neighbours for request {request}.'
+
+            logger.error(err_msg)
+            return HttpResponseServerError(err_msg)
+
+        return { 'temporal_graph_id': temporal_graph_id, 'weight_id': weight_id,
+                 'source_vertex_id': source_vertex_id, 'timestamp': timestamp, 'version_id': version_id,
+                 'user_id': user_id, 'k': k,
+                 'neighbours': [{ 'target_vertex_id': target_vertex_id, 'weight': weight,
+                                  'user_weight': is_user_weight }
+                                for target_vertex_id, weight, is_user_weight in neighbours] }
+
+
+class AdjacencyView(View):
+    """
+    Streams the response, hence a plain View: restless Endpoints buffer the whole JSON response
+    """
     def get(self, request, temporal_graph_id, weight_id, source_vertex_id):
-        # TODO: unimplemented
+        try:
+            timestamp  = request.GET.get('timestamp', None)
+            timestamp = int(timestamp) if timestamp else None
+
+            version_id = request.GET.get('version_id', None)
+            version_id = int(version_id) if version_id else None
+
+            page_size  = request.GET.get('page_size', None)
+            page_size  = int(page_size) if page_size else None
+        except:
+            err_msg = f'Error parsing URL params: {request.GET}. timestamp, version_id and page_size must be Int. ' \
+                      f'See docs.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+
+        try:
+            tge = TemporalGraphEngine()
+
+            adjacent_edges = tge.get_adjacent_edges(temporal_graph_id, weight_id, source_vertex_id,
+                                                    version_id, timestamp, page_size) or iter([])
+
+            # fetch the first page before responding, so that backend errors are still reported as such
+            first_edges    = list(itertools.islice(adjacent_edges, 1))
+        except:
+            err_msg = f'Application error while getting adjacent edges for request {request}.'
+
+            logger.error(err_msg)
+            return HttpResponseServerError(err_msg)
+
+        neighbours = ({ 'target_vertex_id': target_vertex_id, 'weight': weight }
+                      for target_vertex_id, weight in itertools.chain(first_edges, adjacent_edges))
+
+        fields = { 'temporal_graph_id': temporal_graph_id, 'weight_id': weight_id,
+                   'source_vertex_id': source_vertex_id, 'timestamp': timestamp, 'version_id': version_id }
+
+        return StreamingHttpResponse(stream_json(fields, 'neighbours', neighbours), content_type='application/json')
+
+
+class WeightHistoryView(View):
+    """
+    Streams the response, hence a plain View: restless Endpoints buffer the whole JSON response
+    """
+    def get(self, request, temporal_graph_id, weight_id, source_vertex_id, target_vertex_id):
+        try:
+            # optional: version and timestamp bounds, included
+            bounds = {}
+
+            for param in ('from_version_id', 'to_version_id', 'from_timestamp', 'to_timestamp'):
+                bounds[param] = int(request.GET[param]) if request.GET.get(param) else None
+
+            user_id = request.GET.get('user_id', None)
+            user_id = int(user_id) if user_id else None
+        except:
+            err_msg = f'Error parsing URL params: {request.GET}. from_version_id, to_version_id, from_timestamp, ' \
+                      f'to_timestamp and user_id must be Int. See docs.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+
+        try:
+            tge = TemporalGraphEngine()
+
+            history = tge.iter_edge_weight_history(temporal_graph_id, weight_id, source_vertex_id,
+                                                   target_vertex_id, user_id, **bounds)
+
+            # read the first batch before responding, so that backend errors are still reported as such
+            first_versions = list(itertools.islice(history, 1))
+        except:
+            err_msg = f'Application error while getting edge weight history for request {request}.'
+
+            logger.error(err_msg)
+            return HttpResponseServerError(err_msg)
+
+        versions = ({ 'version_id': graph_version.version_id,
+                      'committed_at': unix_timestamp(graph_version.committed_at),
+                      'weight': weight, 'user_weight': user_weight }
+                    for graph_version, weight, user_weight in itertools.chain(first_versions, history))
+
+        fields = dict(bounds, temporal_graph_id=temporal_graph_id, weight_id=weight_id,
+                      source_vertex_id=source_vertex_id, target_vertex_id=target_vertex_id, user_id=user_id)
+
+        return StreamingHttpResponse(stream_json(fields, 'history', versions), content_type='application/json')
+
+
+class VersionDiffView(View):
+    """
+    Streams the response, hence a plain View: restless Endpoints buffer the whole JSON response
+    """
+    def get(self, request, temporal_graph_id, weight_id):
+        try:
+            from_version_id = int(request.GET['from_version_id'])
+            to_version_id   = int(request.GET['to_version_id'])
+
+            # optional: weight changes up to threshold are not reported
+            threshold       = float(request.GET.get('threshold', 0.0))
+        except:
+            err_msg = f'Error parsing URL params: {request.GET}. from_version_id and to_version_id are required ' \
+                      f'and must be Int, threshold must be Float. See docs.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+
+        try:
+            tge = TemporalGraphEngine()
+
+            changes = tge.diff_versions(temporal_graph_id, weight_id, from_version_id, to_version_id, threshold)
+
+            # read the first change before responding, so that backend errors are still reported as such
+            first_changes = list(itertools.islice(changes, 1)) if changes is not None else []
+        except ValueError as e:
+            err_msg = f'Invalid version diff: {e}. See docs.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+        except:
+            err_msg = f'Application error while diffing versions for request {request}.'
+
+            logger.error(err_msg)
+            return HttpResponseServerError(err_msg)
+
+        fields = { 'temporal_graph_id': temporal_graph_id, 'weight_id': weight_id,
+                   'from_version_id': from_version_id, 'to_version_id': to_version_id, 'threshold': threshold,
+                   'found': changes is not None }
+
+        if changes is None:
+            return JsonResponse(dict(fields, changes=[]))
+
+        edges = ({ 'change': change, 'source_vertex_id': source_vertex_id, 'target_vertex_id': target_vertex_id,
+                   'from_weight': from_weight, 'to_weight': to_weight }
+                 for change, source_vertex_id, target_vertex_id, from_weight, to_weight
+                 in itertools.chain(first_changes, changes))
+
+        return StreamingHttpResponse(stream_json(fields, 'changes', edges), content_type='application/json')
+
+
+class NeighbourhoodView(Endpoint):
+    def get(self, request, temporal_graph_id, weight_id, source_vertex_id):
+        try:
+            timestamp   = request.GET.get('timestamp', None)
+            timestamp   = int(timestamp) if timestamp else None
+
+            version_id  = request.GET.get('version_id', None)
+            version_id  = int(version_id) if version_id else None
+
+            hops        = int(request.GET.get('hops', 2))
+
+            # optional: number of best scored vertices kept at each hop
+            top_n       = request.GET.get('top_n', None)
+            top_n       = int(top_n) if top_n else None
+
+            aggregation = request.GET.get('aggregation', 'product')
+        except:
+            err_msg = f'Error parsing URL params: {request.GET}. timestamp, version_id, hops and top_n must be Int. ' \
+                      f'See docs.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+
+        try:
+            tge = TemporalGraphEngine()
+
+            neighbourhood = tge.get_neighbourhood(temporal_graph_id, weight_id, source_vertex_id, hops, top_n,
+                                                  aggregation, version_id, timestamp) or []
+        except ValueError as e:
+            err_msg = f'Invalid neighbourhood query: {e}. See docs.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+        except:
+            err_msg = f'Application error while getting neighbourhood for request {request}.'
+
+            logger.error(err_msg)
+            return HttpResponseServerError(err_msg)
+
+        return { 'temporal_graph_id': temporal_graph_id, 'weight_id': weight_id,
+                 'source_vertex_id': source_vertex_id, 'timestamp': timestamp, 'version_id': version_id,
+                 'hops': hops, 'top_n': top_n, 'aggregation': aggregation,
+                 'neighbours': [{ 'vertex_id': vertex_id, 'weight': weight, 'hops': path_hops }
+                                for vertex_id, weight, path_hops in neighbourhood] }
+
+
+class AnalyticsView(Endpoint):
+    def get(self, request, temporal_graph_id, weight_id):
+        try:
+            timestamp  = request.GET.get('timestamp', None)
+            timestamp  = int(timestamp) if timestamp else None
+
+            version_id = request.GET.get('version_id', None)
+            version_id = int(version_id) if version_id else None
+
+            top        = int(request.GET.get('top', 10))
+
+            # optional: comma separated subset of pagerank, degree and weights
+            analyses   = request.GET.get('analyses', None)
+            analyses   = analyses.split(',') if analyses else ANALYSES
+
+            # optional: comma separated vertices whose measures are reported
+            vertex_ids = request.GET.get('vertex_ids', None)
+            vertex_ids = vertex_ids.split(',') if vertex_ids else None
+        except:
+            err_msg = f'Error parsing URL params: {request.GET}. timestamp, version_id and top must be Int. See docs.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+
+        try:
+            tge = TemporalGraphEngine()
+
+            result = tge.get_graph_analytics(temporal_graph_id, weight_id, analyses, top, vertex_ids,
+                                             version_id, timestamp)
+        except ValueError as e:
+            err_msg = f'Invalid analytics query: {e}. See docs.'
+
+            logger.error(err_msg)
+            return HttpResponseBadRequest(err_msg)
+        except:
+            err_msg = f'Application error while getting analytics for request {request}.'
+
+            logger.error(err_msg)
+            return HttpResponseServerError(err_msg)
+
+        return dict({ 'temporal_graph_id': temporal_graph_id, 'weight_id': weight_id, 'timestamp': timestamp,
+                      'version_id': version_id, 'found': result is not None }, **(result or {}))
+
+
+class CacheStatsView(Endpoint):
+    def get(self, request):
+        return TemporalGraphEngine.cache_stats()
 
-        return { 'temporal_graph_id': temporal_graph_id, 'weight_id': weight_id, 'source_vertex_id': source_vertex_id }
 
+class MetricsView(Endpoint):
+    def get(self, request):
+        return { 'stages': metrics.snapshot(), 'caches': TemporalGraphEngine.cache_stats() }
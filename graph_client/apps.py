@@ -1,5 +1,45 @@
+import glob
+import logging
+import os
+
 from django.apps import AppConfig
 
+logger = logging.getLogger(__name__)
+
+# graph snapshots found in this directory are memory-mapped and served from memory on startup
+SNAPSHOT_DIR = os.environ.get('RIPPLE_SNAPSHOT_DIR')
+
 
 class GraphClientConfig(AppConfig):
     name = 'graph_client'
+
+    def ready(self):
+        if SNAPSHOT_DIR:
+            load_snapshot_dir(SNAPSHOT_DIR)
+
+
+def load_snapshot_dir(snapshot_dir):
+    """
+    Loads every snapshot of snapshot_dir into the in-memory graph store, where it serves reads of its version
+
+    :param snapshot_dir: [String]
+    :return: [Int] number of snapshots loaded
+    """
+    from graph_client.memory_graph_client import memory_graph_store
+    from graph_client.snapshot import SnapshotError, load_snapshot
+
+    loaded = 0
+
+    for path in sorted(glob.glob(os.path.join(snapshot_dir, '*.snapshot'))):
+        try:
+            graph_uuid, compact_graph = load_snapshot(path)
+        except (OSError, SnapshotError) as e:
+            logger.error(f'Failed to load snapshot {path}: {e}')
+            continue
+
+        memory_graph_store.load(graph_uuid, compact_graph, materialised=True)
+        loaded += 1
+
+        logger.info(f'Loaded snapshot of {graph_uuid} from {path}')
+
+    return loaded
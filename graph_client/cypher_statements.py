@@ -0,0 +1,196 @@
+"""
+Cypher statements used by NeoGraphClient.
+
+Every statement is parameterised: vertex ids, graph_uuid and property values are passed as $parameters so that
+Neo4j plans each statement shape once and reuses the cached plan. Property keys cannot be parameters in Cypher,
+so each statement is built once per prop_key and the text is cached.
+
+Every read statement returns its result in the `value` column
+"""
+
+import re
+from functools import lru_cache
+
+PROPERTY_KEY_PATTERN = re.compile(r'^\w{1,64}$')
+
+
+def property_key(prop_key):
+    """
+    Validates prop_key before it is inlined into a statement
+
+    :param prop_key: property key
+    :return: [String] prop_key quoted for use in Cypher
+    """
+    if not PROPERTY_KEY_PATTERN.match(prop_key):
+        raise ValueError(f'Invalid property key: {prop_key}')
+
+    return f'`{prop_key}`'
+
+
+@lru_cache(maxsize=None)
+def get_vertex_property(prop_key):
+    return f"""
+      MATCH (sv:Vertex {{vertex_id:$vertex_id,graph_uuid:$graph_uuid}})
+      RETURN sv.{property_key(prop_key)} AS value
+      """
+
+
+@lru_cache(maxsize=None)
+def set_vertex_property(prop_key):
+    return f"""
+      MERGE (sv:Vertex {{vertex_id:$vertex_id,graph_uuid:$graph_uuid}})
+      SET sv.{property_key(prop_key)}=$prop_value
+      """
+
+
+@lru_cache(maxsize=None)
+def get_edge_property(prop_key):
+    return f"""
+      MATCH
+      (sv:Vertex {{vertex_id:$source_vertex_id,graph_uuid:$graph_uuid}})
+      -[e:CONNECTED_TO]->
+      (tv:Vertex {{vertex_id:$target_vertex_id,graph_uuid:$graph_uuid}})
+      RETURN e.{property_key(prop_key)} AS value
+      """
+
+
+@lru_cache(maxsize=None)
+def get_edge_property_of_graphs(prop_key):
+    return f"""
+      UNWIND $graph_uuids AS edge_graph_uuid
+      MATCH
+      (sv:Vertex {{vertex_id:$source_vertex_id,graph_uuid:edge_graph_uuid}})
+      -[e:CONNECTED_TO]->
+      (tv:Vertex {{vertex_id:$target_vertex_id,graph_uuid:edge_graph_uuid}})
+      RETURN edge_graph_uuid AS graph_uuid, e.{property_key(prop_key)} AS value
+      """
+
+
+@lru_cache(maxsize=None)
+def set_edge_property(prop_key):
+    return f"""
+      MERGE (sv:Vertex {{vertex_id:$source_vertex_id,graph_uuid:$graph_uuid}})
+      MERGE (tv:Vertex {{vertex_id:$target_vertex_id,graph_uuid:$graph_uuid}})
+      MERGE (sv)-[e:CONNECTED_TO]->(tv)
+      SET e.{property_key(prop_key)}=$prop_value
+      """
+
+
+@lru_cache(maxsize=None)
+def set_edge_properties(prop_key):
+    return f"""
+      UNWIND $edges AS edge
+      MERGE (sv:Vertex {{vertex_id:edge.source_vertex_id,graph_uuid:$graph_uuid}})
+      MERGE (tv:Vertex {{vertex_id:edge.target_vertex_id,graph_uuid:$graph_uuid}})
+      MERGE (sv)-[e:CONNECTED_TO]->(tv)
+      SET e.{property_key(prop_key)}=edge.prop_value
+      """
+
+
+@lru_cache(maxsize=None)
+def set_edge_properties_of_vertices(prop_key):
+    # vertices were created beforehand (see SET_VERTICES), parallel writers only lock the vertices they connect
+    return f"""
+      UNWIND $edges AS edge
+      MATCH (sv:Vertex {{vertex_id:edge.source_vertex_id,graph_uuid:$graph_uuid}})
+      MATCH (tv:Vertex {{vertex_id:edge.target_vertex_id,graph_uuid:$graph_uuid}})
+      MERGE (sv)-[e:CONNECTED_TO]->(tv)
+      SET e.{property_key(prop_key)}=edge.prop_value
+      """
+
+
+# every property of edge.props is set at once. Keys of the map are validated by the caller, see property_key
+SET_EDGE_PROPERTY_MAPS = """
+  UNWIND $edges AS edge
+  MERGE (sv:Vertex {vertex_id:edge.source_vertex_id,graph_uuid:$graph_uuid})
+  MERGE (tv:Vertex {vertex_id:edge.target_vertex_id,graph_uuid:$graph_uuid})
+  MERGE (sv)-[e:CONNECTED_TO]->(tv)
+  SET e += edge.props
+  """
+
+
+SET_EDGE_PROPERTY_MAPS_OF_VERTICES = """
+  UNWIND $edges AS edge
+  MATCH (sv:Vertex {vertex_id:edge.source_vertex_id,graph_uuid:$graph_uuid})
+  MATCH (tv:Vertex {vertex_id:edge.target_vertex_id,graph_uuid:$graph_uuid})
+  MERGE (sv)-[e:CONNECTED_TO]->(tv)
+  SET e += edge.props
+  """
+
+
+SET_VERTICES = """
+  UNWIND $vertex_ids AS vertex_id
+  MERGE (:Vertex {vertex_id:vertex_id,graph_uuid:$graph_uuid})
+  """
+
+
+@lru_cache(maxsize=None)
+def get_adjacent_edges(prop_key):
+    return f"""
+      MATCH (sv:Vertex {{vertex_id:$source_vertex_id,graph_uuid:$graph_uuid}})-[e:CONNECTED_TO]->(tv:Vertex)
+      WHERE tv.vertex_id > $cursor AND e.{property_key(prop_key)} IS NOT NULL
+      RETURN tv.vertex_id AS target_vertex_id, e.{property_key(prop_key)} AS value
+      ORDER BY tv.vertex_id
+      LIMIT $page_size
+      """
+
+
+@lru_cache(maxsize=None)
+def get_many_adjacent_edges(prop_key):
+    return f"""
+      UNWIND $source_vertex_ids AS source_vertex_id
+      MATCH (sv:Vertex {{vertex_id:source_vertex_id,graph_uuid:$graph_uuid}})-[e:CONNECTED_TO]->(tv:Vertex)
+      WHERE e.{property_key(prop_key)} IS NOT NULL
+      RETURN source_vertex_id, tv.vertex_id AS target_vertex_id, e.{property_key(prop_key)} AS value
+      """
+
+
+@lru_cache(maxsize=None)
+def get_edge_properties(prop_key):
+    return f"""
+      UNWIND $edges AS edge
+      MATCH
+      (sv:Vertex {{vertex_id:edge.source_vertex_id,graph_uuid:$graph_uuid}})
+      -[e:CONNECTED_TO]->
+      (tv:Vertex {{vertex_id:edge.target_vertex_id,graph_uuid:$graph_uuid}})
+      RETURN edge.source_vertex_id AS source_vertex_id, edge.target_vertex_id AS target_vertex_id,
+             e.{property_key(prop_key)} AS value
+      """
+
+
+@lru_cache(maxsize=None)
+def get_edge_property_maps(prop_keys = None):
+    """
+    :param prop_keys: Tuple[String] properties returned, every property if None
+    """
+    if prop_keys is None:
+        value = 'properties(e)'
+    else:
+        value = '{' + ', '.join(f'{property_key(prop_key)}: e.{property_key(prop_key)}' for prop_key in prop_keys) + '}'
+
+    return f"""
+      UNWIND $edges AS edge
+      MATCH
+      (sv:Vertex {{vertex_id:edge.source_vertex_id,graph_uuid:$graph_uuid}})
+      -[e:CONNECTED_TO]->
+      (tv:Vertex {{vertex_id:edge.target_vertex_id,graph_uuid:$graph_uuid}})
+      RETURN edge.source_vertex_id AS source_vertex_id, edge.target_vertex_id AS target_vertex_id,
+             {value} AS value
+      """
+
+
+@lru_cache(maxsize=None)
+def get_edges(prop_key):
+    return f"""
+      MATCH (sv:Vertex {{graph_uuid:$graph_uuid}})-[e:CONNECTED_TO]->(tv:Vertex)
+      WHERE e.{property_key(prop_key)} IS NOT NULL
+      RETURN sv.vertex_id AS source_vertex_id, tv.vertex_id AS target_vertex_id, e.{property_key(prop_key)} AS value
+      ORDER BY sv.vertex_id, tv.vertex_id
+      """
+
+
+GET_EDGE_PROPERTY_KEYS = """
+  MATCH (sv:Vertex {graph_uuid:$graph_uuid})-[e:CONNECTED_TO]->()
+  UNWIND keys(e) AS prop_key
+  RETURN DISTINCT prop_key AS value
+  """
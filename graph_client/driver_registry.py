@@ -0,0 +1,153 @@
+import atexit
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from neo4j.v1 import GraphDatabase
+
+from temporal_graph.instrumentation import timed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SESSIONS        = int(os.environ.get('NEO4J_MAX_SESSIONS', 50))
+DEFAULT_SESSION_ACQUIRE_TIMEOUT = float(os.environ.get('NEO4J_SESSION_ACQUIRE_TIMEOUT', 30))
+
+
+class SessionPoolExhausted(Exception):
+    """
+    Raised when no session could be acquired from a PooledDriver within the acquire timeout
+    """
+    pass
+
+
+class PooledDriver():
+    """
+    A Neo4j driver shared by every GraphClient connecting with the same url and credentials.
+
+    The driver keeps its own pool of Bolt connections; PooledDriver additionally bounds the number of
+    concurrently open sessions so that callers queue for a session rather than open connections without limit
+
+    """
+
+    def __init__(self, driver, max_sessions, acquire_timeout):
+        self.driver          = driver
+        self.acquire_timeout = acquire_timeout
+
+        self._sessions       = threading.BoundedSemaphore(max_sessions)
+
+    @contextmanager
+    def session(self):
+        """
+        Borrow a session from the pool. The session is closed and its slot released on exit
+
+        :return: neo4j Session
+        """
+        with timed('neo4j_session_acquire'):
+            acquired = self._sessions.acquire(timeout=self.acquire_timeout)
+
+        if not acquired:
+            raise SessionPoolExhausted(f'Failed to acquire a Neo4j session within {self.acquire_timeout}s')
+
+        try:
+            session = self.driver.session()
+
+            try:
+                yield session
+            finally:
+                session.close()
+        finally:
+            self._sessions.release()
+
+    def close(self):
+        self.driver.close()
+
+
+class DriverRegistry():
+    """
+    Process-wide registry of PooledDrivers keyed by (url, username, password).
+
+    Drivers are created lazily on first use and shared across requests and threads. The registry is fork aware:
+    a child process (e.g. a gunicorn worker forked from a preloaded master) never reuses the parent's sockets and
+    creates its own drivers instead
+
+    """
+
+    def __init__(self,
+                 driver_factory  = GraphDatabase.driver,
+                 max_sessions    = DEFAULT_MAX_SESSIONS,
+                 acquire_timeout = DEFAULT_SESSION_ACQUIRE_TIMEOUT):
+
+        self.driver_factory  = driver_factory
+        self.max_sessions    = max_sessions
+        self.acquire_timeout = acquire_timeout
+
+        self._lock    = threading.Lock()
+        self._drivers = {}
+        self._pid     = os.getpid()
+
+    def get_driver(self, url, username, password):
+        """
+        Get the shared driver for url and credentials, creating it if it does not exist yet
+
+        :param url: bolt url
+        :param username:
+        :param password:
+        :return: [PooledDriver]
+        """
+        key = (url, username, password)
+
+        self._reset_after_fork()
+
+        pooled_driver = self._drivers.get(key)
+
+        if pooled_driver is None:
+            with self._lock:
+                pooled_driver = self._drivers.get(key)
+
+                if pooled_driver is None:
+                    driver = self.driver_factory(url,
+                                                 auth=(username, password),
+                                                 max_connection_pool_size=self.max_sessions,
+                                                 connection_acquisition_timeout=self.acquire_timeout)
+
+                    pooled_driver = PooledDriver(driver, self.max_sessions, self.acquire_timeout)
+
+                    self._drivers[key] = pooled_driver
+
+        return pooled_driver
+
+    def close_all(self):
+        """
+        Close every driver owned by this process. Safe to call more than once
+
+        :return:
+        """
+        with self._lock:
+            drivers, self._drivers = self._drivers, {}
+
+            if self._pid != os.getpid():
+                # drivers were inherited from the parent process, their sockets are not ours to close
+                self._pid = os.getpid()
+                return
+
+        for pooled_driver in drivers.values():
+            try:
+                pooled_driver.close()
+            except Exception as error:
+                logger.error(f'Failed to close Neo4j driver, error: {error}')
+
+    def _reset_after_fork(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._drivers = {}
+                    self._pid     = os.getpid()
+
+    def __len__(self):
+        return len(self._drivers)
+
+
+driver_registry = DriverRegistry()
+
+atexit.register(driver_registry.close_all)
@@ -1,5 +1,14 @@
 from neo4j.v1 import GraphDatabase
 
+# Edge property value marking an edge removed in a delta graph version. Weights are finite,
+# and -inf survives every backend's float storage (NaN is used by compact in-memory graphs for absent values)
+TOMBSTONE = float('-inf')
+
+
+def is_tombstone(prop_value):
+    return prop_value == TOMBSTONE
+
+
 class GraphClient():
     """
     The following are required of GraphClient implementations:
@@ -13,6 +22,9 @@ class GraphClient():
     class Meta:
         abstract = True
 
+    # several processes may write to the same graph_uuid at once, see TemporalGraphEngine#construct_graph
+    supports_parallel_writes = False
+
     def __init__(self, graph_uuid):
         """
         Associate this GraphClient with a particular graph_uuid.
@@ -58,6 +70,46 @@ class GraphClient():
 
         raise NotImplementedError('GraphClient#get_edge_property must be implemented')
 
+    def get_edge_properties(self, edge_pairs, prop_key, batch_size = None):
+        """
+        Gets edge property of many edges in as few backend round trips as possible
+
+        :param edge_pairs: List[(source_vertex_id, target_vertex_id)]
+        :param prop_key: desired property key
+        :param batch_size: number of edges sent to the backend per query
+        :return: Dict[(source_vertex_id, target_vertex_id), property value] for the edges that exist.
+                 None on error
+        """
+
+        raise NotImplementedError('GraphClient#get_edge_properties must be implemented')
+
+    def get_edge_property_maps(self, edge_pairs, prop_keys = None, batch_size = None):
+        """
+        Gets several properties of many edges in as few backend round trips as possible
+
+        :param edge_pairs: List[(source_vertex_id, target_vertex_id)]
+        :param prop_keys: List[String] desired property keys, every property of the edges if None
+        :param batch_size: number of edges sent to the backend per query
+        :return: Dict[(source_vertex_id, target_vertex_id), Dict[prop_key, property value]] for the edges that
+                 exist, holding the properties they have. None on error
+        """
+
+        raise NotImplementedError('GraphClient#get_edge_property_maps must be implemented')
+
+    def get_edge_property_of_graphs(self, graph_uuids, source_vertex_id, target_vertex_id, prop_key):
+        """
+        Gets edge property of the edge connecting source and target vertex in each of many graphs stored in the
+        same backend as this client's graph, e.g. the versions of a temporal graph
+
+        :param graph_uuids: List[graph_uuid]
+        :param source_vertex_id: uuid identifying the source vertex id
+        :param target_vertex_id: uuid identifying the target vertex id
+        :param prop_key: desired property key
+        :return: Dict[graph_uuid, property value] for the graphs holding the edge. None on error
+        """
+
+        raise NotImplementedError('GraphClient#get_edge_property_of_graphs must be implemented')
+
     def set_edge_property(self, source_vertex_id, target_vertex_id, prop_key, prop_value):
         """
         Sets edge property of the edge connecting source and target vertex.
@@ -72,6 +124,110 @@ class GraphClient():
 
         raise NotImplementedError('GraphClient#set_edge_property must be implemented')
 
+    def set_edge_properties(self, edges, prop_key, batch_size = None, vertices_exist = False):
+        """
+        Sets edge property of many edges in one transaction.
+        Creates source/target vertices and edges if they do not exist
+
+        :param edges: List[(source_vertex_id, target_vertex_id, prop_value)]
+        :param prop_key: property key to set on every edge
+        :param batch_size: number of edges sent to the backend per statement
+        :param vertices_exist: [Bool] every vertex of edges was created with set_vertices, so that only edges
+                 need to be created. Lets parallel writers avoid contending on shared vertices
+        :return: [Bool] True if all edges were written
+        """
+
+        raise NotImplementedError('GraphClient#set_edge_properties must be implemented')
+
+    def set_edge_property_maps(self, edges, batch_size = None, vertices_exist = False):
+        """
+        Sets several properties of many edges in one transaction, all properties of an edge in one statement.
+        Creates source/target vertices and edges if they do not exist
+
+        :param edges: List[(source_vertex_id, target_vertex_id, Dict[prop_key, prop_value])]
+        :param batch_size: number of edges sent to the backend per statement
+        :param vertices_exist: [Bool] see set_edge_properties
+        :return: [Bool] True if all edges were written
+        """
+
+        raise NotImplementedError('GraphClient#set_edge_property_maps must be implemented')
+
+    def set_vertices(self, vertex_ids, batch_size = None):
+        """
+        Creates the vertices that do not exist, in one transaction
+
+        :param vertex_ids: List[String]
+        :param batch_size: number of vertices sent to the backend per statement
+        :return: [Bool] True if all vertices were written
+        """
+
+        raise NotImplementedError('GraphClient#set_vertices must be implemented')
+
+    def get_adjacent_edges(self, source_vertex_id, prop_key, page_size = None):
+        """
+        Streams the outgoing edges of the source vertex that have prop_key, ordered by target_vertex_id.
+        Implementations must page through the backend rather than materialise every edge
+
+        :param source_vertex_id: uuid identifying the source vertex id
+        :param prop_key: desired property key
+        :param page_size: number of edges fetched from the backend at a time
+        :return: Iterator[(target_vertex_id, prop_value)]
+        """
+
+        raise NotImplementedError('GraphClient#get_adjacent_edges must be implemented')
+
+    def get_many_adjacent_edges(self, source_vertex_ids, prop_key, batch_size = None):
+        """
+        Gets the outgoing edges that have prop_key of many source vertices, e.g. a traversal frontier
+
+        :param source_vertex_ids: List[source_vertex_id]
+        :param prop_key: desired property key
+        :param batch_size: number of source vertices per backend query
+        :return: Dict[source_vertex_id, List[(target_vertex_id, prop_value)]] for the vertices that have edges.
+                 None on error
+        """
+
+        raise NotImplementedError('GraphClient#get_many_adjacent_edges must be implemented')
+
+    def get_edges(self, prop_key, page_size = None):
+        """
+        Streams every edge of the graph that has prop_key, ordered by (source_vertex_id, target_vertex_id).
+        Implementations must stream from the backend rather than materialise every edge
+
+        :param prop_key: desired property key
+        :param page_size: number of edges fetched from the backend at a time, for backends reading in pages
+        :return: Iterator[(source_vertex_id, target_vertex_id, prop_value)]
+        """
+
+        raise NotImplementedError('GraphClient#get_edges must be implemented')
+
+    def get_edge_property_keys(self):
+        """
+        Gets the property keys set on edges of the graph
+
+        :return: Set[String]
+        """
+
+        raise NotImplementedError('GraphClient#get_edge_property_keys must be implemented')
+
+    def reopen(self):
+        """
+        Makes a committed graph writable again, e.g. to compact a delta version into a snapshot.
+        Optional, see commit
+
+        :return:
+        """
+        pass
+
+    def commit(self):
+        """
+        Called once the graph version of graph_uuid is committed, after which the graph is read-only.
+        Implementations may compact their storage. Optional
+
+        :return:
+        """
+        pass
+
 
 
 
@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from graph_client.driver_registry import DriverRegistry
+
+
+class FakeSession():
+    def __init__(self, query_latency):
+        self.query_latency = query_latency
+
+    def run(self, statement, parameters=None, **kwparameters):
+        time.sleep(self.query_latency)
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeDriver():
+    """
+    Stand-in for neo4j.v1.GraphDatabase.driver. Creating it costs handshake_latency, the Bolt connection setup
+    and TLS/auth handshake that a real driver pays before its first query
+    """
+
+    def __init__(self, url, auth=None, handshake_latency=0.0, query_latency=0.0, **config):
+        time.sleep(handshake_latency)
+
+        self.query_latency = query_latency
+
+    def session(self):
+        return FakeSession(self.query_latency)
+
+    def close(self):
+        pass
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = 'Compares request latency with a driver per request against the shared driver registry, ' \
+           'using a fake driver with a simulated handshake'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--handshake-ms', type=float, default=20.0)
+        parser.add_argument('--query-ms', type=float, default=1.0)
+        parser.add_argument('--max-sessions', type=int, default=8)
+
+    def handle(self, *args, **options):
+        handshake_latency = options['handshake_ms'] / 1000
+        query_latency     = options['query_ms'] / 1000
+
+        def driver_factory(url, auth=None, **config):
+            return FakeDriver(url, auth, handshake_latency, query_latency, **config)
+
+        def driver_per_request():
+            driver  = driver_factory('bolt://fake', auth=('neo4j', 'neo4j'))
+            session = driver.session()
+            session.run('RETURN 1')
+            session.close()
+            driver.close()
+
+        registry = DriverRegistry(driver_factory=driver_factory, max_sessions=options['max_sessions'])
+
+        def pooled_driver():
+            with registry.get_driver('bolt://fake', 'neo4j', 'neo4j').session() as session:
+                session.run('RETURN 1')
+
+        results = {
+            'driver_per_request': self.run_benchmark(driver_per_request, options['requests'], options['threads']),
+            'driver_registry':    self.run_benchmark(pooled_driver, options['requests'], options['threads']),
+        }
+
+        registry.close_all()
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run_benchmark(self, request, num_requests, num_threads):
+        latencies = []
+        lock      = threading.Lock()
+
+        def worker(count):
+            worker_latencies = []
+
+            for _ in range(count):
+                start = time.perf_counter()
+                request()
+                worker_latencies.append(time.perf_counter() - start)
+
+            with lock:
+                latencies.extend(worker_latencies)
+
+        per_thread = [num_requests // num_threads + (1 if i < num_requests % num_threads else 0)
+                      for i in range(num_threads)]
+
+        threads = [threading.Thread(target=worker, args=(count,)) for count in per_thread]
+
+        start = time.perf_counter()
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        elapsed   = time.perf_counter() - start
+        latencies = sorted(latencies)
+
+        return {
+            'requests':       num_requests,
+            'threads':        num_threads,
+            'throughput_rps': num_requests / elapsed if elapsed else None,
+            'p50_ms':         percentile(latencies, 50) * 1000,
+            'p99_ms':         percentile(latencies, 99) * 1000,
+        }
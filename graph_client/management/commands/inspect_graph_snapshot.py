@@ -0,0 +1,44 @@
+import json
+import math
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from graph_client.snapshot import SnapshotError, load_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Memory-maps a graph snapshot and reports its size and per-weight statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        try:
+            graph_uuid, compact_graph = load_snapshot(options['path'])
+        except (OSError, SnapshotError) as e:
+            raise CommandError(str(e))
+
+        load_ms = (time.perf_counter() - start) * 1000
+
+        weights = {}
+
+        for weight_id, values in compact_graph.weights.items():
+            present = [value for value in values if not math.isnan(value)]
+
+            weights[weight_id] = {
+                'edges': len(present),
+                'min':   min(present) if present else None,
+                'max':   max(present) if present else None,
+                'mean':  sum(present) / len(present) if present else None,
+            }
+
+        self.stdout.write(json.dumps({
+            'graph_uuid': graph_uuid,
+            'vertices':   compact_graph.num_vertices,
+            'edges':      compact_graph.num_edges,
+            'load_ms':    load_ms,
+            'weights':    weights,
+        }, indent=2))
@@ -0,0 +1,622 @@
+import bisect
+import logging
+import math
+import threading
+from array import array
+
+from graph_client.graph_client import GraphClient
+
+logger = logging.getLogger(__name__)
+
+
+class MutableGraph():
+    """
+    Graph under construction: dict of dicts keyed by vertex id
+
+    """
+
+    def __init__(self):
+        # vertex_id -> {prop_key: prop_value}
+        self.vertices = {}
+
+        # source_vertex_id -> {target_vertex_id: {prop_key: prop_value}}
+        self.edges    = {}
+
+        self.lock     = threading.Lock()
+
+    def set_vertex_property(self, vertex_id, prop_key, prop_value):
+        with self.lock:
+            self.vertices.setdefault(vertex_id, {})[prop_key] = prop_value
+
+    def get_vertex_property(self, vertex_id, prop_key):
+        return self.vertices.get(vertex_id, {}).get(prop_key)
+
+    def set_vertices(self, vertex_ids):
+        with self.lock:
+            for vertex_id in vertex_ids:
+                self.vertices.setdefault(vertex_id, {})
+
+    def set_edge_properties(self, edges, prop_key):
+        with self.lock:
+            for source_vertex_id, target_vertex_id, prop_value in edges:
+                self.vertices.setdefault(source_vertex_id, {})
+                self.vertices.setdefault(target_vertex_id, {})
+
+                self.edges.setdefault(source_vertex_id, {}).setdefault(target_vertex_id, {})[prop_key] = prop_value
+
+    def set_edge_property_maps(self, edges):
+        with self.lock:
+            for source_vertex_id, target_vertex_id, prop_values in edges:
+                self.vertices.setdefault(source_vertex_id, {})
+                self.vertices.setdefault(target_vertex_id, {})
+
+                self.edges.setdefault(source_vertex_id, {}).setdefault(target_vertex_id, {}).update(prop_values)
+
+    def get_edge_property(self, source_vertex_id, target_vertex_id, prop_key):
+        return self.edges.get(source_vertex_id, {}).get(target_vertex_id, {}).get(prop_key)
+
+    def get_edge_property_map(self, source_vertex_id, target_vertex_id):
+        """
+        :return: Dict[prop_key, prop_value] or None if the edge does not exist
+        """
+        with self.lock:
+            props = self.edges.get(source_vertex_id, {}).get(target_vertex_id)
+
+            return None if props is None else {prop_key: prop_value for prop_key, prop_value in props.items()
+                                               if prop_value is not None}
+
+    def get_adjacent_edges(self, source_vertex_id, prop_key):
+        with self.lock:
+            adjacent = [(target_vertex_id, props[prop_key])
+                        for target_vertex_id, props in self.edges.get(source_vertex_id, {}).items()
+                        if props.get(prop_key) is not None]
+
+        return sorted(adjacent)
+
+    def get_edges(self, prop_key):
+        with self.lock:
+            edges = [(source_vertex_id, target_vertex_id, props[prop_key])
+                     for source_vertex_id, targets in self.edges.items()
+                     for target_vertex_id, props in targets.items()
+                     if props.get(prop_key) is not None]
+
+        return sorted(edges)
+
+    def get_edge_property_keys(self):
+        with self.lock:
+            return {prop_key for targets in self.edges.values() for props in targets.values() for prop_key in props}
+
+    def freeze(self):
+        """
+        :return: [CompactGraph] read-only copy of this graph
+        """
+        with self.lock:
+            vertex_ids   = sorted(self.vertices)
+            vertex_index = {vertex_id: index for index, vertex_id in enumerate(vertex_ids)}
+
+            prop_keys    = sorted({prop_key for targets in self.edges.values()
+                                   for props in targets.values() for prop_key in props})
+
+            offsets      = array('q', [0])
+            targets      = array('q')
+            weights      = {prop_key: array('d') for prop_key in prop_keys}
+
+            for vertex_id in vertex_ids:
+                adjacent = self.edges.get(vertex_id, {})
+
+                for target_vertex_id in sorted(adjacent):
+                    targets.append(vertex_index[target_vertex_id])
+
+                    for prop_key in prop_keys:
+                        weights[prop_key].append(as_float(adjacent[target_vertex_id].get(prop_key)))
+
+                offsets.append(len(targets))
+
+            vertex_properties = {}
+
+            for vertex_id, props in self.vertices.items():
+                for prop_key, prop_value in props.items():
+                    vertex_properties.setdefault(prop_key, {})[vertex_id] = prop_value
+
+            return CompactGraph(vertex_ids, offsets, targets, weights, vertex_properties)
+
+
+def as_float(prop_value):
+    """
+    Edge properties of a CompactGraph are floats, NaN marking an absent property
+
+    """
+    return float('nan') if prop_value is None or prop_value == "" else float(prop_value)
+
+
+class CompactGraph():
+    """
+    Read-only graph in CSR (compressed sparse row) layout:
+      - vertex_ids: sorted vertex ids, a vertex is referred to by its position (interned id)
+      - offsets: outgoing edges of vertex i are positions offsets[i] to offsets[i + 1] of targets
+      - targets: interned target vertex of every edge, sorted within each vertex
+      - weights: per prop_key, float value of every edge aligned with targets. NaN where the edge has no value
+
+    offsets, targets and weights may be any indexable sequence of numbers, e.g. arrays or memoryviews over a
+    memory-mapped file. vertex_index maps a vertex id to its position, built from vertex_ids unless given
+
+    """
+
+    def __init__(self, vertex_ids, offsets, targets, weights, vertex_properties = None, vertex_index = None):
+        self.vertex_ids        = vertex_ids
+        self.vertex_index      = vertex_index if vertex_index is not None else \
+            {vertex_id: index for index, vertex_id in enumerate(vertex_ids)}
+
+        self.offsets           = offsets
+        self.targets           = targets
+        self.weights           = weights
+
+        self.vertex_properties = vertex_properties or {}
+
+    @property
+    def num_vertices(self):
+        return len(self.vertex_ids)
+
+    @property
+    def num_edges(self):
+        return len(self.targets)
+
+    def get_vertex_property(self, vertex_id, prop_key):
+        return self.vertex_properties.get(prop_key, {}).get(vertex_id)
+
+    def edge_position(self, source_vertex_id, target_vertex_id):
+        """
+        :return: [Int] position of the edge in targets/weights or None if it does not exist
+        """
+        source = self.vertex_index.get(source_vertex_id)
+        target = self.vertex_index.get(target_vertex_id)
+
+        if source is None or target is None:
+            return None
+
+        start, end = self.offsets[source], self.offsets[source + 1]
+
+        position   = bisect.bisect_left(self.targets, target, start, end)
+
+        return position if position < end and self.targets[position] == target else None
+
+    def get_edge_property(self, source_vertex_id, target_vertex_id, prop_key):
+        weights  = self.weights.get(prop_key)
+        position = self.edge_position(source_vertex_id, target_vertex_id)
+
+        if weights is None or position is None or math.isnan(weights[position]):
+            return None
+
+        return weights[position]
+
+    def get_edge_property_map(self, source_vertex_id, target_vertex_id):
+        """
+        :return: Dict[prop_key, prop_value] or None if the edge does not exist
+        """
+        position = self.edge_position(source_vertex_id, target_vertex_id)
+
+        if position is None:
+            return None
+
+        return {prop_key: weights[position] for prop_key, weights in self.weights.items()
+                if not math.isnan(weights[position])}
+
+    def get_adjacent_edges(self, source_vertex_id, prop_key):
+        weights = self.weights.get(prop_key)
+        source  = self.vertex_index.get(source_vertex_id)
+
+        if weights is None or source is None:
+            return
+
+        for position in range(self.offsets[source], self.offsets[source + 1]):
+            if not math.isnan(weights[position]):
+                yield self.vertex_ids[self.targets[position]], weights[position]
+
+    def get_edges(self, prop_key):
+        weights = self.weights.get(prop_key)
+
+        if weights is None:
+            return
+
+        for source in range(self.num_vertices):
+            source_vertex_id = self.vertex_ids[source]
+
+            for position in range(self.offsets[source], self.offsets[source + 1]):
+                if not math.isnan(weights[position]):
+                    yield source_vertex_id, self.vertex_ids[self.targets[position]], weights[position]
+
+    def get_edge_property_keys(self):
+        return {prop_key for prop_key, weights in self.weights.items()
+                if any(not math.isnan(weight) for weight in weights)}
+
+    def thaw(self):
+        """
+        :return: [MutableGraph] writable copy of this graph
+        """
+        graph = MutableGraph()
+
+        for vertex_id in self.vertex_ids:
+            graph.vertices[vertex_id] = {}
+
+        for prop_key, values in self.vertex_properties.items():
+            for vertex_id, prop_value in values.items():
+                graph.vertices.setdefault(vertex_id, {})[prop_key] = prop_value
+
+        for prop_key in self.weights:
+            for source_vertex_id, target_vertex_id, prop_value in self.get_edges(prop_key):
+                graph.edges.setdefault(source_vertex_id, {}).setdefault(target_vertex_id, {})[prop_key] = prop_value
+
+        return graph
+
+
+class InMemoryGraphStore():
+    """
+    Process-wide store of in-memory graphs keyed by graph_uuid.
+
+    A graph is a MutableGraph while it is constructed and is compacted into a read-only CompactGraph when its
+    version is committed. Compact graphs can also be loaded directly, e.g. to serve as a read replica.
+    A loaded graph is materialised when it holds every edge of its version, parent chain included
+
+    """
+
+    def __init__(self):
+        self._graphs       = {}
+        self._materialised = set()
+        self._lock         = threading.Lock()
+
+    def get(self, graph_uuid):
+        return self._graphs.get(graph_uuid)
+
+    def get_or_create(self, graph_uuid):
+        graph = self._graphs.get(graph_uuid)
+
+        if graph is None:
+            with self._lock:
+                graph = self._graphs.setdefault(graph_uuid, MutableGraph())
+
+        return graph
+
+    def is_compact(self, graph_uuid):
+        return isinstance(self._graphs.get(graph_uuid), CompactGraph)
+
+    def freeze(self, graph_uuid):
+        graph = self._graphs.get(graph_uuid)
+
+        if isinstance(graph, MutableGraph):
+            compact_graph = graph.freeze()
+
+            with self._lock:
+                self._graphs[graph_uuid] = compact_graph
+
+    def thaw(self, graph_uuid):
+        graph = self._graphs.get(graph_uuid)
+
+        if isinstance(graph, CompactGraph):
+            mutable_graph = graph.thaw()
+
+            with self._lock:
+                self._graphs[graph_uuid] = mutable_graph
+                self._materialised.discard(graph_uuid)
+
+    def load(self, graph_uuid, compact_graph, materialised = False):
+        with self._lock:
+            self._graphs[graph_uuid] = compact_graph
+
+            if materialised:
+                self._materialised.add(graph_uuid)
+            else:
+                self._materialised.discard(graph_uuid)
+
+    def is_materialised(self, graph_uuid):
+        return graph_uuid in self._materialised
+
+    def drop(self, graph_uuid):
+        with self._lock:
+            self._graphs.pop(graph_uuid, None)
+            self._materialised.discard(graph_uuid)
+
+    def graph_uuids(self):
+        return list(self._graphs)
+
+
+memory_graph_store = InMemoryGraphStore()
+
+
+class InMemoryGraphClient(GraphClient):
+    """
+    InMemoryGraphClient is an in-process implementation of GraphClient.
+
+    Used as a read replica of committed versions and as a stand-in for Neo4j when running the engine
+    without a database
+
+    """
+
+    def __init__(self, graph_uuid, store = memory_graph_store):
+        self.graph_uuid = graph_uuid
+        self.store      = store
+
+    def writable_graph(self):
+        graph = self.store.get_or_create(self.graph_uuid)
+
+        if isinstance(graph, CompactGraph):
+            logger.error(f'Graph {self.graph_uuid} is committed and read-only')
+            return None
+
+        return graph
+
+    def get_vertex_property(self, vertex_id, prop_key):
+        """
+        Gets vertex property of the vertex identified by vertex_id
+
+        :param vertex_id: uuid identifying the vertex
+        :param prop_key: desired property key
+        :return: property value or empty string if vertex does not exist or property does not exist
+        """
+        graph = self.store.get(self.graph_uuid)
+
+        prop_value = graph.get_vertex_property(str(vertex_id), prop_key) if graph else None
+
+        return "" if prop_value is None else prop_value
+
+    def set_vertex_property(self, vertex_id, prop_key, prop_value):
+        """
+        Sets vertex property of the vertex identified by vertex_id.
+        Creates vertex if does not exist
+
+        :param vertex_id: uuid identifying the vertex
+        :param prop_key: desired property key
+        :param prop_value: desired property value
+        :return: [Bool] successful setting property or not
+        """
+        graph = self.writable_graph()
+
+        if graph is None:
+            return False
+
+        graph.set_vertex_property(str(vertex_id), prop_key, prop_value)
+
+        return True
+
+    def get_edge_property(self, source_vertex_id, target_vertex_id, prop_key):
+        """
+        Gets edge property of the edge connecting source and target vertex
+
+        :param source_vertex_id: uuid identifying the source vertex id
+        :param target_vertex_id: uuid identifying the target vertex id
+        :param prop_key: desired property key
+        :return: property value or empty string if edge does not exist or property does not exist
+        """
+        graph = self.store.get(self.graph_uuid)
+
+        prop_value = graph.get_edge_property(str(source_vertex_id), str(target_vertex_id), prop_key) \
+            if graph else None
+
+        return "" if prop_value is None else prop_value
+
+    def get_edge_properties(self, edge_pairs, prop_key, batch_size = None):
+        """
+        Gets edge property of many edges
+
+        :param edge_pairs: List[(source_vertex_id, target_vertex_id)]
+        :param prop_key: desired property key
+        :param batch_size: unused
+        :return: Dict[(source_vertex_id, target_vertex_id), property value] for the edges that exist
+        """
+        graph = self.store.get(self.graph_uuid)
+
+        if graph is None:
+            return {}
+
+        edge_properties = {}
+
+        for source_vertex_id, target_vertex_id in edge_pairs:
+            prop_value = graph.get_edge_property(str(source_vertex_id), str(target_vertex_id), prop_key)
+
+            if prop_value is not None:
+                edge_properties[(str(source_vertex_id), str(target_vertex_id))] = prop_value
+
+        return edge_properties
+
+    def get_edge_property_maps(self, edge_pairs, prop_keys = None, batch_size = None):
+        """
+        Gets several properties of many edges
+
+        :param edge_pairs: List[(source_vertex_id, target_vertex_id)]
+        :param prop_keys: List[String] desired property keys, every property of the edges if None
+        :param batch_size: unused
+        :return: Dict[(source_vertex_id, target_vertex_id), Dict[prop_key, property value]] for the edges that exist
+        """
+        graph = self.store.get(self.graph_uuid)
+
+        if graph is None:
+            return {}
+
+        edge_property_maps = {}
+
+        for source_vertex_id, target_vertex_id in edge_pairs:
+            prop_values = graph.get_edge_property_map(str(source_vertex_id), str(target_vertex_id))
+
+            if prop_values is None:
+                continue
+
+            if prop_keys is not None:
+                prop_values = {prop_key: prop_values[prop_key] for prop_key in prop_keys if prop_key in prop_values}
+
+            edge_property_maps[(str(source_vertex_id), str(target_vertex_id))] = prop_values
+
+        return edge_property_maps
+
+    def get_edge_property_of_graphs(self, graph_uuids, source_vertex_id, target_vertex_id, prop_key):
+        """
+        Gets edge property of the edge connecting source and target vertex in each of graph_uuids
+
+        :param graph_uuids: List[graph_uuid]
+        :param source_vertex_id: uuid identifying the source vertex id
+        :param target_vertex_id: uuid identifying the target vertex id
+        :param prop_key: desired property key
+        :return: Dict[graph_uuid, property value] for the graphs holding the edge
+        """
+        edge_properties = {}
+
+        for graph_uuid in graph_uuids:
+            graph = self.store.get(graph_uuid)
+
+            prop_value = graph.get_edge_property(str(source_vertex_id), str(target_vertex_id), prop_key) \
+                if graph else None
+
+            if prop_value is not None:
+                edge_properties[graph_uuid] = prop_value
+
+        return edge_properties
+
+    def set_edge_property(self, source_vertex_id, target_vertex_id, prop_key, prop_value):
+        """
+        Sets edge property of the edge connecting source and target vertex.
+        Creates source/target vertex and edge if does not exist
+
+        :param source_vertex_id:
+        :param target_vertex_id:
+        :param property_key:
+        :param property_value:
+        :return: [Bool] successful setting property or not
+        """
+        return self.set_edge_properties([(source_vertex_id, target_vertex_id, prop_value)], prop_key)
+
+    def set_edge_properties(self, edges, prop_key, batch_size = None, vertices_exist = False):
+        """
+        Sets edge property of many edges.
+        Creates source/target vertices and edges if they do not exist
+
+        :param edges: List[(source_vertex_id, target_vertex_id, prop_value)]
+        :param prop_key: property key to set on every edge
+        :param batch_size: unused
+        :param vertices_exist: unused
+        :return: [Bool] True if all edges were written
+        """
+        graph = self.writable_graph()
+
+        if graph is None:
+            return False
+
+        graph.set_edge_properties([(str(source_vertex_id), str(target_vertex_id), prop_value)
+                                   for source_vertex_id, target_vertex_id, prop_value in edges], prop_key)
+
+        return True
+
+    def set_edge_property_maps(self, edges, batch_size = None, vertices_exist = False):
+        """
+        Sets several properties of many edges.
+        Creates source/target vertices and edges if they do not exist
+
+        :param edges: List[(source_vertex_id, target_vertex_id, Dict[prop_key, prop_value])]
+        :param batch_size: unused
+        :param vertices_exist: unused
+        :return: [Bool] True if all edges were written
+        """
+        graph = self.writable_graph()
+
+        if graph is None:
+            return False
+
+        graph.set_edge_property_maps([(str(source_vertex_id), str(target_vertex_id), dict(prop_values))
+                                      for source_vertex_id, target_vertex_id, prop_values in edges])
+
+        return True
+
+    def set_vertices(self, vertex_ids, batch_size = None):
+        """
+        Creates the vertices that do not exist
+
+        :param vertex_ids: List[String]
+        :param batch_size: unused
+        :return: [Bool] True if all vertices were written
+        """
+        graph = self.writable_graph()
+
+        if graph is None:
+            return False
+
+        graph.set_vertices([str(vertex_id) for vertex_id in vertex_ids])
+
+        return True
+
+    def get_adjacent_edges(self, source_vertex_id, prop_key, page_size = None):
+        """
+        Streams the outgoing edges of source vertex that have prop_key, ordered by target_vertex_id
+
+        :param source_vertex_id: uuid identifying the source vertex id
+        :param prop_key: desired property key
+        :param page_size: unused
+        :return: Iterator[(target_vertex_id, prop_value)]
+        """
+        graph = self.store.get(self.graph_uuid)
+
+        if graph is None:
+            return iter([])
+
+        return iter(graph.get_adjacent_edges(str(source_vertex_id), prop_key))
+
+    def get_many_adjacent_edges(self, source_vertex_ids, prop_key, batch_size = None):
+        """
+        Gets the outgoing edges that have prop_key of many source vertices
+
+        :param source_vertex_ids: List[source_vertex_id]
+        :param prop_key: desired property key
+        :param batch_size: unused
+        :return: Dict[source_vertex_id, List[(target_vertex_id, prop_value)]] for the vertices that have edges
+        """
+        graph = self.store.get(self.graph_uuid)
+
+        if graph is None:
+            return {}
+
+        adjacent_edges = {}
+
+        for source_vertex_id in source_vertex_ids:
+            edges = list(graph.get_adjacent_edges(str(source_vertex_id), prop_key))
+
+            if edges:
+                adjacent_edges[str(source_vertex_id)] = edges
+
+        return adjacent_edges
+
+    def get_edges(self, prop_key, page_size = None):
+        """
+        Streams every edge of the graph that has prop_key, ordered by (source_vertex_id, target_vertex_id)
+
+        :param prop_key: desired property key
+        :param page_size: unused
+        :return: Iterator[(source_vertex_id, target_vertex_id, prop_value)]
+        """
+        graph = self.store.get(self.graph_uuid)
+
+        if graph is None:
+            return iter([])
+
+        return iter(graph.get_edges(prop_key))
+
+    def get_edge_property_keys(self):
+        """
+        Gets the property keys set on edges of the graph
+
+        :return: Set[String]
+        """
+        graph = self.store.get(self.graph_uuid)
+
+        return graph.get_edge_property_keys() if graph else set()
+
+    def reopen(self):
+        """
+        Converts the committed graph back into a writable graph
+
+        :return:
+        """
+        self.store.thaw(self.graph_uuid)
+
+    def commit(self):
+        """
+        Compacts the graph into its read-only CSR layout
+
+        :return:
+        """
+        self.store.freeze(self.graph_uuid)
@@ -1,50 +1,160 @@
 import logging
 import os
+import random
+import time
+from neo4j.exceptions import TransientError
 from graph_client.graph_client import GraphClient
-
-from neo4j.v1 import GraphDatabase
+from graph_client.driver_registry import driver_registry
+from graph_client import cypher_statements
+from temporal_graph.instrumentation import timed
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_BATCH_SIZE = int(os.environ.get('NEO4J_BATCH_SIZE', 5000))
+DEFAULT_PAGE_SIZE  = int(os.environ.get('NEO4J_PAGE_SIZE', 1000))
+
+# a transaction failing transiently, e.g. on a deadlock between parallel writers, is retried with backoff
+TRANSIENT_RETRIES  = int(os.environ.get('NEO4J_TRANSIENT_RETRIES', 5))
+RETRY_BACKOFF      = float(os.environ.get('NEO4J_RETRY_BACKOFF', 0.05))
+
 class NeoGraphClient(GraphClient):
     """
     NeoGraph client is a Neo4j implemention of GraphClient
 
     """
+    supports_parallel_writes = True
 
     def __init__(self,
                  graph_uuid,
-                 neojs_url      = os.environ['GRAPHENEDB_BOLT_URL'],
-                 neojs_username = os.environ['GRAPHENEDB_BOLT_USER'],
-                 neojs_password = os.environ['GRAPHENEDB_BOLT_PASSWORD']):
+                 neojs_url      = None,
+                 neojs_username = None,
+                 neojs_password = None,
+                 registry       = driver_registry,
+                 batch_size     = DEFAULT_BATCH_SIZE,
+                 page_size      = DEFAULT_PAGE_SIZE):
+
+        # credentials are read on construction so that importing this module does not require them
+        neojs_url      = neojs_url      or os.environ['GRAPHENEDB_BOLT_URL']
+        neojs_username = neojs_username or os.environ['GRAPHENEDB_BOLT_USER']
+        neojs_password = neojs_password or os.environ['GRAPHENEDB_BOLT_PASSWORD']
 
         self.graph_uuid = graph_uuid
-        self.driver = GraphDatabase.driver(neojs_url, auth=(neojs_username, neojs_password))
+        self.batch_size = batch_size
+        self.page_size  = page_size
+
+        # drivers are shared process-wide, constructing a NeoGraphClient does not open a connection
+        self.driver = registry.get_driver(neojs_url, neojs_username, neojs_password)
 
 
-    def run_query(self, query):
+    def run_query(self, query, parameters = None):
         """
         Safely run a query. Ensure session is property initialized and closed.
         Equivalent of a managed resource
 
-        :param query: query to run
+        :param query: parameterised query to run. $graph_uuid is always bound to this client's graph_uuid
+        :param parameters: query parameters
         :return: BoltStatementResult
         """
-        try:
-            session = self.driver.session()
+        parameters = dict(parameters or {}, graph_uuid=self.graph_uuid)
 
-            statement_result = session.run(query)
+        try:
+            with self.driver.session() as session:
+                with timed('neo4j_query'):
+                    statement_result = session.run(query, parameters)
 
-            session.close()
+                    # buffer the results before the session is closed and returned to the pool
+                    statement_result.detach()
 
             return statement_result
         except Exception as error:
-            logging.error(f'Failed to run Neo4j query {query}, error: {error}')
-        finally:
-            session.close()
+            logging.error(f'Failed to run Neo4j query {query} with parameters {parameters}, error: {error}')
+
+        return None
+
+    def run_read_query(self, query, parameters = None):
+        """
+        Run a query and read its records, see run_query
+
+        :param query: parameterised query to run
+        :param parameters: query parameters
+        :return: List[Record] or None on error
+        """
+        statement_result = self.run_query(query, parameters)
+
+        if statement_result is None:
+            return None
+
+        try:
+            with timed('neo4j_decode'):
+                return list(statement_result)
+        except Exception as error:
+            logging.error(f'Failed to read results of Neo4j query {query}, error: {error}')
 
         return None
 
+    def stream_query(self, query, parameters = None):
+        """
+        Run a query and yield its records as they are read from the connection, without buffering the result.
+        The session is held until the records are exhausted or the iterator is closed
+
+        :param query: parameterised query to run. $graph_uuid is always bound to this client's graph_uuid
+        :param parameters: query parameters
+        :return: Iterator[Record]
+        :raises IOError: if the query fails
+        """
+        parameters = dict(parameters or {}, graph_uuid=self.graph_uuid)
+
+        try:
+            with self.driver.session() as session:
+                with timed('neo4j_query'):
+                    statement_result = session.run(query, parameters)
+
+                yield from statement_result
+        except Exception as error:
+            logging.error(f'Failed to stream Neo4j query {query} with parameters {parameters}, error: {error}')
+
+            raise IOError(f'Failed to stream results of Neo4j query for {self.graph_uuid}') from error
+
+    def run_batched_transaction(self, query, param_key, rows, batch_size = None):
+        """
+        Run query once per batch of rows, all batches inside a single transaction.
+        Each batch is passed to the query as the list parameter param_key.
+        A transaction failing with a transient error (deadlock, unavailable leader) is rolled back and retried
+        up to TRANSIENT_RETRIES times
+
+        :param query: parameterised query, typically an UNWIND over $param_key
+        :param param_key: name of the list parameter
+        :param rows: List of parameter maps
+        :param batch_size: rows per statement. Defaults to self.batch_size
+        :return: [Bool] True if the transaction committed
+        """
+        batch_size = batch_size or self.batch_size
+
+        for attempt in range(TRANSIENT_RETRIES + 1):
+            try:
+                with self.driver.session() as session:
+                    with session.begin_transaction() as tx:
+                        for start in range(0, len(rows), batch_size):
+                            tx.run(query, {param_key: rows[start:start + batch_size], 'graph_uuid': self.graph_uuid})
+
+                            # send each batch as it is built so results do not pile up client-side
+                            tx.sync()
+
+                return True
+            except TransientError as error:
+                if attempt == TRANSIENT_RETRIES:
+                    logging.error(f'Failed to run batched Neo4j query {query} over {len(rows)} rows after '
+                                  f'{attempt + 1} attempts, error: {error}')
+                else:
+                    # jittered, so that writers that deadlocked each other do not collide again
+                    time.sleep(RETRY_BACKOFF * 2 ** attempt * (1 + random.random()))
+            except Exception as error:
+                logging.error(f'Failed to run batched Neo4j query {query} over {len(rows)} rows, error: {error}')
+
+                break
+
+        return False
+
 
     def get_vertex_property(self, vertex_id, prop_key):
         """
@@ -55,17 +165,11 @@ class NeoGraphClient(GraphClient):
         :return:  [String] property value or empty string if edge does not exist, property does not exist or error
         """
 
-        cypher_query = f"""
-          MATCH 
-          (sv:Vertex)
-          WHERE sv.vertex_id="{vertex_id}" AND sv.graph_uuid="{self.graph_uuid}"
-          RETURN sv.{prop_key}
-          """
-
-        bolt_statement_res = self.run_query(cypher_query)
+        bolt_statement_res = self.run_read_query(cypher_statements.get_vertex_property(prop_key),
+                                            {'vertex_id': str(vertex_id)})
 
         if bolt_statement_res:
-            query_results = [res[f'sv.{prop_key}'] for res in bolt_statement_res]
+            query_results = [res['value'] for res in bolt_statement_res]
 
             if len(query_results) > 1:
                 logger.error(f'Violation: more than one Vertex has the id: {vertex_id}')
@@ -86,13 +190,8 @@ class NeoGraphClient(GraphClient):
         :return: [Bool] successful setting property or not
         """
 
-        cypher_query = f"""
-            MERGE (sv:Vertex {{vertex_id:"{vertex_id}",graph_uuid:"{self.graph_uuid}"}})
-            ON CREATE SET sv.{prop_key}="{prop_value}"
-            ON MATCH SET sv.{prop_key}="{prop_value}"
-            """
-
-        bolt_statement_res = self.run_query(cypher_query)
+        bolt_statement_res = self.run_query(cypher_statements.set_vertex_property(prop_key),
+                                            {'vertex_id': str(vertex_id), 'prop_value': prop_value})
 
         return True if bolt_statement_res else False
 
@@ -103,21 +202,16 @@ class NeoGraphClient(GraphClient):
         :param source_vertex_id: uuid identifying the source vertex id
         :param target_vertex_id: uuid identifying the target vertex id
         :param prop_key: desired property key
-        :return: [String] property value or empty string if edge does not exist, property does not exist or error
+        :return: property value as stored (weights are floats) or empty string if edge does not exist,
+                 property does not exist or error
         """
 
-        cypher_query = f"""
-          MATCH 
-          (sv:Vertex {{vertex_id:"{source_vertex_id}",graph_uuid:"{self.graph_uuid}"}})
-          -[e:CONNECTED_TO]->
-          (tv:Vertex {{vertex_id:"{target_vertex_id}",graph_uuid:"{self.graph_uuid}"}})
-          RETURN e.{prop_key}
-          """
-
-        bolt_statement_res = self.run_query(cypher_query)
+        bolt_statement_res = self.run_read_query(cypher_statements.get_edge_property(prop_key),
+                                            {'source_vertex_id': str(source_vertex_id),
+                                             'target_vertex_id': str(target_vertex_id)})
 
         if bolt_statement_res:
-            query_results = [res[f'e.{prop_key}'] for res in bolt_statement_res]
+            query_results = [res['value'] for res in bolt_statement_res]
 
             if len(query_results) > 1:
                 logger.error(f'Violation: more than one Edge between vertices {source_vertex_id} and {target_vertex_id}')
@@ -126,6 +220,26 @@ class NeoGraphClient(GraphClient):
 
         return ""
 
+    def get_edge_property_of_graphs(self, graph_uuids, source_vertex_id, target_vertex_id, prop_key):
+        """
+        Gets edge property of the edge connecting source and target vertex in each of graph_uuids, in one query
+
+        :param graph_uuids: List[graph_uuid]
+        :param source_vertex_id: uuid identifying the source vertex id
+        :param target_vertex_id: uuid identifying the target vertex id
+        :param prop_key: desired property key
+        :return: Dict[graph_uuid, property value] for the graphs holding the edge. None on error
+        """
+        bolt_statement_res = self.run_read_query(cypher_statements.get_edge_property_of_graphs(prop_key),
+                                            {'graph_uuids':      list(graph_uuids),
+                                             'source_vertex_id': str(source_vertex_id),
+                                             'target_vertex_id': str(target_vertex_id)})
+
+        if bolt_statement_res is None:
+            return None
+
+        return {res['graph_uuid']: res['value'] for res in bolt_statement_res}
+
     def set_edge_property(self, source_vertex_id, target_vertex_id, prop_key, prop_value):
         """
         Sets edge property of the edge connecting source and target vertex.
@@ -138,14 +252,215 @@ class NeoGraphClient(GraphClient):
         :return: edge_id
         """
 
-        cypher_query = f"""
-          MERGE (sv:Vertex {{vertex_id:"{source_vertex_id}",graph_uuid:"{self.graph_uuid}"}})
-          MERGE (tv:Vertex {{vertex_id:"{target_vertex_id}",graph_uuid:"{self.graph_uuid}"}})
-          MERGE (sv)-[e:CONNECTED_TO]->(tv)
-          ON CREATE SET e.{prop_key}="{prop_value}"
-          ON MATCH SET e.{prop_key}="{prop_value}"
-          """
+        bolt_statement_res = self.run_query(cypher_statements.set_edge_property(prop_key),
+                                            {'source_vertex_id': str(source_vertex_id),
+                                             'target_vertex_id': str(target_vertex_id),
+                                             'prop_value':       prop_value})
+
+        return True if bolt_statement_res else False
+
+    def get_edge_properties(self, edge_pairs, prop_key, batch_size = None):
+        """
+        Gets edge property of many edges, batch_size edges per UNWIND query
+
+        :param edge_pairs: List[(source_vertex_id, target_vertex_id)]
+        :param prop_key: desired property key
+        :param batch_size: edges per query. Defaults to self.batch_size
+        :return: Dict[(source_vertex_id, target_vertex_id), property value] for the edges that exist.
+                 None on error
+        """
+        batch_size = batch_size or self.batch_size
+
+        rows = [{'source_vertex_id': str(source_vertex_id), 'target_vertex_id': str(target_vertex_id)}
+                for source_vertex_id, target_vertex_id in edge_pairs]
+
+        edge_properties = {}
+
+        for start in range(0, len(rows), batch_size):
+            bolt_statement_res = self.run_read_query(cypher_statements.get_edge_properties(prop_key),
+                                                {'edges': rows[start:start + batch_size]})
+
+            if bolt_statement_res is None:
+                return None
+
+            for res in bolt_statement_res:
+                edge_properties[(res['source_vertex_id'], res['target_vertex_id'])] = res['value']
+
+        return edge_properties
+
+    def get_edge_property_maps(self, edge_pairs, prop_keys = None, batch_size = None):
+        """
+        Gets several properties of many edges, batch_size edges per UNWIND query
+
+        :param edge_pairs: List[(source_vertex_id, target_vertex_id)]
+        :param prop_keys: List[String] desired property keys, every property of the edges if None
+        :param batch_size: edges per query. Defaults to self.batch_size
+        :return: Dict[(source_vertex_id, target_vertex_id), Dict[prop_key, property value]] for the edges that
+                 exist. None on error
+        """
+        batch_size = batch_size or self.batch_size
+
+        # one statement, hence one cached plan, per set of keys
+        query = cypher_statements.get_edge_property_maps(None if prop_keys is None else tuple(sorted(set(prop_keys))))
+
+        rows  = [{'source_vertex_id': str(source_vertex_id), 'target_vertex_id': str(target_vertex_id)}
+                 for source_vertex_id, target_vertex_id in edge_pairs]
+
+        edge_property_maps = {}
+
+        for start in range(0, len(rows), batch_size):
+            bolt_statement_res = self.run_read_query(query, {'edges': rows[start:start + batch_size]})
+
+            if bolt_statement_res is None:
+                return None
+
+            for res in bolt_statement_res:
+                edge_property_maps[(res['source_vertex_id'], res['target_vertex_id'])] = {
+                    prop_key: prop_value for prop_key, prop_value in res['value'].items() if prop_value is not None}
+
+        return edge_property_maps
+
+    def set_edge_properties(self, edges, prop_key, batch_size = None, vertices_exist = False):
+        """
+        Sets edge property of many edges in a single transaction, batch_size edges per UNWIND statement.
+        Creates source/target vertices and edges if they do not exist
+
+        :param edges: List[(source_vertex_id, target_vertex_id, prop_value)]
+        :param prop_key: property key to set on every edge
+        :param batch_size: edges per statement. Defaults to self.batch_size
+        :param vertices_exist: [Bool] vertices were created with set_vertices, edges are only created between them
+        :return: [Bool] True if all edges were written
+        """
+
+        rows = [{'source_vertex_id': str(source_vertex_id),
+                 'target_vertex_id': str(target_vertex_id),
+                 'prop_value':       prop_value} for source_vertex_id, target_vertex_id, prop_value in edges]
+
+        if vertices_exist:
+            query = cypher_statements.set_edge_properties_of_vertices(prop_key)
+        else:
+            query = cypher_statements.set_edge_properties(prop_key)
+
+        return self.run_batched_transaction(query, 'edges', rows, batch_size)
+
+    def set_edge_property_maps(self, edges, batch_size = None, vertices_exist = False):
+        """
+        Sets several properties of many edges in a single transaction, batch_size edges per UNWIND statement.
+        Creates source/target vertices and edges if they do not exist
+
+        :param edges: List[(source_vertex_id, target_vertex_id, Dict[prop_key, prop_value])]
+        :param batch_size: edges per statement. Defaults to self.batch_size
+        :param vertices_exist: [Bool] vertices were created with set_vertices, edges are only created between them
+        :return: [Bool] True if all edges were written
+        :raises ValueError: if a property key is invalid
+        """
+        for prop_key in {prop_key for _, _, prop_values in edges for prop_key in prop_values}:
+            cypher_statements.property_key(prop_key)
+
+        rows = [{'source_vertex_id': str(source_vertex_id),
+                 'target_vertex_id': str(target_vertex_id),
+                 'props':            prop_values} for source_vertex_id, target_vertex_id, prop_values in edges]
+
+        if vertices_exist:
+            query = cypher_statements.SET_EDGE_PROPERTY_MAPS_OF_VERTICES
+        else:
+            query = cypher_statements.SET_EDGE_PROPERTY_MAPS
+
+        return self.run_batched_transaction(query, 'edges', rows, batch_size)
+
+    def set_vertices(self, vertex_ids, batch_size = None):
+        """
+        Creates the vertices that do not exist, in a single transaction
+
+        :param vertex_ids: List[String]
+        :param batch_size: vertices per statement. Defaults to self.batch_size
+        :return: [Bool] True if all vertices were written
+        """
+        return self.run_batched_transaction(cypher_statements.SET_VERTICES, 'vertex_ids',
+                                            [str(vertex_id) for vertex_id in vertex_ids], batch_size)
+
+    def get_adjacent_edges(self, source_vertex_id, prop_key, page_size = None):
+        """
+        Streams the outgoing edges of source vertex that have prop_key, ordered by target_vertex_id.
+        Edges are fetched page_size at a time, each page resuming after the last target_vertex_id of the previous one
+
+        :param source_vertex_id: uuid identifying the source vertex id
+        :param prop_key: desired property key
+        :param page_size: edges per query. Defaults to self.page_size
+        :return: Iterator[(target_vertex_id, prop_value)]
+        """
+        page_size = page_size or self.page_size
+        cursor    = ""
+
+        while True:
+            bolt_statement_res = self.run_read_query(cypher_statements.get_adjacent_edges(prop_key),
+                                                {'source_vertex_id': str(source_vertex_id),
+                                                 'cursor':           cursor,
+                                                 'page_size':        page_size})
+
+            if bolt_statement_res is None:
+                raise IOError(f'Failed to read adjacent edges of vertex {source_vertex_id} in {self.graph_uuid}')
+
+            page = [(res['target_vertex_id'], res['value']) for res in bolt_statement_res]
+
+            yield from page
+
+            if len(page) < page_size:
+                return
+
+            cursor = page[-1][0]
+
+    def get_many_adjacent_edges(self, source_vertex_ids, prop_key, batch_size = None):
+        """
+        Gets the outgoing edges that have prop_key of many source vertices, batch_size vertices per UNWIND query
+
+        :param source_vertex_ids: List[source_vertex_id]
+        :param prop_key: desired property key
+        :param batch_size: source vertices per query. Defaults to self.batch_size
+        :return: Dict[source_vertex_id, List[(target_vertex_id, prop_value)]] for the vertices that have edges.
+                 None on error
+        """
+        batch_size = batch_size or self.batch_size
+
+        source_vertex_ids = [str(source_vertex_id) for source_vertex_id in source_vertex_ids]
+
+        adjacent_edges = {}
+
+        for start in range(0, len(source_vertex_ids), batch_size):
+            bolt_statement_res = self.run_read_query(cypher_statements.get_many_adjacent_edges(prop_key),
+                                                {'source_vertex_ids': source_vertex_ids[start:start + batch_size]})
+
+            if bolt_statement_res is None:
+                return None
+
+            for res in bolt_statement_res:
+                adjacent_edges.setdefault(res['source_vertex_id'], []).append((res['target_vertex_id'], res['value']))
+
+        return adjacent_edges
+
+    def get_edges(self, prop_key, page_size = None):
+        """
+        Streams every edge of the graph that has prop_key, ordered by (source_vertex_id, target_vertex_id).
+        The edges are read lazily from one query: re-running a keyset page query would scan and sort every
+        remaining edge for each page
+
+        :param prop_key: desired property key
+        :param page_size: unused, records are read from the connection as they are consumed
+        :return: Iterator[(source_vertex_id, target_vertex_id, prop_value)]
+        :raises IOError: if the query fails
+        """
+        for res in self.stream_query(cypher_statements.get_edges(prop_key)):
+            yield res['source_vertex_id'], res['target_vertex_id'], res['value']
+
+    def get_edge_property_keys(self):
+        """
+        Gets the property keys set on edges of the graph
+
+        :return: Set[String]
+        """
+        bolt_statement_res = self.run_read_query(cypher_statements.GET_EDGE_PROPERTY_KEYS)
 
-        bolt_statement_res = self.run_query(cypher_query)
+        if bolt_statement_res is None:
+            raise IOError(f'Failed to read edge property keys of {self.graph_uuid}')
 
-        return True if bolt_statement_res else False
\ No newline at end of file
+        return {res['value'] for res in bolt_statement_res}
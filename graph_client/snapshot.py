@@ -0,0 +1,265 @@
+"""
+Graph snapshots: a committed graph in CSR layout written to a single columnar binary file that can be
+memory-mapped and served as a CompactGraph without copying or parsing its edges.
+
+Layout, little-endian, every section aligned to 8 bytes:
+  - header:            magic, format version, num_vertices, num_edges, num_weights
+  - graph_uuid:        string table of 1 entry
+  - weight ids:        string table of num_weights entries
+  - vertex dictionary: string table of num_vertices entries, sorted
+  - offsets:           int64[num_vertices + 1]
+  - targets:           int64[num_edges]
+  - weights:           float64[num_edges] per weight id, in weight id order. NaN where the edge has no value
+
+A string table is int64[count + 1] offsets into the UTF-8 encoded strings that follow them.
+
+Snapshots hold the effective edges of a version, its parent chain resolved and deleted edges dropped
+"""
+import bisect
+import heapq
+import itertools
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from graph_client.memory_graph_client import CompactGraph, as_float
+
+MAGIC          = b'RPLSNAP\x00'
+FORMAT_VERSION = 1
+
+HEADER         = struct.Struct('<8sIIqqq')
+ALIGNMENT      = 8
+
+
+class SnapshotError(Exception):
+    """
+    Raised when a file is not a graph snapshot this version can read
+    """
+    pass
+
+
+def padding(length):
+    return -length % ALIGNMENT
+
+
+def little_endian(values):
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+
+    return values
+
+
+def merge_weight_streams(streams):
+    """
+    Merges per-weight edge streams into one stream of edges carrying every weight
+
+    :param streams: Dict[weight_id, Iterator[(source_vertex_id, target_vertex_id, weight)]] each ordered by
+                    (source_vertex_id, target_vertex_id)
+    :return: Iterator[(source_vertex_id, target_vertex_id, Dict[weight_id, weight])] ordered by edge
+    """
+    def keyed(weight_id, stream):
+        for source_vertex_id, target_vertex_id, weight in stream:
+            yield (source_vertex_id, target_vertex_id), weight_id, weight
+
+    merged = heapq.merge(*[keyed(weight_id, stream) for weight_id, stream in streams.items()],
+                         key=lambda item: item[0])
+
+    for (source_vertex_id, target_vertex_id), items in itertools.groupby(merged, key=lambda item: item[0]):
+        yield source_vertex_id, target_vertex_id, {weight_id: weight for _, weight_id, weight in items}
+
+
+def build_compact_graph(weighted_edges, weight_ids):
+    """
+    Builds a CompactGraph from a stream of edges without materialising the edges as Python objects
+
+    :param weighted_edges: Iterator[(source_vertex_id, target_vertex_id, Dict[weight_id, weight])] ordered by
+                           (source_vertex_id, target_vertex_id), see merge_weight_streams
+    :param weight_ids: List[String] weights kept
+    :return: [CompactGraph]
+    """
+    # vertices are numbered as they are seen and renumbered in sorted order once all are known
+    seen    = {}
+    sources = array('q')
+    targets = array('q')
+    weights = {weight_id: array('d') for weight_id in weight_ids}
+
+    for source_vertex_id, target_vertex_id, values in weighted_edges:
+        sources.append(seen.setdefault(source_vertex_id, len(seen)))
+        targets.append(seen.setdefault(target_vertex_id, len(seen)))
+
+        for weight_id in weight_ids:
+            weights[weight_id].append(as_float(values.get(weight_id)))
+
+    vertex_ids = sorted(seen)
+    interned   = array('q', bytes(8 * len(seen)))
+
+    for index, vertex_id in enumerate(vertex_ids):
+        interned[seen[vertex_id]] = index
+
+    # edges are ordered by source, so counting edges per source is enough to lay out the CSR offsets
+    offsets = array('q', bytes(8 * (len(vertex_ids) + 1)))
+
+    for source in sources:
+        offsets[interned[source] + 1] += 1
+
+    for index in range(len(vertex_ids)):
+        offsets[index + 1] += offsets[index]
+
+    return CompactGraph(vertex_ids, offsets, array('q', (interned[target] for target in targets)), weights)
+
+
+def write_string_table(snapshot_file, strings):
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = array('q', itertools.accumulate([0] + [len(string) for string in encoded]))
+
+    snapshot_file.write(little_endian(offsets).tobytes())
+    snapshot_file.write(b''.join(encoded))
+    snapshot_file.write(bytes(padding(offsets[-1])))
+
+
+def write_snapshot(path, graph_uuid, compact_graph):
+    """
+    Writes compact_graph to path. The file is replaced atomically, readers never see a partial snapshot
+
+    :param path: [String]
+    :param graph_uuid: [String]
+    :param compact_graph: [CompactGraph]
+    :return: [Int] size of the snapshot in bytes
+    """
+    weight_ids = sorted(compact_graph.weights)
+    tmp_path   = f'{path}.tmp'
+
+    with open(tmp_path, 'wb') as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0,
+                                        compact_graph.num_vertices, compact_graph.num_edges, len(weight_ids)))
+
+        write_string_table(snapshot_file, [graph_uuid])
+        write_string_table(snapshot_file, weight_ids)
+        write_string_table(snapshot_file, compact_graph.vertex_ids)
+
+        snapshot_file.write(little_endian(array('q', compact_graph.offsets)).tobytes())
+        snapshot_file.write(little_endian(array('q', compact_graph.targets)).tobytes())
+
+        for weight_id in weight_ids:
+            snapshot_file.write(little_endian(array('d', compact_graph.weights[weight_id])).tobytes())
+
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+
+        size = snapshot_file.tell()
+
+    os.replace(tmp_path, path)
+
+    return size
+
+
+class StringTable():
+    """
+    Read-only sequence of the strings of a string table, decoded on access
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data    = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode('utf-8')
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+
+class SortedVertexIndex():
+    """
+    Maps vertex ids to their position in a sorted vertex dictionary by binary search, so that a
+    memory-mapped vertex dictionary needs no in-memory index
+    """
+
+    def __init__(self, vertex_ids):
+        self.vertex_ids = vertex_ids
+
+    def get(self, vertex_id, default = None):
+        index = bisect.bisect_left(self.vertex_ids, vertex_id)
+
+        return index if index < len(self.vertex_ids) and self.vertex_ids[index] == vertex_id else default
+
+
+class SnapshotReader():
+    """
+    Reads the sections of a snapshot from a buffer, in file order
+    """
+
+    def __init__(self, buffer):
+        self.buffer   = buffer
+        self.position = 0
+
+    def read(self, length):
+        if self.position + length > len(self.buffer):
+            raise SnapshotError('Snapshot is truncated')
+
+        section        = self.buffer[self.position:self.position + length]
+        self.position += length + padding(length)
+
+        return section
+
+    def read_array(self, typecode, count):
+        section = self.read(8 * count)
+
+        if sys.byteorder == 'little':
+            return section.cast(typecode)
+
+        # big-endian hosts cannot read the file in place
+        values = array(typecode, bytes(section))
+        values.byteswap()
+
+        return values
+
+    def read_string_table(self, count):
+        offsets = self.read_array('q', count + 1)
+
+        return StringTable(offsets, self.read(offsets[-1]))
+
+
+def load_snapshot(path):
+    """
+    Memory-maps the snapshot at path. Edges, weights and vertex ids are read from the mapped file on access
+
+    :param path: [String]
+    :return: (graph_uuid, CompactGraph)
+    """
+    with open(path, 'rb') as snapshot_file:
+        if os.fstat(snapshot_file.fileno()).st_size < HEADER.size:
+            raise SnapshotError(f'{path} is not a graph snapshot')
+
+        # the mapping outlives the file descriptor
+        buffer = memoryview(mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    magic, format_version, _, num_vertices, num_edges, num_weights = HEADER.unpack(buffer[:HEADER.size])
+
+    if magic != MAGIC:
+        raise SnapshotError(f'{path} is not a graph snapshot')
+
+    if format_version != FORMAT_VERSION:
+        raise SnapshotError(f'{path} has unsupported snapshot format version {format_version}')
+
+    reader          = SnapshotReader(buffer)
+    reader.position = HEADER.size
+
+    graph_uuid = reader.read_string_table(1)[0]
+    weight_ids = list(reader.read_string_table(num_weights))
+    vertex_ids = reader.read_string_table(num_vertices)
+
+    offsets    = reader.read_array('q', num_vertices + 1)
+    targets    = reader.read_array('q', num_edges)
+    weights    = {weight_id: reader.read_array('d', num_edges) for weight_id in weight_ids}
+
+    return graph_uuid, CompactGraph(vertex_ids, offsets, targets, weights, vertex_index=SortedVertexIndex(vertex_ids))
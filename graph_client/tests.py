@@ -1,3 +1,204 @@
-from django.test import TestCase
+import math
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from graph_client.memory_graph_client import MutableGraph
+from graph_client.neo_graph_client import NeoGraphClient
+from graph_client.snapshot import HEADER, MAGIC, SnapshotError, build_compact_graph, load_snapshot, \
+    merge_weight_streams, write_snapshot
+
+
+class SnapshotTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.path = os.path.join(directory.name, 'tg_v1.snapshot')
+
+        graph = MutableGraph()
+
+        # vertex ids of odd UTF-8 lengths, so that every string table needs padding
+        graph.set_edge_properties([('a', 'bb', 0.5), ('a', 'ccc', 0.25), ('bb', 'é', -1.0), ('ccc', 'a', 2.0)], 'w1')
+        graph.set_edge_properties([('a', 'bb', 3.0), ('ccc', 'a', 4.0)], 'w2')
+
+        self.compact_graph = graph.freeze()
+
+    def test_round_trip(self):
+        size = write_snapshot(self.path, 'tg_v1', self.compact_graph)
+
+        self.assertEqual(size, os.path.getsize(self.path))
+        self.assertFalse(os.path.exists(f'{self.path}.tmp'))
+
+        graph_uuid, loaded = load_snapshot(self.path)
+
+        self.assertEqual(graph_uuid, 'tg_v1')
+        self.assertEqual(list(loaded.vertex_ids), ['a', 'bb', 'ccc', 'é'])
+        self.assertEqual(list(loaded.offsets), list(self.compact_graph.offsets))
+        self.assertEqual(list(loaded.targets), list(self.compact_graph.targets))
+
+        # every section is aligned, so that arrays are cast in place from the mapped file
+        self.assertEqual(size % 8, 0)
+
+        for weight_id in ('w1', 'w2'):
+            self.assertEqual(list(loaded.get_edges(weight_id)), list(self.compact_graph.get_edges(weight_id)))
+
+        self.assertEqual(loaded.get_edge_property('bb', 'é', 'w1'), -1.0)
+        self.assertEqual(loaded.get_edge_property('ccc', 'a', 'w2'), 4.0)
+        self.assertEqual(loaded.get_edge_property_keys(), {'w1', 'w2'})
+
+    def test_missing_weights_are_nan(self):
+        write_snapshot(self.path, 'tg_v1', self.compact_graph)
+
+        _, loaded = load_snapshot(self.path)
+
+        position = loaded.edge_position('a', 'ccc')
+
+        self.assertTrue(math.isnan(loaded.weights['w2'][position]))
+        self.assertIsNone(loaded.get_edge_property('a', 'ccc', 'w2'))
+        self.assertEqual(loaded.get_edge_property('a', 'ccc', 'w1'), 0.25)
+
+    def test_vertex_dictionary_lookup(self):
+        write_snapshot(self.path, 'tg_v1', self.compact_graph)
+
+        _, loaded = load_snapshot(self.path)
+
+        self.assertEqual([loaded.vertex_index.get(vertex_id) for vertex_id in ('a', 'bb', 'ccc', 'é')], [0, 1, 2, 3])
+        self.assertIsNone(loaded.vertex_index.get('b'))
+        self.assertIsNone(loaded.vertex_index.get('z'))
+
+        self.assertIsNone(loaded.edge_position('a', 'é'))
+        self.assertIsNone(loaded.get_edge_property('missing', 'a', 'w1'))
+        self.assertEqual(list(loaded.get_adjacent_edges('a', 'w1')), [('bb', 0.5), ('ccc', 0.25)])
+
+    def test_empty_graph(self):
+        write_snapshot(self.path, 'tg_v1', MutableGraph().freeze())
+
+        graph_uuid, loaded = load_snapshot(self.path)
+
+        self.assertEqual((graph_uuid, loaded.num_vertices, loaded.num_edges), ('tg_v1', 0, 0))
+
+    def test_bad_magic(self):
+        with open(self.path, 'wb') as snapshot_file:
+            snapshot_file.write(b'NOTASNAP' + bytes(HEADER.size))
+
+        with self.assertRaisesRegex(SnapshotError, 'not a graph snapshot'):
+            load_snapshot(self.path)
+
+    def test_short_file(self):
+        with open(self.path, 'wb') as snapshot_file:
+            snapshot_file.write(MAGIC)
+
+        with self.assertRaisesRegex(SnapshotError, 'not a graph snapshot'):
+            load_snapshot(self.path)
+
+    def test_unsupported_format_version(self):
+        write_snapshot(self.path, 'tg_v1', self.compact_graph)
+
+        with open(self.path, 'r+b') as snapshot_file:
+            snapshot_file.seek(len(MAGIC))
+            snapshot_file.write((99).to_bytes(4, 'little'))
+
+        with self.assertRaisesRegex(SnapshotError, 'format version 99'):
+            load_snapshot(self.path)
+
+    def test_truncated(self):
+        size = write_snapshot(self.path, 'tg_v1', self.compact_graph)
+
+        with open(self.path, 'r+b') as snapshot_file:
+            snapshot_file.truncate(size - 8)
+
+        with self.assertRaisesRegex(SnapshotError, 'truncated'):
+            load_snapshot(self.path)
+
+    def test_build_compact_graph_from_weight_streams(self):
+        streams = {weight_id: self.compact_graph.get_edges(weight_id) for weight_id in ('w1', 'w2')}
+
+        compact_graph = build_compact_graph(merge_weight_streams(streams), ['w1', 'w2'])
+
+        self.assertEqual(list(compact_graph.vertex_ids), list(self.compact_graph.vertex_ids))
+        self.assertEqual(list(compact_graph.offsets), list(self.compact_graph.offsets))
+        self.assertEqual(list(compact_graph.targets), list(self.compact_graph.targets))
+
+        for weight_id in ('w1', 'w2'):
+            self.assertEqual(list(compact_graph.get_edges(weight_id)), list(self.compact_graph.get_edges(weight_id)))
+
+
+class FakeSession():
+    def __init__(self, records, error = None):
+        self.records = records
+        self.error   = error
+        self.queries = []
+        self.read    = 0
+        self.closed  = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.closed = True
+
+    def run(self, query, parameters):
+        self.queries.append((query, parameters))
+
+        if self.error:
+            raise self.error
+
+        return self.iter_records()
+
+    def iter_records(self):
+        for record in self.records:
+            self.read += 1
+
+            yield record
+
+
+class FakeRegistry():
+    def __init__(self, session):
+        self.session = session
+
+    def get_driver(self, url, username, password):
+        return mock.Mock(session=lambda: self.session)
+
+
+class NeoGraphClientGetEdgesTest(SimpleTestCase):
+    def graph_client(self, session):
+        return NeoGraphClient('tg_v1', 'bolt://neo4j', 'neo4j', 'secret', registry=FakeRegistry(session),
+                              page_size=2)
+
+    def test_streams_edges_from_one_query(self):
+        session = FakeSession([{'source_vertex_id': source_vertex_id, 'target_vertex_id': target_vertex_id,
+                                'value': 0.5} for source_vertex_id, target_vertex_id in
+                               [('a', 'b'), ('a', 'c'), ('b', 'c'), ('c', 'a'), ('c', 'b')]])
+
+        edges = self.graph_client(session).get_edges('w')
+
+        self.assertEqual(next(edges), ('a', 'b', 0.5))
+
+        # records are read as they are consumed, while the session stays open
+        self.assertEqual((session.read, session.closed), (1, False))
+
+        self.assertEqual([edge[:2] for edge in edges], [('a', 'c'), ('b', 'c'), ('c', 'a'), ('c', 'b')])
+
+        # however many edges, the graph is scanned and sorted once
+        self.assertEqual(len(session.queries), 1)
+        self.assertEqual(session.queries[0][1], {'graph_uuid': 'tg_v1'})
+        self.assertTrue(session.closed)
+
+    def test_closing_the_stream_closes_the_session(self):
+        session = FakeSession([{'source_vertex_id': 'a', 'target_vertex_id': 'b', 'value': 0.5}] * 3)
+
+        edges = self.graph_client(session).get_edges('w')
+
+        next(edges)
+        edges.close()
+
+        self.assertTrue(session.closed)
+
+    def test_failed_query(self):
+        session = FakeSession([], error=ValueError('connection refused'))
+
+        with self.assertLogs(level='ERROR'), self.assertRaises(IOError):
+            list(self.graph_client(session).get_edges('w'))
@@ -0,0 +1,29 @@
+"""
+gunicorn configuration for temporal_graph
+
+Workers are threaded (gthread): each worker process serves up to `threads` requests concurrently, so a worker
+blocked on Postgres or Neo4j for one request keeps serving the others. The number of worker processes is set
+by WEB_CONCURRENCY.
+
+Neo4j drivers are shared per worker process (see graph_client.driver_registry). They are created lazily after
+the fork and closed when the worker exits. Concurrent Neo4j sessions are bounded by NEO4J_MAX_SESSIONS, threads
+beyond that queue for a session, so threads default to at most NEO4J_MAX_SESSIONS.
+
+Django opens one Postgres connection per serving thread. Under gthread DATABASE_CONN_MAX_AGE defaults to 0 (see
+temporal_graph.settings), closing it at the end of each request. Persistent connections (DATABASE_CONN_MAX_AGE > 0)
+are held by idle threads too and need a budget of
+    GUNICORN_THREADS x WEB_CONCURRENCY x dynos <= Postgres max_connections
+"""
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads      = int(os.environ.get('GUNICORN_THREADS', min(16, int(os.environ.get('NEO4J_MAX_SESSIONS', 50)))))
+
+# idle keep-alive connections are held by the gthread worker without occupying a thread
+keepalive    = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+
+def worker_exit(server, worker):
+    from graph_client.driver_registry import driver_registry
+
+    driver_registry.close_all()
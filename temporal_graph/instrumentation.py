@@ -0,0 +1,197 @@
+"""
+In-process latency instrumentation.
+
+Code paths wrap their stages in `timed(stage)`. Every timing is recorded in a per-stage histogram of the process
+(see metrics, exposed by the metrics endpoint) and, while a request is served, accumulated per request so that
+ServerTimingMiddleware can report it in a Server-Timing response header.
+
+Stages:
+  - request:               whole request, as seen by the middleware
+  - version_resolution:    resolving a (temporal_graph_id, version_id/timestamp) to a GraphVersion
+  - db_query:              Django ORM queries of the engine
+  - neo4j_session_acquire: waiting for a pooled Neo4j session
+  - neo4j_query:           running a Cypher statement until its results are buffered
+  - neo4j_decode:          reading the buffered records
+  - sharded_write:         writing a payload in partitions by a pool of processes
+  - graph_arrays_load:     loading a graph version into NumPy arrays for analytics
+  - analytics:             running one analysis over the arrays of a graph version
+"""
+import bisect
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+INSTRUMENTATION_ENABLED = os.environ.get('RIPPLE_INSTRUMENTATION', 'true').lower() == 'true'
+
+# per-request Server-Timing headers expose internals, so they are opt-in
+SERVER_TIMING_ENABLED   = os.environ.get('RIPPLE_SERVER_TIMING', 'false').lower() == 'true'
+
+# upper bounds of the histogram buckets, in milliseconds. Latencies above the last bound fall in an overflow bucket
+BUCKET_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram():
+    """
+    Thread-safe latency histogram with fixed buckets. Percentiles are estimated as the upper bound of the bucket
+    holding them
+
+    """
+
+    def __init__(self, bounds = BUCKET_BOUNDS_MS):
+        self.bounds = bounds
+
+        self._counts = [0] * (len(bounds) + 1)
+        self._lock   = threading.Lock()
+
+        self.count   = 0
+        self.sum_ms  = 0.0
+        self.max_ms  = 0.0
+
+    def record(self, duration_ms):
+        bucket = bisect.bisect_left(self.bounds, duration_ms)
+
+        with self._lock:
+            self._counts[bucket] += 1
+
+            self.count  += 1
+            self.sum_ms += duration_ms
+            self.max_ms  = max(self.max_ms, duration_ms)
+
+    def percentile(self, counts, count, pct):
+        """
+        :param counts: bucket counts of a snapshot
+        :param count: number of latencies recorded in counts
+        :param pct: [Float] percentile, 0 to 100
+        :return: [Float] upper bound in ms of the bucket holding the percentile, None if empty
+        """
+        if not count:
+            return None
+
+        rank = pct / 100 * count
+
+        for bucket, cumulative in enumerate(itertools.accumulate(counts)):
+            if cumulative >= rank:
+                return self.bounds[bucket] if bucket < len(self.bounds) else self.max_ms
+
+    def snapshot(self):
+        with self._lock:
+            counts, count, sum_ms, max_ms = list(self._counts), self.count, self.sum_ms, self.max_ms
+
+        return {
+            'count':   count,
+            'mean_ms': sum_ms / count if count else None,
+            'max_ms':  max_ms,
+            'p50_ms':  self.percentile(counts, count, 50),
+            'p90_ms':  self.percentile(counts, count, 90),
+            'p99_ms':  self.percentile(counts, count, 99),
+            'buckets': {str(bound): bucket_count for bound, bucket_count in zip(self.bounds + ('inf',), counts)},
+        }
+
+
+class Metrics():
+    """
+    Process-wide histograms keyed by stage
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock       = threading.Lock()
+
+    def histogram(self, stage):
+        histogram = self._histograms.get(stage)
+
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, Histogram())
+
+        return histogram
+
+    def record(self, stage, duration_ms):
+        self.histogram(stage).record(duration_ms)
+
+    def snapshot(self):
+        return {stage: histogram.snapshot() for stage, histogram in sorted(self._histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+
+metrics = Metrics()
+
+# timings of the request served by the current thread: stage -> (total ms, count)
+_request = threading.local()
+
+
+def start_request():
+    _request.timings = {}
+
+
+def end_request():
+    timings = getattr(_request, 'timings', None) or {}
+
+    _request.timings = None
+
+    return timings
+
+
+@contextmanager
+def timed(stage):
+    """
+    Times the enclosed block as stage
+
+    :param stage: [String] stage name, a token as allowed in a Server-Timing header
+    """
+    if not INSTRUMENTATION_ENABLED:
+        yield
+        return
+
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        metrics.record(stage, duration_ms)
+
+        timings = getattr(_request, 'timings', None)
+
+        if timings is not None:
+            total_ms, count = timings.get(stage, (0.0, 0))
+            timings[stage]  = (total_ms + duration_ms, count + 1)
+
+
+def server_timing_header(timings):
+    """
+    :param timings: Dict[stage, (total ms, count)]
+    :return: [String] Server-Timing header value
+    """
+    return ', '.join(f'{stage};dur={total_ms:.3f};desc="{count}x"' for stage, (total_ms, count) in timings.items())
+
+
+class ServerTimingMiddleware():
+    """
+    Times every request and, with RIPPLE_SERVER_TIMING, reports the time spent per stage in a Server-Timing header.
+    Stages of a streamed response that run after the headers are sent are only recorded in the histograms
+
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start_request()
+
+        try:
+            with timed('request'):
+                response = self.get_response(request)
+        finally:
+            timings = end_request()
+
+        if SERVER_TIMING_ENABLED and timings:
+            response['Server-Timing'] = server_timing_header(timings)
+
+        return response
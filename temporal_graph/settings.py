@@ -41,10 +41,12 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'api.apps.ApiConfig',
     'graph_client.apps.GraphClientConfig',
+    'temporal_graph_engine.apps.TemporalGraphEngineConfig',
     'time_series_client.apps.TimeSeriesClientConfig'
 ]
 
 MIDDLEWARE = [
+    'temporal_graph.instrumentation.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -112,7 +114,12 @@ USE_L10N = True
 USE_TZ = True
 
 # Change 'default' database configuration with $DATABASE_URL.
-DATABASES['default'].update(dj_database_url.config(conn_max_age=500))
+# Connections are opened per serving thread. Under threaded gunicorn workers they are closed after each request
+# unless DATABASE_CONN_MAX_AGE is set, see the connection budget in gunicorn.conf.py
+DATABASE_CONN_MAX_AGE = 0 if os.environ.get('GUNICORN_WORKER_CLASS', 'gthread') == 'gthread' else 500
+
+DATABASES['default'].update(dj_database_url.config(
+    conn_max_age=int(os.environ.get('DATABASE_CONN_MAX_AGE', DATABASE_CONN_MAX_AGE))))
 
 # Honor the 'X-Forwarded-Proto' header for request.is_secure()
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -16,12 +16,23 @@ Including another URLconf
 from django.conf.urls import url
 from django.contrib import admin
 
-from api.views import GraphConstructionView, UserWeightView, WeightView, AdjacencyView
+from api.views import GraphConstructionView, ConstructionJobView, ConstructionJobStatusView, GraphStreamView, \
+    UserWeightView, WeightView, BulkWeightView, MultiWeightView, AdjacencyView, NeighbourhoodView, \
+    UserNeighboursView, WeightHistoryView, VersionDiffView, AnalyticsView, CacheStatsView, MetricsView
 
 urlpatterns = [
     # GraphConstructionView POST
     url(r'^graph/(?P<temporal_graph_id>\w{1,50})/(?P<weight_id>\w{1,50})$', GraphConstructionView.as_view()),
 
+    # ConstructionJobView POST: queue a graph construction for the construction workers
+    url(r'^construction-jobs/(?P<temporal_graph_id>\w{1,50})/(?P<weight_id>\w{1,50})$', ConstructionJobView.as_view()),
+
+    # ConstructionJobStatusView GET: progress and per-batch throughput of a construction job
+    url(r'^construction-jobs/(?P<job_id>\d+)$', ConstructionJobStatusView.as_view()),
+
+    # GraphStreamView POST NDJSON upload, GET upload progress
+    url(r'^graph-stream/(?P<temporal_graph_id>\w{1,50})/(?P<weight_id>\w{1,50})$', GraphStreamView.as_view()),
+
     # only GET on WeightView is implemented
     url(
         r'^weight/(?P<temporal_graph_id>\w{1,50})/(?P<weight_id>\w{1,50})/'
@@ -29,12 +40,37 @@ urlpatterns = [
         WeightView.as_view()
     ),
 
+    # BulkWeightView POST
+    url(r'^weights/(?P<temporal_graph_id>\w{1,50})/(?P<weight_id>\w{1,50})$', BulkWeightView.as_view()),
+
+    # MultiWeightView GET: all or some weights of an edge
+    url(
+        r'^multi-weight/(?P<temporal_graph_id>\w{1,50})/(?P<source_vertex_id>\w{1,50})/(?P<target_vertex_id>\w{1,50})$',
+        MultiWeightView.as_view()
+    ),
+
+    # MultiWeightView POST: all or some weights of many edges
+    url(r'^multi-weights/(?P<temporal_graph_id>\w{1,50})$', MultiWeightView.as_view()),
+
     # AdjacencyView GET
     url(
         r'^adjacent/(?P<temporal_graph_id>\w{1,50})/(?P<weight_id>\w{1,50})/(?P<source_vertex_id>\w{1,50})$',
         AdjacencyView.as_view()
     ),
 
+    # WeightHistoryView GET
+    url(
+        r'^weight-history/(?P<temporal_graph_id>\w{1,50})/(?P<weight_id>\w{1,50})/'
+        r'(?P<source_vertex_id>\w{1,50})/(?P<target_vertex_id>\w{1,50})$',
+        WeightHistoryView.as_view()
+    ),
+
+    # NeighbourhoodView GET
+    url(
+        r'^neighbourhood/(?P<temporal_graph_id>\w{1,50})/(?P<weight_id>\w{1,50})/(?P<source_vertex_id>\w{1,50})$',
+        NeighbourhoodView.as_view()
+    ),
+
     # UserWeightView GET
     url(
         r'^user-weight/(?P<temporal_graph_id>\w{1,50})/(?P<weight_id>\w{1,50})/'
@@ -47,4 +83,22 @@ urlpatterns = [
         r'^user-weight/(?P<temporal_graph_id>\w{1,50})/(?P<weight_id>\w{1,50})',
         UserWeightView.as_view()
     ),
+
+    # UserNeighboursView GET
+    url(
+        r'^user-neighbours/(?P<temporal_graph_id>\w{1,50})/(?P<weight_id>\w{1,50})/(?P<source_vertex_id>\w{1,50})$',
+        UserNeighboursView.as_view()
+    ),
+
+    # VersionDiffView GET: edges added, removed and reweighted between two versions, streamed
+    url(r'^diff/(?P<temporal_graph_id>\w{1,50})/(?P<weight_id>\w{1,50})$', VersionDiffView.as_view()),
+
+    # AnalyticsView GET: PageRank, degree and weight statistics of a graph version
+    url(r'^analytics/(?P<temporal_graph_id>\w{1,50})/(?P<weight_id>\w{1,50})$', AnalyticsView.as_view()),
+
+    # CacheStatsView GET
+    url(r'^cache-stats$', CacheStatsView.as_view()),
+
+    # MetricsView GET: per-stage latency histograms and cache stats
+    url(r'^metrics$', MetricsView.as_view()),
 ]
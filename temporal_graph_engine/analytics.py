@@ -0,0 +1,237 @@
+"""
+Whole-graph analytics of a graph version with NumPy.
+
+The edges of one weight of a version are loaded once into GraphArrays, integer source/target positions and float
+weights, and every analysis is a handful of vectorised passes over these arrays:
+  - pagerank: weighted PageRank by power iteration
+  - degree:   in/out degree and weighted in/out degree (strength) of every vertex
+  - weights:  summary statistics and histogram of the edge weights
+"""
+import bisect
+import os
+from array import array
+
+import numpy as np
+
+from graph_client.graph_client import TOMBSTONE
+
+PAGERANK_DAMPING        = float(os.environ.get('RIPPLE_PAGERANK_DAMPING', 0.85))
+PAGERANK_TOLERANCE      = float(os.environ.get('RIPPLE_PAGERANK_TOLERANCE', 1e-6))
+PAGERANK_MAX_ITERATIONS = int(os.environ.get('RIPPLE_PAGERANK_MAX_ITERATIONS', 100))
+
+WEIGHT_HISTOGRAM_BINS   = int(os.environ.get('RIPPLE_WEIGHT_HISTOGRAM_BINS', 10))
+
+WEIGHT_PERCENTILES      = (1, 5, 25, 50, 75, 95, 99)
+
+ANALYSES                = ('pagerank', 'degree', 'weights')
+
+
+class GraphArrays():
+    """
+    Edges of one weight of a graph version as NumPy arrays:
+      - vertex_ids: sorted ids of the vertices with at least one edge, a vertex is referred to by its position
+      - sources, targets: int64 position of the source and target vertex of every edge
+      - weights: float64 weight of every edge
+
+    """
+
+    def __init__(self, vertex_ids, sources, targets, weights):
+        self.vertex_ids = vertex_ids
+        self.sources    = sources
+        self.targets    = targets
+        self.weights    = weights
+
+    @property
+    def num_vertices(self):
+        return len(self.vertex_ids)
+
+    @property
+    def num_edges(self):
+        return len(self.weights)
+
+    def vertex_position(self, vertex_id):
+        position = bisect.bisect_left(self.vertex_ids, vertex_id)
+
+        return position if position < len(self.vertex_ids) and self.vertex_ids[position] == vertex_id else None
+
+    @classmethod
+    def from_edges(cls, edges):
+        """
+        :param edges: Iterator[(source_vertex_id, target_vertex_id, weight)] e.g. iter_graph_version_edges
+        :return: [GraphArrays]
+        """
+        # vertices are numbered as they are seen and renumbered in sorted order once all are known
+        seen    = {}
+        sources = array('q')
+        targets = array('q')
+        weights = array('d')
+
+        for source_vertex_id, target_vertex_id, weight in edges:
+            sources.append(seen.setdefault(source_vertex_id, len(seen)))
+            targets.append(seen.setdefault(target_vertex_id, len(seen)))
+            weights.append(weight)
+
+        seen_ids   = list(seen)
+        order      = sorted(range(len(seen_ids)), key=seen_ids.__getitem__)
+
+        positions        = np.empty(len(seen_ids), dtype=np.int64)
+        positions[order] = np.arange(len(seen_ids), dtype=np.int64)
+
+        return cls([seen_ids[index] for index in order],
+                   positions[np.asarray(sources, dtype=np.int64)],
+                   positions[np.asarray(targets, dtype=np.int64)],
+                   np.asarray(weights, dtype=np.float64))
+
+    @classmethod
+    def from_compact_graph(cls, compact_graph, weight_id):
+        """
+        Reads the CSR arrays of a CompactGraph holding every edge of its version without iterating its edges
+
+        :param compact_graph: [CompactGraph]
+        :param weight_id: [String]
+        :return: [GraphArrays]
+        """
+        offsets = np.asarray(compact_graph.offsets, dtype=np.int64)
+        targets = np.asarray(compact_graph.targets, dtype=np.int64)
+
+        if weight_id in compact_graph.weights:
+            weights = np.asarray(compact_graph.weights[weight_id], dtype=np.float64)
+        else:
+            weights = np.full(len(targets), np.nan)
+
+        sources = np.repeat(np.arange(compact_graph.num_vertices, dtype=np.int64), np.diff(offsets))
+
+        # NaN: the edge has no weight_id, TOMBSTONE: the edge was removed
+        kept    = ~np.isnan(weights) & (weights != TOMBSTONE)
+
+        sources, targets, weights = sources[kept], targets[kept], weights[kept]
+
+        # vertex_ids of the CompactGraph are sorted, so are those of the vertices left
+        used    = np.unique(np.concatenate((sources, targets)))
+
+        return cls([compact_graph.vertex_ids[index] for index in used.tolist()],
+                   np.searchsorted(used, sources),
+                   np.searchsorted(used, targets),
+                   weights)
+
+
+def pagerank(graph_arrays,
+             damping = PAGERANK_DAMPING,
+             tolerance = PAGERANK_TOLERANCE,
+             max_iterations = PAGERANK_MAX_ITERATIONS):
+    """
+    Weighted PageRank: a vertex passes its rank to its targets in proportion to the weights of its edges.
+    Negative weights pass no rank. The rank of vertices without outgoing weight is spread over every vertex
+
+    :param graph_arrays: [GraphArrays]
+    :param damping: [Float]
+    :param tolerance: [Float] iteration stops once the L1 change of the ranks is below tolerance
+    :param max_iterations: [Int]
+    :return: {'scores': float64 array aligned with vertex_ids, summing to 1, 'iterations': Int, 'converged': Bool}
+    """
+    num_vertices = graph_arrays.num_vertices
+
+    if not num_vertices:
+        return {'scores': np.zeros(0), 'iterations': 0, 'converged': True}
+
+    weights      = np.clip(graph_arrays.weights, 0, None)
+    out_strength = np.bincount(graph_arrays.sources, weights, minlength=num_vertices)
+    dangling     = out_strength == 0
+
+    source_strength = out_strength[graph_arrays.sources]
+    transition      = np.divide(weights, source_strength, out=np.zeros_like(weights), where=source_strength > 0)
+
+    scores    = np.full(num_vertices, 1 / num_vertices)
+    converged = False
+    iteration = 0
+
+    for iteration in range(1, max_iterations + 1):
+        received   = np.bincount(graph_arrays.targets, scores[graph_arrays.sources] * transition,
+                                 minlength=num_vertices)
+
+        new_scores = damping * (received + scores[dangling].sum() / num_vertices) + (1 - damping) / num_vertices
+        change     = np.abs(new_scores - scores).sum()
+        scores     = new_scores
+
+        if change < tolerance:
+            converged = True
+            break
+
+    return {'scores': scores, 'iterations': iteration, 'converged': converged}
+
+
+def degrees(graph_arrays):
+    """
+    :param graph_arrays: [GraphArrays]
+    :return: Dict[measure, array aligned with vertex_ids] of in_degree, out_degree, in_strength and out_strength,
+             strength being the sum of the weights of the edges
+    """
+    num_vertices = graph_arrays.num_vertices
+
+    return {
+        'in_degree':    np.bincount(graph_arrays.targets, minlength=num_vertices),
+        'out_degree':   np.bincount(graph_arrays.sources, minlength=num_vertices),
+        'in_strength':  np.bincount(graph_arrays.targets, graph_arrays.weights, minlength=num_vertices),
+        'out_strength': np.bincount(graph_arrays.sources, graph_arrays.weights, minlength=num_vertices),
+    }
+
+
+def weight_stats(weights, bins = WEIGHT_HISTOGRAM_BINS):
+    """
+    :param weights: float64 array
+    :param bins: [Int] number of histogram bins
+    :return: [Dict] count, sum, min, max, mean, std, percentiles and histogram of weights
+    """
+    if not len(weights):
+        return {'count': 0, 'sum': 0.0, 'min': None, 'max': None, 'mean': None, 'std': None,
+                'percentiles': {}, 'histogram': {'bin_edges': [], 'counts': []}}
+
+    counts, bin_edges = np.histogram(weights, bins=bins)
+
+    return {
+        'count':       int(len(weights)),
+        'sum':         float(weights.sum()),
+        'min':         float(weights.min()),
+        'max':         float(weights.max()),
+        'mean':        float(weights.mean()),
+        'std':         float(weights.std()),
+        'percentiles': {str(pct): float(value)
+                        for pct, value in zip(WEIGHT_PERCENTILES, np.percentile(weights, WEIGHT_PERCENTILES))},
+        'histogram':   {'bin_edges': bin_edges.tolist(), 'counts': counts.tolist()},
+    }
+
+
+def analyse(analysis, graph_arrays):
+    """
+    :param analysis: [String] one of ANALYSES
+    :param graph_arrays: [GraphArrays]
+    :return: result of the analysis
+    """
+    if analysis == 'pagerank':
+        return pagerank(graph_arrays)
+    elif analysis == 'degree':
+        return degrees(graph_arrays)
+    elif analysis == 'weights':
+        return weight_stats(graph_arrays.weights)
+
+    raise ValueError(f'Unknown analysis {analysis}, expected one of {", ".join(ANALYSES)}')
+
+
+def top_vertices(graph_arrays, scores, k):
+    """
+    :param graph_arrays: [GraphArrays]
+    :param scores: array aligned with vertex_ids
+    :param k: [Int]
+    :return: List[(vertex_id, score)] k best scored vertices, best first, ties by vertex id
+    """
+    k = min(k, len(scores))
+
+    if k <= 0:
+        return []
+
+    # every vertex scoring as the k-th best is a candidate, so that ties are broken by vertex id
+    kth = -np.partition(-scores, k - 1)[k - 1]
+    top = np.flatnonzero(scores >= kth)
+    top = top[np.lexsort((top, -scores[top]))][:k]
+
+    return [(graph_arrays.vertex_ids[position], scores[position].item()) for position in top.tolist()]
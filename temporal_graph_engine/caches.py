@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import OrderedDict
+
+# returned by get() on a miss, so that None can be cached as a value
+MISSING = object()
+
+
+class LRUCache():
+    """
+    Thread-safe, size-bounded cache that evicts the least recently used entry.
+    Keeps hit/miss/eviction counters so that it can be sized
+
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+
+        self._entries = OrderedDict()
+        self._lock    = threading.Lock()
+
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        :param key:
+        :return: cached value or MISSING
+        """
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return MISSING
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+
+        return {
+            'size':      len(self._entries),
+            'max_size':  self.max_size,
+            'hits':      self.hits,
+            'misses':    self.misses,
+            'evictions': self.evictions,
+            'hit_rate':  self.hits / lookups if lookups else None,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TTLCache():
+    """
+    Thread-safe cache whose entries expire ttl seconds after they are set.
+    Keeps hit/miss counters
+
+    """
+
+    def __init__(self, ttl, clock = time.monotonic):
+        self.ttl   = ttl
+        self.clock = clock
+
+        self._entries = {}
+        self._lock    = threading.Lock()
+
+        self.hits   = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        :param key:
+        :return: cached value or MISSING if absent or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[0] <= self.clock():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return MISSING
+
+            self.hits += 1
+
+            return entry[1]
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+
+        return {
+            'size':     len(self._entries),
+            'ttl':      self.ttl,
+            'hits':     self.hits,
+            'misses':   self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class Flight():
+    """
+    A call in progress, shared by every caller of the same key
+    """
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done   = threading.Event()
+        self.result = None
+        self.error  = None
+
+
+class SingleFlight():
+    """
+    Collapses concurrent calls for the same key into one: the first caller runs the call, callers arriving while
+    it is in flight wait for it and share its result or exception. Keeps leader/shared counters
+
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock    = threading.Lock()
+
+        self.calls    = 0
+        self.shared   = 0
+
+    def do(self, key, fn):
+        """
+        :param key: identifies the call
+        :param fn: callable run once for all concurrent callers of key
+        :return: result of fn
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+
+            if flight is None:
+                flight = self._flights[key] = Flight()
+                leader = True
+
+                self.calls  += 1
+            else:
+                leader = False
+
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+
+            if flight.error is not None:
+                raise flight.error
+
+            return flight.result
+
+        try:
+            flight.result = fn()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+            flight.done.set()
+
+        return flight.result
+
+    def stats(self):
+        return {
+            'in_flight': len(self._flights),
+            'calls':     self.calls,
+            'shared':    self.shared,
+        }
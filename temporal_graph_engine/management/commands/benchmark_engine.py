@@ -0,0 +1,306 @@
+import json
+import platform
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from graph_client.memory_graph_client import memory_graph_store
+from temporal_graph_engine.temporal_graph_engine import TemporalGraphEngine
+
+DEGREE_DISTRIBUTIONS = ('uniform', 'powerlaw')
+
+
+class Rollback(Exception):
+    pass
+
+
+class BenchmarkEngine(TemporalGraphEngine):
+    """
+    TemporalGraphEngine writing and reading graphs with graph_client_class instead of the configured backend
+    """
+
+    def __init__(self, graph_client_class):
+        self.graph_client_class = graph_client_class
+        self.graph_uuids        = set()
+
+    def get_graph_client(self, graph_uuid):
+        self.graph_uuids.add(graph_uuid)
+
+        return self.graph_client_class(graph_uuid)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+
+    return sorted_values[index]
+
+
+def clear_caches():
+    TemporalGraphEngine.edge_weight_cache.clear()
+    TemporalGraphEngine.graph_version_cache.clear()
+    TemporalGraphEngine.latest_version_cache.clear()
+
+
+class Command(BaseCommand):
+    help = 'Generates a synthetic temporal graph and reports throughput and latency percentiles of construct_graph, ' \
+           'get_edge_weight, get_user_edge_weight and set_user_edge_weight as JSON. Runs against the configured ' \
+           'database (e.g. DATABASE_URL=sqlite:///bench.sqlite3) and the in-memory GraphClient unless --graph-client ' \
+           'is given. Database rows are rolled back and in-memory graphs dropped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vertices', type=int, default=10000)
+        parser.add_argument('--avg-degree', type=float, default=10.0)
+        parser.add_argument('--degree-distribution', choices=DEGREE_DISTRIBUTIONS, default='powerlaw')
+        parser.add_argument('--powerlaw-exponent', type=float, default=2.1,
+                            help='exponent of the out-degree distribution with --degree-distribution powerlaw')
+        parser.add_argument('--versions', type=int, default=5,
+                            help='a full version followed by delta versions of it')
+        parser.add_argument('--churn', type=float, default=0.05,
+                            help='fraction of edges changed (a tenth of them removed) by each delta version')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--override-density', type=float, default=0.01,
+                            help='fraction of the edges of the latest version with a user-edge weight')
+        parser.add_argument('--reads', type=int, default=10000)
+        parser.add_argument('--writes', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='edges per construct_graph call')
+        parser.add_argument('--graph-client', default='graph_client.memory_graph_client.InMemoryGraphClient',
+                            help='dotted path of the GraphClient class to benchmark')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default=None,
+                            help='write the JSON results to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['versions'] < 1 or options['vertices'] < 2:
+            raise CommandError('At least 1 version and 2 vertices are required')
+
+        try:
+            graph_client_class = import_string(options['graph_client'])
+        except ImportError as e:
+            raise CommandError(f'Cannot import GraphClient {options["graph_client"]}: {e}')
+
+        self.random            = random.Random(options['seed'])
+        self.temporal_graph_id = f'bench_{uuid.uuid4().hex[:12]}'
+        self.weight_id         = 'bench'
+
+        tge     = BenchmarkEngine(graph_client_class)
+        results = None
+
+        clear_caches()
+
+        try:
+            with transaction.atomic():
+                results = self.run_benchmarks(tge, options)
+
+                raise Rollback()
+        except Rollback:
+            pass
+        finally:
+            for graph_uuid in tge.graph_uuids:
+                memory_graph_store.drop(graph_uuid)
+
+            clear_caches()
+
+        results['parameters'] = {key: options[key] for key in (
+            'vertices', 'avg_degree', 'degree_distribution', 'powerlaw_exponent', 'versions', 'churn', 'users',
+            'override_density', 'reads', 'writes', 'batch_size', 'graph_client', 'seed',
+        )}
+        results['environment'] = {
+            'database': connection.vendor,
+            'python':   platform.python_version(),
+        }
+
+        output = json.dumps(results, indent=2, sort_keys=True)
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def run_benchmarks(self, tge, options):
+        versions = list(self.generate_versions(options))
+
+        # construct_graph: one timed call per batch, the last batch of a version commits it
+        construct_calls = []
+
+        for version_id, edges in enumerate(versions, start=1):
+            batches = [edges[i:i + options['batch_size']] for i in range(0, len(edges), options['batch_size'])]
+
+            for index, batch in enumerate(batches or [[]]):
+                construct_calls.append((version_id, batch, index == len(batches) - 1,
+                                        version_id - 1 if version_id > 1 else None))
+
+        construct = self.measure(
+            lambda call: self.expect(tge.construct_graph(self.temporal_graph_id, self.weight_id, call[0], call[1],
+                                                         commit=call[2], parent_version_id=call[3]),
+                                     f'construct_graph failed for version {call[0]}'),
+            construct_calls
+        )
+        construct['edges']          = sum(len(edges) for edges in versions)
+        construct['throughput_eps'] = construct['edges'] / construct['elapsed_s'] if construct['elapsed_s'] else None
+
+        latest_edges = self.effective_edges(versions)
+        edge_list    = sorted(latest_edges)
+
+        self.stderr.write(f'Constructed {len(versions)} versions, {len(edge_list)} edges in the latest version')
+
+        # user-edge weights seeded in bulk on the latest version, then single writes are timed
+        num_overridden = min(len(edge_list), int(len(edge_list) * options['override_density']))
+        overridden     = self.random.sample(edge_list, num_overridden)
+        seeded         = [{'user_id':          self.random.randrange(options['users']),
+                           'source_vertex_id': source_vertex_id,
+                           'target_vertex_id': target_vertex_id,
+                           'weight':           self.random.random()}
+                          for source_vertex_id, target_vertex_id in overridden]
+
+        if seeded:
+            self.expect(tge.set_user_edge_weight(self.temporal_graph_id, self.weight_id, seeded),
+                        'set_user_edge_weight failed to seed user-edge weights')
+
+        read_edges = [(self.random.randrange(1, len(versions) + 1),) + self.random.choice(edge_list)
+                      for _ in range(options['reads'])] if edge_list else []
+
+        # half of the user reads hit a seeded user-edge weight
+        user_reads = [(seeded_weight['user_id'], seeded_weight['source_vertex_id'], seeded_weight['target_vertex_id'])
+                      for seeded_weight in self.random.sample(seeded, min(len(seeded), options['reads'] // 2))]
+        user_reads += [(self.random.randrange(options['users']),) + self.random.choice(edge_list)
+                       for _ in range(options['reads'] - len(user_reads))] if edge_list else []
+
+        writes = [{'user_id':          self.random.randrange(options['users']),
+                   'source_vertex_id': source_vertex_id,
+                   'target_vertex_id': target_vertex_id,
+                   'weight':           self.random.random()}
+                  for source_vertex_id, target_vertex_id in (self.random.choice(edge_list)
+                                                             for _ in range(options['writes']))] if edge_list else []
+
+        def get_edge_weight(read):
+            tge.get_edge_weight(self.temporal_graph_id, self.weight_id, read[1], read[2], version_id=read[0])
+
+        def get_user_edge_weight(read):
+            tge.get_user_edge_weight(self.temporal_graph_id, self.weight_id, read[1], read[2], read[0])
+
+        # cold runs start from empty caches, warm runs repeat the same reads
+        clear_caches()
+        get_edge_weight_cold = self.measure(get_edge_weight, read_edges)
+        get_edge_weight_warm = self.measure(get_edge_weight, read_edges)
+
+        clear_caches()
+        get_user_edge_weight_cold = self.measure(get_user_edge_weight, user_reads)
+        get_user_edge_weight_warm = self.measure(get_user_edge_weight, user_reads)
+
+        set_user_edge_weight = self.measure(
+            lambda write: self.expect(tge.set_user_edge_weight(self.temporal_graph_id, self.weight_id, [write]),
+                                      'set_user_edge_weight failed'),
+            writes
+        )
+
+        return {
+            'graph': {
+                'versions':              len(versions),
+                'latest_edges':          len(edge_list),
+                'user_edge_weights':     len(seeded),
+            },
+            'construct_graph':           construct,
+            'get_edge_weight_cold':      get_edge_weight_cold,
+            'get_edge_weight_warm':      get_edge_weight_warm,
+            'get_user_edge_weight_cold': get_user_edge_weight_cold,
+            'get_user_edge_weight_warm': get_user_edge_weight_warm,
+            'set_user_edge_weight':      set_user_edge_weight,
+            'caches':                    TemporalGraphEngine.cache_stats(),
+        }
+
+    def expect(self, success, message):
+        if not success:
+            raise CommandError(message)
+
+    def out_degrees(self, options):
+        num_vertices = options['vertices']
+        avg_degree   = options['avg_degree']
+
+        if options['degree_distribution'] == 'uniform':
+            degrees = [self.random.randint(0, int(round(2 * avg_degree))) for _ in range(num_vertices)]
+        else:
+            # Pareto samples rescaled to the requested mean, heavy tail capped at the number of other vertices
+            alpha   = max(options['powerlaw_exponent'] - 1, 1.01)
+            samples = [self.random.paretovariate(alpha) for _ in range(num_vertices)]
+            scale   = avg_degree * num_vertices / sum(samples)
+            degrees = [int(round(sample * scale)) for sample in samples]
+
+        return [min(degree, num_vertices - 1) for degree in degrees]
+
+    def generate_versions(self, options):
+        """
+        :return: Iterator[List[edge]] payload of version 1, a full graph, then of each delta version
+        """
+        vertex_ids = [f'v{i}' for i in range(options['vertices'])]
+        edges      = []
+
+        for source, degree in enumerate(self.out_degrees(options)):
+            targets = self.random.sample(range(len(vertex_ids) - 1), degree)
+
+            for target in targets:
+                # skip self-loops by shifting targets past the source
+                target = target + 1 if target >= source else target
+
+                edges.append({'source_vertex_id': vertex_ids[source],
+                              'target_vertex_id': vertex_ids[target],
+                              'weight':           self.random.random()})
+
+        yield edges
+
+        live = [(edge['source_vertex_id'], edge['target_vertex_id']) for edge in edges]
+
+        for _ in range(options['versions'] - 1):
+            changed = self.random.sample(live, min(len(live), int(len(live) * options['churn'])))
+            removed = set(changed[:len(changed) // 10])
+
+            yield [{'source_vertex_id': edge[0],
+                    'target_vertex_id': edge[1],
+                    'weight':           None if edge in removed else self.random.random()}
+                   for edge in changed]
+
+            live = [edge for edge in live if edge not in removed]
+
+    def effective_edges(self, versions):
+        edges = {}
+
+        for version in versions:
+            for edge in version:
+                key = (edge['source_vertex_id'], edge['target_vertex_id'])
+
+                if edge['weight'] is None:
+                    edges.pop(key, None)
+                else:
+                    edges[key] = edge['weight']
+
+        return edges
+
+    def measure(self, operation, calls):
+        latencies = []
+
+        start = time.perf_counter()
+
+        for call in calls:
+            call_start = time.perf_counter()
+            operation(call)
+            latencies.append(time.perf_counter() - call_start)
+
+        elapsed   = time.perf_counter() - start
+        latencies = sorted(latencies)
+
+        return {
+            'calls':          len(latencies),
+            'elapsed_s':      elapsed,
+            'throughput_ops': len(latencies) / elapsed if elapsed else None,
+            'p50_ms':         percentile(latencies, 50) * 1000 if latencies else None,
+            'p90_ms':         percentile(latencies, 90) * 1000 if latencies else None,
+            'p99_ms':         percentile(latencies, 99) * 1000 if latencies else None,
+        }
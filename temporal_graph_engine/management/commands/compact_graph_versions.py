@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from temporal_graph_engine.temporal_graph_engine import TemporalGraphEngine, MAX_DELTA_DEPTH
+
+
+class Command(BaseCommand):
+    help = 'Compacts committed delta versions of a temporal graph into snapshots. With --due, compacts the ' \
+           f'versions of every temporal graph at least {MAX_DELTA_DEPTH} (RIPPLE_MAX_DELTA_DEPTH) deltas deep, ' \
+           'e.g. from a periodic job'
+
+    def add_arguments(self, parser):
+        parser.add_argument('temporal_graph_id', nargs='?', default=None)
+        parser.add_argument('--version-id', type=int, default=None,
+                            help='compact this version only')
+        parser.add_argument('--min-delta-depth', type=int, default=1,
+                            help='compact versions at least this many deltas away from their nearest snapshot')
+        parser.add_argument('--due', action='store_true',
+                            help='compact the versions due for compaction, see RIPPLE_MAX_DELTA_DEPTH')
+
+    def handle(self, *args, **options):
+        tge = TemporalGraphEngine()
+
+        if options['due']:
+            graph_versions = tge.get_graph_versions_due_for_compaction(options['temporal_graph_id'])
+        elif options['temporal_graph_id'] is None:
+            raise CommandError('A temporal_graph_id is required without --due')
+        else:
+            graph_versions = TemporalGraphEngine.get_graph_version_model().objects.filter(
+                temporal_graph_id=options['temporal_graph_id'],
+                committed=True,
+                parent__isnull=False,
+                snapshot=False,
+                delta_depth__gte=options['min_delta_depth']
+            ).order_by('version_id')
+
+        if options['version_id'] is not None:
+            graph_versions = graph_versions.filter(version_id=options['version_id'])
+
+            if not graph_versions.exists():
+                raise CommandError(f'Version {options["version_id"]} of {options["temporal_graph_id"]} is not a '
+                                   f'committed delta')
+
+        for graph_version in graph_versions:
+            if tge.compact_graph_version(graph_version):
+                self.stdout.write(f'Compacted {graph_version.graph_uuid}')
+            else:
+                raise CommandError(f'Failed to compact {graph_version.graph_uuid}')
@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from temporal_graph_engine.temporal_graph_engine import TemporalGraphEngine, GRAPH_BACKEND
+
+
+def run_batch(batch_id):
+    """
+    Runs in a pool process. Django is set up by the parent, the process opens its own connections
+    """
+    return batch_id, TemporalGraphEngine().run_construction_batch(batch_id)
+
+
+class Command(BaseCommand):
+    help = 'Drains queued graph construction jobs: claims their batches and writes them to the graph backend ' \
+           'in a pool of processes. Versions are committed once all their batches landed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                            help='pool processes writing batches, 0 writes them in this process')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='seconds to wait when no batch is queued')
+        parser.add_argument('--requeue-after', type=int, default=600,
+                            help='seconds after which a batch claimed by a worker that died is queued again, '
+                                 '0 never queues them again')
+        parser.add_argument('--drain', action='store_true',
+                            help='exit once no batch is queued')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+
+        if GRAPH_BACKEND == 'memory' and processes:
+            # graphs written by pool processes would be lost with them
+            self.stderr.write('In-memory graph backend: writing batches in this process')
+
+            processes = 0
+
+        tge  = TemporalGraphEngine()
+        pool = None
+
+        if processes:
+            # pool processes are forked now and must not share the parent's database connections
+            connections.close_all()
+
+            pool = multiprocessing.Pool(processes)
+
+        # batches written by the pool, oldest first
+        in_flight    = []
+        next_requeue = 0
+
+        try:
+            while True:
+                if options['requeue_after'] and time.monotonic() >= next_requeue:
+                    requeued     = tge.requeue_stale_construction_batches(options['requeue_after'])
+                    next_requeue = time.monotonic() + options['requeue_after'] / 2
+
+                    if requeued:
+                        self.stderr.write(f'Queued {requeued} stale batches again')
+
+                # two batches per process, so that a process never waits for the next claim
+                capacity  = 2 * max(processes, 1) - len(in_flight)
+                batch_ids = tge.claim_construction_batches(uuid.uuid4().hex, capacity) if capacity > 0 else []
+
+                for batch_id in batch_ids:
+                    if pool:
+                        in_flight.append((batch_id, pool.apply_async(run_batch, (batch_id,))))
+                    else:
+                        self.report(batch_id, lambda: run_batch(batch_id)[1])
+
+                if in_flight:
+                    # new batches are claimed as soon as the oldest one lands
+                    in_flight[0][1].wait(options['poll_interval'])
+
+                    for batch_id, result in [item for item in in_flight if item[1].ready()]:
+                        in_flight.remove((batch_id, result))
+
+                        self.report(batch_id, lambda: result.get()[1])
+                elif not batch_ids:
+                    if options['drain']:
+                        break
+
+                    time.sleep(options['poll_interval'])
+        finally:
+            if pool:
+                pool.terminate()
+                pool.join()
+
+    def report(self, batch_id, get_success):
+        try:
+            success = get_success()
+        except Exception as e:
+            # the batch stays claimed until it is queued again after --requeue-after
+            self.stderr.write(f'Batch {batch_id} raised {e}')
+            return
+
+        self.stdout.write(f'Batch {batch_id} {"landed" if success else "failed"}')
@@ -0,0 +1,115 @@
+"""
+Parallel ingestion of a graph version: edges are partitioned by a hash of their source vertex and the partitions
+are written concurrently by a pool of processes.
+
+Writers never create vertices. Every vertex of the payload is created beforehand in a single pass, deduplicated
+and in sorted order, so that parallel writers only lock the vertices of the edges they create. All edges of a source
+vertex are in one partition and each partition is written in (source, target) order. Deadlocks left on shared
+target vertices are retried by the GraphClient, see NeoGraphClient#run_batched_transaction
+"""
+import multiprocessing
+import os
+import threading
+import zlib
+
+import django
+
+INGESTION_PROCESSES = int(os.environ.get('RIPPLE_INGESTION_PROCESSES', os.cpu_count() or 1))
+
+
+def shard_of(source_vertex_id, num_shards):
+    # a stable hash: partitions do not depend on the process' hash seed
+    return zlib.crc32(str(source_vertex_id).encode('utf-8')) % num_shards
+
+
+def partition_edges(edges, num_shards):
+    """
+    :param edges: List[(source_vertex_id, target_vertex_id, prop_value)]
+    :param num_shards: [Int]
+    :return: List[List[edge]] non-empty partitions, each ordered by (source_vertex_id, target_vertex_id).
+             Repeated edges keep their payload order, so the last value written still wins
+    """
+    partitions = [[] for _ in range(num_shards)]
+
+    for edge in edges:
+        partitions[shard_of(edge[0], num_shards)].append(edge)
+
+    return [sorted(partition, key=lambda edge: (str(edge[0]), str(edge[1]))) for partition in partitions if partition]
+
+
+def write_partition(graph_client_class, graph_uuid, edges, prop_key, batch_size):
+    """
+    Runs in a pool process
+
+    :return: [Bool] True if all edges of the partition were written
+    """
+    graph_client = graph_client_class(graph_uuid)
+
+    if prop_key is None:
+        return graph_client.set_edge_property_maps(edges, batch_size, vertices_exist=True)
+
+    return graph_client.set_edge_properties(edges, prop_key, batch_size, vertices_exist=True)
+
+
+def write_sharded(graph_client, edges, prop_key, batch_size, num_shards, pool = None):
+    """
+    Writes edges to the graph of graph_client in num_shards partitions written in parallel. Partitions are written
+    in separate transactions: if one fails, the others may have been written
+
+    :param graph_client: [GraphClient] supporting parallel writes
+    :param edges: List[(source_vertex_id, target_vertex_id, prop_value)]
+    :param prop_key: property key to set on every edge, or None if the edges carry a Dict[prop_key, prop_value]
+                     instead of prop_value
+    :param batch_size: [Int] edges written per backend statement
+    :param num_shards: [Int]
+    :param pool: [IngestionPool] defaults to the process-wide ingestion_pool
+    :return: [Bool] True if all edges were written
+    """
+    vertex_ids = sorted({str(vertex_id) for edge in edges for vertex_id in edge[:2]})
+
+    if not graph_client.set_vertices(vertex_ids, batch_size):
+        return False
+
+    pool = pool or ingestion_pool
+
+    return all(pool.starmap(write_partition, [(type(graph_client), graph_client.graph_uuid, partition, prop_key,
+                                               batch_size) for partition in partition_edges(edges, num_shards)]))
+
+
+class IngestionPool():
+    """
+    Pool of processes writing partitions, started on first use and shared by every ingestion of the process.
+
+    Processes are spawned rather than forked: the serving process may be multi-threaded and holds database and
+    Neo4j connections that a forked child would share. A process forked from this one starts its own pool
+
+    """
+
+    def __init__(self, processes = INGESTION_PROCESSES):
+        self.processes = processes
+
+        self._pool     = None
+        self._pid      = None
+        self._lock     = threading.Lock()
+
+    def get_pool(self):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = multiprocessing.get_context('spawn').Pool(self.processes, initializer=django.setup)
+                self._pid  = os.getpid()
+
+            return self._pool
+
+    def starmap(self, fn, iterable):
+        return self.get_pool().starmap(fn, iterable)
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.terminate()
+                self._pool.join()
+
+            self._pool = None
+
+
+ingestion_pool = IngestionPool()
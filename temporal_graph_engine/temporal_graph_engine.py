@@ -1,171 +1,1894 @@
 from graph_client.neo_graph_client import NeoGraphClient
+from graph_client.memory_graph_client import InMemoryGraphClient, memory_graph_store
+from graph_client.graph_client import TOMBSTONE, is_tombstone
 from time_series_client.models.graph_version import GraphVersion
 from time_series_client.models.user_edge_weight import UserEdgeWeight
+from time_series_client.models.ingestion_progress import IngestionProgress
+from time_series_client.models.construction_job import ConstructionJob
+from time_series_client.models.construction_batch import ConstructionBatch
+from temporal_graph_engine.caches import LRUCache, SingleFlight, TTLCache, MISSING
+from temporal_graph_engine.version_index import VersionIndex, unix_timestamp
+from temporal_graph_engine import analytics, sharded_ingestion
+from temporal_graph.instrumentation import timed
 
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.utils import timezone
+
+from datetime import datetime, timedelta
+import heapq
+import itertools
+import json
 import logging
+import operator
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
+# 'neo4j' or 'memory'
+GRAPH_BACKEND            = os.environ.get('RIPPLE_GRAPH_BACKEND', 'neo4j')
+
+EDGE_WEIGHT_CACHE_SIZE   = int(os.environ.get('RIPPLE_EDGE_WEIGHT_CACHE_SIZE', 100000))
+GRAPH_VERSION_CACHE_SIZE = int(os.environ.get('RIPPLE_GRAPH_VERSION_CACHE_SIZE', 10000))
+LATEST_VERSION_CACHE_TTL = float(os.environ.get('RIPPLE_LATEST_VERSION_CACHE_TTL', 5))
+VERSION_INDEX_GRACE      = int(os.environ.get('RIPPLE_VERSION_INDEX_GRACE', 5))
+
+# a delta version this many deltas away from its nearest snapshot is due for compaction into a snapshot, see
+# compact_graph_versions --due. Commits do not compact: copying the inherited graph would make them scale with it
+MAX_DELTA_DEPTH          = int(os.environ.get('RIPPLE_MAX_DELTA_DEPTH', 8))
+COMPACTION_BATCH_SIZE    = int(os.environ.get('RIPPLE_COMPACTION_BATCH_SIZE', 50000))
+
+# bounded by SQLite's 999 variables per statement, raise on Postgres
+USER_EDGE_WEIGHT_BATCH_SIZE = int(os.environ.get('RIPPLE_USER_EDGE_WEIGHT_BATCH_SIZE', 250))
+
+# records of a streamed upload written per batch, the granularity of its resume token
+INGESTION_BATCH_SIZE     = int(os.environ.get('RIPPLE_INGESTION_BATCH_SIZE', 10000))
+
+# partitions of a payload written in parallel when the backend supports it (see sharded_ingestion), 1 writes
+# serially. Smaller payloads are written serially, the pool would cost more than it saves
+INGESTION_SHARDS         = int(os.environ.get('RIPPLE_INGESTION_SHARDS', 1))
+MIN_SHARDED_EDGES        = int(os.environ.get('RIPPLE_MIN_SHARDED_EDGES', 10000))
+
+# edges of a queued construction job per batch claimed by a worker, and attempts of a failing batch
+CONSTRUCTION_JOB_BATCH_SIZE   = int(os.environ.get('RIPPLE_CONSTRUCTION_JOB_BATCH_SIZE', 10000))
+CONSTRUCTION_JOB_MAX_ATTEMPTS = int(os.environ.get('RIPPLE_CONSTRUCTION_JOB_MAX_ATTEMPTS', 3))
+
+MAX_HOPS                 = int(os.environ.get('RIPPLE_MAX_HOPS', 4))
+
+# versions whose edge weights are read per batched graph query, see iter_edge_weight_history
+HISTORY_BATCH_SIZE       = int(os.environ.get('RIPPLE_HISTORY_BATCH_SIZE', 100))
+
+# analytics results are small, the arrays of a loaded graph are the size of the graph
+ANALYTICS_CACHE_SIZE     = int(os.environ.get('RIPPLE_ANALYTICS_CACHE_SIZE', 256))
+GRAPH_ARRAYS_CACHE_SIZE  = int(os.environ.get('RIPPLE_GRAPH_ARRAYS_CACHE_SIZE', 4))
+
+# how edge weights combine along a path: (weight of the empty path, combine)
+PATH_AGGREGATIONS        = {
+    'product': (1.0, operator.mul),
+    'sum':     (0.0, operator.add),
+}
+
+def as_weight(prop_value):
+    """
+    Converts an edge property read from a GraphClient to a weight
+
+    :param prop_value: property value, or empty string/None if the edge or property does not exist
+    :return: [Float] weight or None
+    """
+    if prop_value is None or prop_value == "":
+        return None
+    elif isinstance(prop_value, str):
+        # graphs written before weights were stored as floats
+        return float(prop_value)
+    else:
+        return prop_value
+
+def as_edge(vertex_edge):
+    """
+    :param vertex_edge: { "source_vertex_id": "vert1", "target_vertex_id": "vert2", "weight": 0.65 }
+    :return: (source_vertex_id, target_vertex_id, weight) as written to the graph backend.
+             A null weight removes the edge from the version
+    """
+    weight = vertex_edge['weight']
+
+    return (vertex_edge['source_vertex_id'], vertex_edge['target_vertex_id'],
+            TOMBSTONE if weight is None else float(weight))
+
+def as_weighted_edge(vertex_edge, weight_id = None):
+    """
+    :param vertex_edge: { "source_vertex_id": "vert1", "target_vertex_id": "vert2", "weights": {"w1": 0.65, "w2": 0.1} }
+                        or an edge with a single "weight", of weight_id
+    :param weight_id: [String] weight of the edges with a single "weight"
+    :return: (source_vertex_id, target_vertex_id, Dict[weight_id, weight]) as written to the graph backend.
+             A null weight removes the edge from that weight of the version
+    """
+    if 'weights' in vertex_edge:
+        weights = vertex_edge['weights']
+    elif weight_id is not None:
+        weights = {weight_id: vertex_edge['weight']}
+    else:
+        raise KeyError('weights')
+
+    if not weights:
+        raise ValueError(f'Edge {vertex_edge} has no weights')
+
+    return (vertex_edge['source_vertex_id'], vertex_edge['target_vertex_id'],
+            {str(edge_weight_id): TOMBSTONE if weight is None else float(weight)
+             for edge_weight_id, weight in weights.items()})
+
+def as_payload_edges(vertex_edge_pairs, weight_id):
+    """
+    Converts the edges of a construction payload. If any edge of the payload carries a "weights" map, see
+    as_weighted_edge, every weight of each edge is written at once
+
+    :param vertex_edge_pairs: List[vertex_edge]
+    :param weight_id: [String] weight of the edges with a single "weight"
+    :return: (edges, weight_id) to write: edges of as_edge and weight_id, or edges of as_weighted_edge and None
+    """
+    if any('weights' in vertex_edge for vertex_edge in vertex_edge_pairs):
+        return [as_weighted_edge(vertex_edge, weight_id) for vertex_edge in vertex_edge_pairs], None
+
+    return [as_edge(vertex_edge) for vertex_edge in vertex_edge_pairs], weight_id
+
+def as_user_edge(user_vertex_edge_pair):
+    """
+    :param user_vertex_edge_pair: { "user_id": 123, "source_vertex_id": "vert1", "target_vertex_id": "vert2",
+                                    "weight": 0.72 }
+    :return: (user_id, source_vertex_id, target_vertex_id, weight). A null weight hides the edge from the user
+    :raises KeyError, TypeError, ValueError: if the user-edge weight is malformed
+    """
+    weight = user_vertex_edge_pair['weight']
+
+    return (int(user_vertex_edge_pair['user_id']),
+            str(user_vertex_edge_pair['source_vertex_id']),
+            str(user_vertex_edge_pair['target_vertex_id']),
+            None if weight is None else float(weight))
+
+def merge_delta_streams(streams, key):
+    """
+    Merges streams read from the graphs of a version chain into the stream of the version.
+    Every stream must be ordered by key. When several streams hold the same key, the item of the earliest stream
+    (the most recent version) wins. Tombstones are kept, callers decide whether to drop them
+
+    :param streams: List[Iterator] ordered from the version itself to its nearest snapshot
+    :param key: function of an item returning its sort key
+    :return: Iterator[(depth, item)] ordered by key, depth being the index of the stream the item was read from
+    """
+    def keyed(depth, stream):
+        for item in stream:
+            yield key(item), depth, item
+
+    merged   = heapq.merge(*[keyed(depth, stream) for depth, stream in enumerate(streams)])
+
+    last_key = MISSING
+
+    for item_key, depth, item in merged:
+        if item_key != last_key:
+            last_key = item_key
+
+            yield depth, item
+
+def diff_edge_streams(from_edges, to_edges, threshold = 0.0):
+    """
+    Diffs two edge streams in one sorted merge, holding one edge of each stream at a time
+
+    :param from_edges: Iterator[(source_vertex_id, target_vertex_id, weight)] ordered by
+                       (source_vertex_id, target_vertex_id)
+    :param to_edges: same as from_edges
+    :param threshold: [Float] an edge in both streams is reweighted if its weights differ by more than threshold
+    :return: Iterator[(change, source_vertex_id, target_vertex_id, from_weight, to_weight)] ordered by edge,
+             change being 'added', 'removed' or 'reweighted'. from_weight/to_weight is None for added/removed
+    """
+    from_edges = iter(from_edges)
+    to_edges   = iter(to_edges)
+
+    from_edge  = next(from_edges, None)
+    to_edge    = next(to_edges, None)
+
+    while from_edge is not None or to_edge is not None:
+        if to_edge is None or (from_edge is not None and from_edge[:2] < to_edge[:2]):
+            yield 'removed', from_edge[0], from_edge[1], from_edge[2], None
+
+            from_edge = next(from_edges, None)
+        elif from_edge is None or to_edge[:2] < from_edge[:2]:
+            yield 'added', to_edge[0], to_edge[1], None, to_edge[2]
+
+            to_edge = next(to_edges, None)
+        else:
+            if abs(to_edge[2] - from_edge[2]) > threshold:
+                yield 'reweighted', to_edge[0], to_edge[1], from_edge[2], to_edge[2]
+
+            from_edge = next(from_edges, None)
+            to_edge   = next(to_edges, None)
+
+
 class TemporalGraphEngine():
+    # Caches are shared by every engine in the process.
+    # Committed graph versions are immutable, so neither the versions nor their edge weights are ever invalidated
+
+    # (graph_uuid, source_vertex_id, target_vertex_id, weight_id) -> weight or None
+    edge_weight_cache    = LRUCache(EDGE_WEIGHT_CACHE_SIZE)
+
+    # concurrent cache misses of the same edge share one backend read, keyed as edge_weight_cache
+    edge_weight_flights  = SingleFlight()
+
+    # (temporal_graph_id, version_id) -> committed GraphVersion
+    graph_version_cache  = LRUCache(GRAPH_VERSION_CACHE_SIZE)
+
+    # temporal_graph_id -> latest committed GraphVersion or None. Invalidated on commit
+    latest_version_cache = TTLCache(LATEST_VERSION_CACHE_TTL)
+
+    # resolves timestamp -> committed GraphVersion in memory
+    version_index        = VersionIndex(GraphVersion, grace=VERSION_INDEX_GRACE)
+
+    # (graph_uuid, weight_id) -> GraphArrays of a committed version
+    graph_arrays_cache   = LRUCache(GRAPH_ARRAYS_CACHE_SIZE)
+
+    # (graph_uuid, weight_id, analysis) -> result of the analysis of a committed version
+    analytics_cache      = LRUCache(ANALYTICS_CACHE_SIZE)
+
+    # concurrent loads and analyses of the same version share one computation, keyed as the caches
+    analytics_flights    = SingleFlight()
+
     def get_graph_client(self, graph_uuid):
         """
-        GraphClient used to travese graph
+        GraphClient used to travese graph
+
+        :param graph_uuid:
+        :return:
+        """
+        if GRAPH_BACKEND == 'memory':
+            return InMemoryGraphClient(graph_uuid)
+
+        return NeoGraphClient(graph_uuid)
+
+    def get_read_graph_client(self, graph_version):
+        """
+        GraphClient used to read graph_version. Committed versions loaded in memory are read from there
+
+        :param graph_version: [GraphVersion]
+        :return:
+        """
+        if graph_version.committed and memory_graph_store.is_compact(graph_version.graph_uuid):
+            return InMemoryGraphClient(graph_version.graph_uuid)
+
+        return self.get_graph_client(graph_version.graph_uuid)
+
+    @classmethod
+    def get_graph_version_model(cls):
+        """
+        ORM to get and set Graph Versions
+
+        :return:
+        """
+        return GraphVersion
+
+    @classmethod
+    def get_user_edge_weight_model(cls):
+        """
+        ORM to get and set User Edge Weights
+
+        :return:
+        """
+        return UserEdgeWeight
+
+    @classmethod
+    def get_ingestion_progress_model(cls):
+        """
+        ORM to get and set progress of streamed uploads
+
+        :return:
+        """
+        return IngestionProgress
+
+    @classmethod
+    def get_construction_job_model(cls):
+        """
+        ORM to get and set asynchronous construction jobs
+
+        :return:
+        """
+        return ConstructionJob
+
+    @classmethod
+    def get_construction_batch_model(cls):
+        """
+        ORM to get and set the batches of asynchronous construction jobs
+
+        :return:
+        """
+        return ConstructionBatch
+
+    @classmethod
+    def cache_stats(cls):
+        """
+        Hit/miss counters of the engine caches
+
+        :return: [Dict]
+        """
+        return {
+            'edge_weight':         cls.edge_weight_cache.stats(),
+            'edge_weight_flights': cls.edge_weight_flights.stats(),
+            'graph_version':       cls.graph_version_cache.stats(),
+            'latest_version':      cls.latest_version_cache.stats(),
+            'version_index':       cls.version_index.stats(),
+            'graph_arrays':        cls.graph_arrays_cache.stats(),
+            'analytics':           cls.analytics_cache.stats(),
+            'analytics_flights':   cls.analytics_flights.stats(),
+        }
+
+    def commit_graph_version(self, graph_version):
+        """
+        Commits graph_version, making it immutable and the latest version of its temporal graph
+
+        :param graph_version: [GraphVersion]
+        :return:
+        """
+        self.get_graph_client(graph_version.graph_uuid).commit()
+
+        graph_version.commit_version()
+
+        self.publish_graph_version(graph_version)
+
+    def publish_graph_version(self, graph_version):
+        """
+        Makes a version committed in the database the latest version of its temporal graph for this process
+
+        :param graph_version: [GraphVersion] committed
+        :return:
+        """
+        TemporalGraphEngine.latest_version_cache.invalidate(graph_version.temporal_graph_id)
+        TemporalGraphEngine.version_index.add(graph_version)
+
+        if graph_version.is_delta and graph_version.delta_depth >= MAX_DELTA_DEPTH:
+            logger.info(f'{graph_version.graph_uuid} is {graph_version.delta_depth} deltas deep and due for compaction')
+
+    def get_graph_versions_due_for_compaction(self, temporal_graph_id = None):
+        """
+        Committed delta versions at least MAX_DELTA_DEPTH deltas away from their nearest snapshot
+
+        :param temporal_graph_id: [String] versions of every temporal graph if None
+        :return: QuerySet[GraphVersion] ordered by temporal_graph_id and version_id
+        """
+        graph_versions = TemporalGraphEngine.get_graph_version_model().objects.filter(
+            committed=True,
+            parent__isnull=False,
+            snapshot=False,
+            delta_depth__gte=MAX_DELTA_DEPTH
+        )
+
+        if temporal_graph_id is not None:
+            graph_versions = graph_versions.filter(temporal_graph_id=temporal_graph_id)
+
+        return graph_versions.order_by('temporal_graph_id', 'version_id')
+
+    def get_version_chain(self, graph_version, from_backend = False):
+        """
+        Versions whose graphs hold the edges of graph_version: graph_version itself followed by its parents,
+        up to the nearest snapshot
+
+        :param graph_version: [GraphVersion]
+        :param from_backend: [Bool] ignore versions materialised in memory from a snapshot file
+        :return: List[GraphVersion]
+        """
+        chain = [graph_version]
+
+        # a version loaded from a snapshot file holds its whole chain
+        while chain[-1].is_delta and (from_backend or not memory_graph_store.is_materialised(chain[-1].graph_uuid)):
+            chain.append(chain[-1].parent)
+
+        return chain
+
+    def get_chain_graph_client(self, chain_version, from_backend = False):
+        if from_backend:
+            return self.get_graph_client(chain_version.graph_uuid)
+
+        return self.get_read_graph_client(chain_version)
+
+    def get_version_chains(self, graph_versions, known_versions = None):
+        """
+        get_version_chain of many versions, reading the parents missing from graph_versions in one query per
+        level of the chains
+
+        :param graph_versions: List[GraphVersion]
+        :param known_versions: Dict[GraphVersion pk, GraphVersion] versions already read, updated with the
+                 versions of the chains
+        :return: Dict[GraphVersion pk, List[GraphVersion]]
+        """
+        def is_complete(chain):
+            return not chain[-1].is_delta or memory_graph_store.is_materialised(chain[-1].graph_uuid)
+
+        known  = known_versions if known_versions is not None else {}
+        known.update((graph_version.pk, graph_version) for graph_version in graph_versions)
+
+        chains = {graph_version.pk: [graph_version] for graph_version in graph_versions}
+
+        while True:
+            incomplete = [chain for chain in chains.values() if not is_complete(chain)]
+
+            if not incomplete:
+                return chains
+
+            missing_ids = {chain[-1].parent_id for chain in incomplete} - set(known)
+
+            if missing_ids:
+                with timed('db_query'):
+                    known.update(TemporalGraphEngine.get_graph_version_model().objects.in_bulk(list(missing_ids)))
+
+            for chain in incomplete:
+                chain.append(known[chain[-1].parent_id])
+
+    def get_version_chain_weight_ids(self, chain, from_backend = False):
+        """
+        :param chain: List[GraphVersion] see get_version_chain
+        :param from_backend: [Bool] read from the graph backend rather than graphs loaded in memory
+        :return: Set[String] weight ids set on edges of any version of chain
+        """
+        weight_ids = set()
+
+        for chain_version in chain:
+            weight_ids |= self.get_chain_graph_client(chain_version, from_backend).get_edge_property_keys()
+
+        return weight_ids
+
+    def compact_graph_version(self, graph_version, batch_size = None):
+        """
+        Turns a committed delta version into a snapshot by copying every edge it inherits from its parent chain
+        into its own graph. Values are unchanged, so readers of the version are unaffected while compacting, or
+        after a failed compaction. Inherited tombstones are not copied: a snapshot has no parent for them to hide.
+        The delta depths of the versions built on top of the version are rebased on the new snapshot
+
+        :param graph_version: [GraphVersion]
+        :param batch_size: [Int] edges written per backend statement
+        :return: [Bool] True if compacted
+        """
+        if not graph_version.is_delta:
+            return False
+
+        # the backend graph is compacted, from the backend graphs of the chain
+        chain      = self.get_version_chain(graph_version, from_backend=True)
+        weight_ids = self.get_version_chain_weight_ids(chain, from_backend=True)
+
+        graph_client = self.get_graph_client(graph_version.graph_uuid)
+        graph_client.reopen()
+
+        for weight_id in sorted(weight_ids):
+            inherited_edges = (edge for depth, edge in self.merge_version_chain_edges(
+                chain, weight_id, from_backend=True) if depth > 0 and not is_tombstone(as_weight(edge[2])))
+
+            while True:
+                batch = [edge for _, edge in zip(range(COMPACTION_BATCH_SIZE), inherited_edges)]
+
+                if not batch:
+                    break
+
+                # the graph is left writable, not committed half-compacted: compacting it again resumes the copy
+                if not graph_client.set_edge_properties(batch, weight_id, batch_size):
+                    logger.error(f'Failed to compact {graph_version.graph_uuid}')
+
+                    return False
+
+        graph_client.commit()
+
+        with transaction.atomic():
+            self.rebase_descendant_delta_depths(graph_version)
+
+            graph_version.snapshot    = True
+            graph_version.delta_depth = 0
+            graph_version.save(update_fields=['snapshot', 'delta_depth'])
+
+        logger.info(f'Compacted {graph_version.graph_uuid} into a snapshot of {len(chain)} graphs')
+
+        return True
+
+    def rebase_descendant_delta_depths(self, graph_version):
+        """
+        Versions built on top of graph_version, up to the next snapshots, are graph_version.delta_depth deltas
+        closer to their nearest snapshot once graph_version becomes one
+
+        :param graph_version: [GraphVersion] before it is saved as a snapshot
+        :return:
+        """
+        graph_version_model = TemporalGraphEngine.get_graph_version_model()
+        parent_ids          = [graph_version.pk]
+
+        while parent_ids:
+            descendants = graph_version_model.objects.filter(parent_id__in=parent_ids, snapshot=False)
+            parent_ids  = list(descendants.values_list('pk', flat=True))
+
+            graph_version_model.objects.filter(pk__in=parent_ids).update(
+                delta_depth=F('delta_depth') - graph_version.delta_depth)
+
+    def merge_version_chain_edges(self, chain, weight_id, page_size = None, from_backend = False):
+        """
+        :param chain: List[GraphVersion] see get_version_chain
+        :param weight_id: [String]
+        :param page_size: [Int] edges fetched from the graph backend at a time
+        :param from_backend: [Bool] read from the graph backend rather than graphs loaded in memory
+        :return: Iterator[(depth, (source_vertex_id, target_vertex_id, prop_value))] ordered by edge, tombstones included
+        """
+        streams = [self.get_chain_graph_client(chain_version, from_backend).get_edges(weight_id, page_size)
+                   for chain_version in chain]
+
+        return merge_delta_streams(streams, key=lambda edge: (edge[0], edge[1]))
+
+    def iter_graph_version_edges(self, graph_version, weight_id, page_size = None):
+        """
+        Streams every edge of graph_version that has weight_id, resolving deltas through the parent chain
+
+        :param graph_version: [GraphVersion]
+        :param weight_id: [String]
+        :param page_size: [Int] edges fetched from the graph backend at a time
+        :return: Iterator[(source_vertex_id, target_vertex_id, weight)] ordered by (source_vertex_id, target_vertex_id)
+        """
+        for depth, (source_vertex_id, target_vertex_id, prop_value) in self.merge_version_chain_edges(
+                self.get_version_chain(graph_version), weight_id, page_size):
+
+            weight = as_weight(prop_value)
+
+            if not is_tombstone(weight):
+                yield source_vertex_id, target_vertex_id, weight
+
+    def diff_versions(self,
+                      temporal_graph_id,
+                      weight_id,
+                      from_version_id,
+                      to_version_id,
+                      threshold = 0.0,
+                      page_size = None
+                      ):
+        """
+        Edges with weight_id added, removed or reweighted from a committed version of a temporal graph to another.
+        Both versions are streamed and diffed in one sorted merge, so memory does not grow with the graphs
+
+        :param temporal_graph_id: [String]
+        :param weight_id: [String]
+        :param from_version_id: [Int]
+        :param to_version_id: [Int]
+        :param threshold: [Float] weight changes up to threshold are ignored
+        :param page_size: [Int] edges fetched from the graph backend at a time
+        :return: Iterator[(change, source_vertex_id, target_vertex_id, from_weight, to_weight)] see
+                 diff_edge_streams, or None if either version doesn't exist
+        :raises ValueError: if threshold is negative
+        """
+        if not threshold >= 0:
+            raise ValueError(f'threshold must be a non-negative number, got {threshold}')
+
+        from_version = self.get_graph_version(temporal_graph_id, from_version_id)
+        to_version   = self.get_graph_version(temporal_graph_id, to_version_id)
+
+        if not from_version or not to_version:
+            return None
+
+        return diff_edge_streams(self.iter_graph_version_edges(from_version, weight_id, page_size),
+                                 self.iter_graph_version_edges(to_version, weight_id, page_size),
+                                 threshold)
+
+    def get_graph_version(self, temporal_graph_id, version_id = None, timestamp = None):
+        """
+        Retrieves the committed version of a temporal graph based on (in order of priority):
+         1. version_id - retrieve specific verison
+         2. timestamp  - retrieves the committed version at this point in time
+         3. latest version of temporal graph
+        :param temporal_graph_id:
+        :param version_id:
+        :param timestamp:
+        :return:
+        """
+        with timed('version_resolution'):
+            return self.resolve_graph_version(temporal_graph_id, version_id, timestamp)
+
+    def resolve_graph_version(self, temporal_graph_id, version_id = None, timestamp = None):
+        """
+        See get_graph_version
+        """
+        if version_id:
+            # retrieve specific version
+            cache_key     = (temporal_graph_id, int(version_id))
+            graph_version = TemporalGraphEngine.graph_version_cache.get(cache_key)
+
+            if graph_version is MISSING:
+                with timed('db_query'):
+                    graph_version = TemporalGraphEngine.get_graph_version_model().objects.get_latest_or_none(
+                        'committed_at',
+                        temporal_graph_id=temporal_graph_id,
+                        version_id=int(version_id),
+                        committed=True
+                    )
+
+                # only committed versions are cached, a missing version may still be committed later
+                if graph_version:
+                    TemporalGraphEngine.graph_version_cache.set(cache_key, graph_version)
+        elif timestamp:
+            # retrieve latest version committed before this timestamp (latest at that point)
+            graph_version = TemporalGraphEngine.version_index.resolve(temporal_graph_id, int(timestamp))
+        else:
+            # get latest graph verison
+            graph_version = TemporalGraphEngine.latest_version_cache.get(temporal_graph_id)
+
+            if graph_version is MISSING:
+                with timed('db_query'):
+                    graph_version = TemporalGraphEngine.get_graph_version_model().objects.get_latest_or_none(
+                        'committed_at',
+                        temporal_graph_id=temporal_graph_id,
+                        committed=True
+                    )
+
+                TemporalGraphEngine.latest_version_cache.set(temporal_graph_id, graph_version)
+
+        return graph_version
+
+    def get_graph_version_edge_weight(self, graph_version, source_vertex_id, target_vertex_id, weight_id):
+        """
+        Retrieves edge weight of a particular graph_version
+
+        :param graph_version: [GraphVersion]
+        :param source_vertex_id: [String]
+        :param target_vertex_id: [String]
+        :param weight_id: [String]
+        :return: [Float] weight or None if it does not exist
+        """
+        if graph_version.committed:
+            cache_key = (graph_version.graph_uuid, source_vertex_id, target_vertex_id, weight_id)
+            weight    = TemporalGraphEngine.edge_weight_cache.get(cache_key)
+
+            if weight is MISSING:
+                def read_and_cache():
+                    read_weight = self.read_graph_version_edge_weight(graph_version, source_vertex_id,
+                                                                      target_vertex_id, weight_id)
+
+                    # cached before the flight lands, so that later callers hit the cache
+                    TemporalGraphEngine.edge_weight_cache.set(cache_key, read_weight)
+
+                    return read_weight
+
+                weight = TemporalGraphEngine.edge_weight_flights.do(cache_key, read_and_cache)
+
+            return weight
+        else:
+            return self.read_graph_version_edge_weight(graph_version, source_vertex_id, target_vertex_id, weight_id)
+
+    def read_graph_version_edge_weight(self, graph_version, source_vertex_id, target_vertex_id, weight_id):
+        """
+        Reads edge weight of a particular graph_version from the graph backend, bypassing the cache
+
+        :param graph_version: [GraphVersion]
+        :param source_vertex_id: [String]
+        :param target_vertex_id: [String]
+        :param weight_id: [String]
+        :return: [Float] weight or None if it does not exist
+        """
+        # the most recent version of the chain holding the edge decides its weight
+        for chain_version in self.get_version_chain(graph_version):
+            graph_client = self.get_read_graph_client(chain_version)
+
+            weight = as_weight(graph_client.get_edge_property(source_vertex_id, target_vertex_id, weight_id))
+
+            if weight is not None:
+                return None if is_tombstone(weight) else weight
+
+        return None
+
+    def get_edge_weight_of_versions(self, graph_versions, source_vertex_id, target_vertex_id, weight_id,
+                                    known_versions = None):
+        """
+        Retrieves the weight of an edge in each of many committed versions.
+        Versions missing from the cache are read from the graph backend in one batched call
+
+        :param graph_versions: List[GraphVersion] committed versions
+        :param source_vertex_id: [String]
+        :param target_vertex_id: [String]
+        :param weight_id: [String]
+        :param known_versions: see get_version_chains
+        :return: List[Float or None] weights, in the order of graph_versions
+        """
+        weights         = []
+        missed_versions = []
+
+        for graph_version in graph_versions:
+            weight = TemporalGraphEngine.edge_weight_cache.get(
+                (graph_version.graph_uuid, source_vertex_id, target_vertex_id, weight_id))
+
+            if weight is MISSING:
+                missed_versions.append(graph_version)
+
+            weights.append(weight)
+
+        if missed_versions:
+            read_weights = self.read_edge_weight_of_versions(missed_versions, source_vertex_id, target_vertex_id,
+                                                             weight_id, known_versions)
+
+            for graph_version in missed_versions:
+                TemporalGraphEngine.edge_weight_cache.set(
+                    (graph_version.graph_uuid, source_vertex_id, target_vertex_id, weight_id),
+                    read_weights[graph_version.pk])
+
+            weights = [read_weights[graph_version.pk] if weight is MISSING else weight
+                       for graph_version, weight in zip(graph_versions, weights)]
+
+        return weights
+
+    def read_edge_weight_of_versions(self, graph_versions, source_vertex_id, target_vertex_id, weight_id,
+                                     known_versions = None):
+        """
+        Reads the weight of an edge in each of many versions from the graph backend, bypassing the cache.
+        The edge is read from every graph of the versions' chains in one query per kind of graph client
+
+        :param graph_versions: List[GraphVersion]
+        :param source_vertex_id: [String]
+        :param target_vertex_id: [String]
+        :param weight_id: [String]
+        :param known_versions: see get_version_chains
+        :return: Dict[GraphVersion pk, Float or None]
+        """
+        chains = self.get_version_chains(graph_versions, known_versions)
+
+        # graph client -> graph_uuids it reads, e.g. versions loaded in memory and versions stored in Neo4j
+        graph_clients = {}
+
+        for chain_version in {chain_version.graph_uuid: chain_version
+                              for chain in chains.values() for chain_version in chain}.values():
+            graph_client = self.get_read_graph_client(chain_version)
+
+            graph_clients.setdefault(type(graph_client), (graph_client, []))[1].append(chain_version.graph_uuid)
+
+        prop_values = {}
+
+        for graph_client, graph_uuids in graph_clients.values():
+            edge_properties = graph_client.get_edge_property_of_graphs(graph_uuids, source_vertex_id,
+                                                                       target_vertex_id, weight_id)
+
+            if edge_properties is None:
+                raise IOError(f'Failed to read edge {source_vertex_id}->{target_vertex_id} of '
+                              f'{len(graph_uuids)} graphs')
+
+            prop_values.update(edge_properties)
+
+        weights = {}
+
+        for graph_version in graph_versions:
+            weight = None
+
+            # the most recent version of the chain holding the edge decides its weight
+            for chain_version in chains[graph_version.pk]:
+                weight = as_weight(prop_values.get(chain_version.graph_uuid))
+
+                if weight is not None:
+                    break
+
+            weights[graph_version.pk] = None if is_tombstone(weight) else weight
+
+        return weights
+
+    def iter_edge_weight_history(self,
+                                 temporal_graph_id,
+                                 weight_id,
+                                 source_vertex_id,
+                                 target_vertex_id,
+                                 user_id = None,
+                                 from_version_id = None,
+                                 to_version_id = None,
+                                 from_timestamp = None,
+                                 to_timestamp = None
+                                 ):
+        """
+        Streams the weight of an edge in every committed version of a temporal graph within a version and/or
+        timestamp range, bounds included.
+
+        Versions are read in one streamed scan and resolved HISTORY_BATCH_SIZE at a time, each batch with one
+        batched graph read and, for a user, one query of the user's overrides
+
+        :param temporal_graph_id: [String]
+        :param weight_id: [String]
+        :param source_vertex_id: [String]
+        :param target_vertex_id: [String]
+        :param user_id: [Int] also return the user-edge weight of each version
+        :param from_version_id: [Int]
+        :param to_version_id: [Int]
+        :param from_timestamp: [Int] Unix epoch
+        :param to_timestamp: [Int] Unix epoch
+        :return: Iterator[(GraphVersion, weight, user_weight)] ordered by committed_at. user_weight is None
+                 without user_id or if the user has no weight for the edge in that version
+        """
+        filters = { 'temporal_graph_id': temporal_graph_id, 'committed': True }
+
+        if from_version_id is not None:
+            filters['version_id__gte']   = int(from_version_id)
+        if to_version_id is not None:
+            filters['version_id__lte']   = int(to_version_id)
+        if from_timestamp is not None:
+            filters['committed_at__gte'] = int(from_timestamp)
+        if to_timestamp is not None:
+            filters['committed_at__lte'] = int(to_timestamp)
+
+        graph_versions = TemporalGraphEngine.get_graph_version_model().objects.filter(**filters).order_by(
+            'committed_at', 'version_id').iterator()
+
+        # versions of earlier batches are the parents of later ones
+        known_versions = {}
+
+        while True:
+            batch = list(itertools.islice(graph_versions, HISTORY_BATCH_SIZE))
+
+            if not batch:
+                return
+
+            weights = self.get_edge_weight_of_versions(batch, source_vertex_id, target_vertex_id, weight_id,
+                                                       known_versions)
+
+            user_weights = {}
+
+            if user_id is not None:
+                with timed('db_query'):
+                    user_weights = dict(TemporalGraphEngine.get_user_edge_weight_model().objects.filter(
+                        graph_version__in=batch,
+                        user_id=user_id,
+                        source_vertex_id=source_vertex_id,
+                        target_vertex_id=target_vertex_id,
+                        weight_id=weight_id
+                    ).order_by('committed_at').values_list('graph_version_id', 'weight'))
+
+            for graph_version, weight in zip(batch, weights):
+                yield graph_version, weight, user_weights.get(graph_version.pk)
+
+    def get_graph_version_edge_weights(self, graph_version, edge_pairs, weight_id):
+        """
+        Retrieves edge weights of many edges of a particular graph_version.
+        Edges missing from the cache are read from the graph backend in one batched call
+
+        :param graph_version: [GraphVersion]
+        :param edge_pairs: List[(source_vertex_id, target_vertex_id)]
+        :param weight_id: [String]
+        :return: List[Float or None] weights, in the order of edge_pairs
+        """
+        if not graph_version.committed:
+            return self.read_graph_version_edge_weights(graph_version, edge_pairs, weight_id)
+
+        weights      = []
+        missed_pairs = []
+
+        for source_vertex_id, target_vertex_id in edge_pairs:
+            weight = TemporalGraphEngine.edge_weight_cache.get(
+                (graph_version.graph_uuid, source_vertex_id, target_vertex_id, weight_id))
+
+            if weight is MISSING:
+                missed_pairs.append((source_vertex_id, target_vertex_id))
+
+            weights.append(weight)
+
+        if missed_pairs:
+            read_weights = dict(zip(missed_pairs,
+                                    self.read_graph_version_edge_weights(graph_version, missed_pairs, weight_id)))
+
+            for (source_vertex_id, target_vertex_id), weight in read_weights.items():
+                TemporalGraphEngine.edge_weight_cache.set(
+                    (graph_version.graph_uuid, source_vertex_id, target_vertex_id, weight_id), weight)
+
+            weights = [read_weights[edge_pair] if weight is MISSING else weight
+                       for edge_pair, weight in zip(edge_pairs, weights)]
+
+        return weights
+
+    def read_graph_version_edge_weights(self, graph_version, edge_pairs, weight_id):
+        """
+        Reads edge weights of many edges of a particular graph_version from the graph backend, bypassing the cache
+
+        :param graph_version: [GraphVersion]
+        :param edge_pairs: List[(source_vertex_id, target_vertex_id)]
+        :param weight_id: [String]
+        :return: List[Float or None] weights, in the order of edge_pairs
+        """
+        weights      = {}
+        missed_pairs = list(set(edge_pairs))
+
+        # one batched read per version of the chain, for the edges not found in more recent versions
+        for chain_version in self.get_version_chain(graph_version):
+            graph_client = self.get_read_graph_client(chain_version)
+
+            edge_properties = graph_client.get_edge_properties(missed_pairs, weight_id)
+
+            if edge_properties is None:
+                raise IOError(f'Failed to read {len(missed_pairs)} edge weights of {chain_version.graph_uuid}')
+
+            for edge_pair, prop_value in edge_properties.items():
+                if as_weight(prop_value) is not None:
+                    weights[edge_pair] = as_weight(prop_value)
+
+            missed_pairs = [edge_pair for edge_pair in missed_pairs if edge_pair not in weights]
+
+            if not missed_pairs:
+                break
+
+        return [None if is_tombstone(weights.get(edge_pair)) else weights.get(edge_pair) for edge_pair in edge_pairs]
+
+    def get_graph_version_edge_weight_maps(self, graph_version, edge_pairs, weight_ids = None):
+        """
+        Retrieves several weights of many edges of a particular graph_version.
+        With weight_ids, edges missing from the cache are read from the graph backend in one batched call per
+        version of the chain. Without, every weight is read from the graph backend
+
+        :param graph_version: [GraphVersion]
+        :param edge_pairs: List[(source_vertex_id, target_vertex_id)]
+        :param weight_ids: List[String] weights to retrieve, every weight of the edges if None
+        :return: List[Dict[weight_id, Float or None]] weights, in the order of edge_pairs. With weight_ids every
+                 weight id is a key, without only the weights the edge has are
+        """
+        if not graph_version.committed:
+            return self.read_graph_version_edge_weight_maps(graph_version, edge_pairs, weight_ids)
+
+        if weight_ids is None:
+            weight_maps = self.read_graph_version_edge_weight_maps(graph_version, edge_pairs)
+
+            for (source_vertex_id, target_vertex_id), weights in zip(edge_pairs, weight_maps):
+                for weight_id, weight in weights.items():
+                    TemporalGraphEngine.edge_weight_cache.set(
+                        (graph_version.graph_uuid, source_vertex_id, target_vertex_id, weight_id), weight)
+
+            return weight_maps
+
+        weight_maps  = []
+        missed_pairs = []
+
+        for source_vertex_id, target_vertex_id in edge_pairs:
+            weights = {weight_id: TemporalGraphEngine.edge_weight_cache.get(
+                (graph_version.graph_uuid, source_vertex_id, target_vertex_id, weight_id)) for weight_id in weight_ids}
+
+            if MISSING in weights.values():
+                missed_pairs.append((source_vertex_id, target_vertex_id))
+
+            weight_maps.append(weights)
+
+        if missed_pairs:
+            read_weights = dict(zip(missed_pairs,
+                                    self.read_graph_version_edge_weight_maps(graph_version, missed_pairs, weight_ids)))
+
+            for (source_vertex_id, target_vertex_id), weights in read_weights.items():
+                for weight_id, weight in weights.items():
+                    TemporalGraphEngine.edge_weight_cache.set(
+                        (graph_version.graph_uuid, source_vertex_id, target_vertex_id, weight_id), weight)
+
+            weight_maps = [read_weights[edge_pair] if MISSING in weights.values() else weights
+                           for edge_pair, weights in zip(edge_pairs, weight_maps)]
+
+        return weight_maps
+
+    def read_graph_version_edge_weight_maps(self, graph_version, edge_pairs, weight_ids = None):
+        """
+        Reads several weights of many edges of a particular graph_version from the graph backend, bypassing the cache.
+        Each weight of an edge is decided by the most recent version of the chain holding it
+
+        :param graph_version: [GraphVersion]
+        :param edge_pairs: List[(source_vertex_id, target_vertex_id)]
+        :param weight_ids: List[String] weights to read, every weight of the edges if None
+        :return: List[Dict[weight_id, Float or None]] see get_graph_version_edge_weight_maps
+        """
+        weights      = {edge_pair: {} for edge_pair in edge_pairs}
+        missed_pairs = list(weights)
+
+        # one batched read per version of the chain. With weight_ids, only for the edges missing some of them
+        for chain_version in self.get_version_chain(graph_version):
+            graph_client = self.get_read_graph_client(chain_version)
+
+            edge_property_maps = graph_client.get_edge_property_maps(missed_pairs, weight_ids)
+
+            if edge_property_maps is None:
+                raise IOError(f'Failed to read {len(missed_pairs)} edge weight maps of {chain_version.graph_uuid}')
+
+            for edge_pair, prop_values in edge_property_maps.items():
+                for weight_id, prop_value in prop_values.items():
+                    if as_weight(prop_value) is not None:
+                        weights[edge_pair].setdefault(weight_id, as_weight(prop_value))
+
+            if weight_ids is not None:
+                missed_pairs = [edge_pair for edge_pair in missed_pairs if len(weights[edge_pair]) < len(weight_ids)]
+
+                if not missed_pairs:
+                    break
+
+        # removed weights are dropped, or None with weight_ids
+        weights = {edge_pair: {weight_id: weight for weight_id, weight in edge_weights.items()
+                               if not is_tombstone(weight)} for edge_pair, edge_weights in weights.items()}
+
+        if weight_ids is None:
+            return [dict(weights[edge_pair]) for edge_pair in edge_pairs]
+
+        return [{weight_id: weights[edge_pair].get(weight_id) for weight_id in weight_ids} for edge_pair in edge_pairs]
+
+    def construct_graph(self,
+                        temporal_graph_id,
+                        weight_id,
+                        version_id,
+                        vertex_edge_pairs,
+                        commit = False,
+                        batch_size = None,
+                        parent_version_id = None,
+                        shards = None):
+        """
+        Construct/add to an uncommitted temporal graph.
+        Once a graph version is committed, it is immutable and cannot be modified
+
+        A version constructed with a parent_version_id is a delta of that (committed) version: its payload only
+        holds the edges that changed, with a null weight for edges that were removed. Every other edge is
+        inherited from the parent
+
+
+        :param temporal_graph_id: [String]
+        :param weight_id: [String]
+        :param version_id: [Int]
+        :param vertex_edge_pairs: List[{
+              "source_vertex_id": "vert1",
+              "target_vertex_id": "vert2"
+              "weight":0.65
+          },{..}]
+              or edges carrying several weights, written at once: {
+              "source_vertex_id": "vert1",
+              "target_vertex_id": "vert2"
+              "weights": {"weight_id1": 0.65, "weight_id2": 0.3}
+          }. weight_id is the weight of the edges with a single "weight"
+        :param commit: [Bool]
+        :param batch_size: [Int] edges written per backend statement. Defaults to the GraphClient's batch size
+        :param parent_version_id: [Int] committed version this version is a delta of. Only used when the
+                 version is created
+        :param shards: [Int] partitions of the payload written in parallel. Defaults to INGESTION_SHARDS
+        :return: [Bool]. True if successfully constructed
+                       False if data format error or trying to append to an immutable graph
+        """
+
+        graph_version = self.get_writable_graph_version(temporal_graph_id, version_id, parent_version_id)
+
+        if graph_version is None:
+            return False
+
+        graph_client = self.get_graph_client(graph_version.graph_uuid)
+
+        edges, edges_weight_id = as_payload_edges(vertex_edge_pairs, weight_id)
+
+        if not self.write_edges(graph_client, edges, edges_weight_id, batch_size, shards):
+            logger.error(f'Failed to write {len(edges)} edges to TemporalGraph with id:{temporal_graph_id} '
+                         f'and version: {version_id}')
+
+            return False
+
+        if commit:
+            self.commit_graph_version(graph_version)
+
+        return True
+
+    def write_edges(self, graph_client, edges, weight_id, batch_size = None, shards = None):
+        """
+        Writes edges with graph_client, in shards partitions written in parallel if its backend supports parallel
+        writes. A sharded write is not atomic: partitions written before a failing one are kept
+
+        :param graph_client: [GraphClient]
+        :param edges: List[(source_vertex_id, target_vertex_id, weight)]
+        :param weight_id: [String] or None if edges carry a Dict[weight_id, weight] instead of weight, see
+                 as_payload_edges
+        :param batch_size: [Int] edges written per backend statement
+        :param shards: [Int] Defaults to INGESTION_SHARDS
+        :return: [Bool] True if all edges were written
+        """
+        shards = INGESTION_SHARDS if shards is None else shards
+
+        if shards > 1 and graph_client.supports_parallel_writes and len(edges) >= MIN_SHARDED_EDGES:
+            with timed('sharded_write'):
+                return sharded_ingestion.write_sharded(graph_client, edges, weight_id, batch_size, shards)
+
+        if weight_id is None:
+            return graph_client.set_edge_property_maps(edges, batch_size)
+
+        return graph_client.set_edge_properties(edges, weight_id, batch_size)
+
+    def get_writable_graph_version(self, temporal_graph_id, version_id, parent_version_id = None):
+        """
+        Gets or creates an uncommitted graph version to construct
+
+        :param temporal_graph_id: [String]
+        :param version_id: [Int]
+        :param parent_version_id: [Int] committed version the version is a delta of. Only used when the
+                 version is created
+        :return: [GraphVersion] or None if the version is committed or does not match parent_version_id
+        """
+        defaults = {}
+
+        if parent_version_id:
+            parent = self.get_graph_version(temporal_graph_id, version_id=parent_version_id)
+
+            if not parent:
+                logger.error(f'TemporalGraph with id:{temporal_graph_id} has no committed parent version: '
+                             f'{parent_version_id}')
+
+                return None
+
+            defaults = { 'parent': parent, 'delta_depth': parent.delta_depth + 1 }
+
+        graph_version, created = TemporalGraphEngine.get_graph_version_model().objects.get_or_create(
+            temporal_graph_id = temporal_graph_id,
+            version_id        = int(version_id),
+            defaults          = defaults
+        )
+
+        if not created and parent_version_id and graph_version.parent_id != defaults['parent'].pk:
+            logger.error(f'TemporalGraph with id:{temporal_graph_id} and version: {version_id} was not created as '
+                         f'a delta of version: {parent_version_id}')
+
+            return None
+
+        if graph_version.committed:
+            # graph_version has been previously committed
+            logger.error(f'TemporalGraph with id:{temporal_graph_id} and version: {version_id} cannot be'
+                         f' modified since it has previously been COMMITTED')
+
+            return None
+
+        return graph_version
+
+    def ingest_graph(self,
+                     temporal_graph_id,
+                     weight_id,
+                     version_id,
+                     records,
+                     offset = 0,
+                     commit = False,
+                     batch_size = None,
+                     parent_version_id = None,
+                     shards = None):
+        """
+        Construct/add to an uncommitted temporal graph from a stream of edge records, written in batches of
+        INGESTION_BATCH_SIZE records. Progress is recorded after every batch, so that an interrupted upload
+        can be resumed from its last batch: records already ingested are skipped.
+
+        An error raised while iterating records is propagated, batches written before it are kept
+
+
+        :param temporal_graph_id: [String]
+        :param weight_id: [String]
+        :param version_id: [Int]
+        :param records: Iterator[{ "source_vertex_id": "vert1", "target_vertex_id": "vert2", "weight": 0.65 }]
+                 or records carrying several "weights", see construct_graph
+        :param offset: [Int] position in the upload of the first of records
+        :param commit: [Bool] commit the version once every record is written
+        :param batch_size: [Int] edges written per backend statement. Defaults to the GraphClient's batch size
+        :param parent_version_id: [Int] see construct_graph
+        :param shards: [Int] see construct_graph, each batch is partitioned
+        :return: ([Bool], [Int]) whether every record was written, and the number of records of the upload
+                 ingested so far: the offset to resume from
+        """
+        graph_version = self.get_writable_graph_version(temporal_graph_id, version_id, parent_version_id)
+
+        if graph_version is None:
+            return False, self.get_ingestion_progress(temporal_graph_id, weight_id, version_id)
+
+        progress, _ = TemporalGraphEngine.get_ingestion_progress_model().objects.get_or_create(
+            graph_version = graph_version,
+            weight_id     = weight_id
+        )
+
+        if offset > progress.ingested_records:
+            logger.error(f'Upload to TemporalGraph with id:{temporal_graph_id} and version: {version_id} resumes at '
+                         f'record {offset} but only {progress.ingested_records} records were ingested')
+
+            return False, progress.ingested_records
+
+        graph_client = self.get_graph_client(graph_version.graph_uuid)
+
+        records = itertools.islice(records, progress.ingested_records - offset, None)
+
+        while True:
+            edges, edges_weight_id = as_payload_edges(list(itertools.islice(records, INGESTION_BATCH_SIZE)),
+                                                      weight_id)
+
+            if not edges:
+                break
+
+            if not self.write_edges(graph_client, edges, edges_weight_id, batch_size, shards):
+                logger.error(f'Failed to write {len(edges)} edges to TemporalGraph with id:{temporal_graph_id} '
+                             f'and version: {version_id}')
+
+                return False, progress.ingested_records
+
+            progress.ingested_records += len(edges)
+            progress.committed_at      = datetime.now()
+            progress.save(update_fields=['ingested_records', 'committed_at'])
+
+        if commit:
+            self.commit_graph_version(graph_version)
+
+        return True, progress.ingested_records
+
+    def get_ingestion_progress(self, temporal_graph_id, weight_id, version_id):
+        """
+        Retrieves the resume token of a streamed upload
+
+        :param temporal_graph_id: [String]
+        :param weight_id: [String]
+        :param version_id: [Int]
+        :return: [Int] number of records of the upload ingested so far
+        """
+        progress = TemporalGraphEngine.get_ingestion_progress_model().objects.get_or_none(
+            graph_version__temporal_graph_id = temporal_graph_id,
+            graph_version__version_id        = int(version_id),
+            weight_id                        = weight_id
+        )
+
+        return progress.ingested_records if progress else 0
+
+    def enqueue_construction_job(self,
+                                 temporal_graph_id,
+                                 weight_id,
+                                 version_id,
+                                 vertex_edge_pairs,
+                                 commit = False,
+                                 batch_size = None,
+                                 parent_version_id = None,
+                                 job_batch_size = None):
+        """
+        Queues the construction of an uncommitted temporal graph version, see construct_graph. The payload is
+        split in batches of job_batch_size edges that workers (see run_construction_workers) write in parallel.
+        With commit, the version is committed once every batch of every job of the version that did not fail landed
+
+        :param temporal_graph_id: [String]
+        :param weight_id: [String]
+        :param version_id: [Int]
+        :param vertex_edge_pairs: List[{ "source_vertex_id": "vert1", "target_vertex_id": "vert2", "weight":0.65 }]
+                 or edges carrying several "weights", see construct_graph
+        :param commit: [Bool]
+        :param batch_size: [Int] edges written per backend statement. Defaults to the GraphClient's batch size
+        :param parent_version_id: [Int] committed version this version is a delta of
+        :param job_batch_size: [Int] edges per queued batch. Defaults to CONSTRUCTION_JOB_BATCH_SIZE
+        :return: [ConstructionJob] or None if the version cannot be modified
+        :raises KeyError, TypeError, ValueError: if an edge of the payload is malformed
+        """
+        job_batch_size = job_batch_size or CONSTRUCTION_JOB_BATCH_SIZE
+
+        # malformed payloads are rejected before anything is queued
+        as_payload_edges(vertex_edge_pairs, weight_id)
+
+        graph_version = self.get_writable_graph_version(temporal_graph_id, version_id, parent_version_id)
+
+        if graph_version is None:
+            return None
+
+        batches = [vertex_edge_pairs[start:start + job_batch_size]
+                   for start in range(0, len(vertex_edge_pairs), job_batch_size)]
+
+        with transaction.atomic():
+            job = TemporalGraphEngine.get_construction_job_model().objects.create(
+                graph_version = graph_version,
+                weight_id     = weight_id,
+                commit        = commit,
+                batch_size    = batch_size,
+                num_batches   = len(batches),
+                num_edges     = len(vertex_edge_pairs)
+            )
+
+            TemporalGraphEngine.get_construction_batch_model().objects.bulk_create([
+                TemporalGraphEngine.get_construction_batch_model()(
+                    job       = job,
+                    index     = index,
+                    payload   = json.dumps(batch),
+                    num_edges = len(batch)
+                ) for index, batch in enumerate(batches)
+            ])
+
+        # an empty job has landed as soon as it is queued
+        if not batches:
+            self.finish_construction_job(job)
+
+        return job
+
+    def claim_construction_batches(self, worker, limit):
+        """
+        Claims up to limit queued batches, oldest job first. A batch is claimed by one worker only
+
+        :param worker: [String] token of the claiming worker, unique per claim
+        :param limit: [Int]
+        :return: List[Int] ids of the claimed batches
+        """
+        batch_model = TemporalGraphEngine.get_construction_batch_model()
+
+        with timed('db_query'):
+            # batches of a failed job are never written
+            candidate_ids = list(batch_model.objects.filter(
+                status=ConstructionJob.QUEUED
+            ).exclude(
+                job__status=ConstructionJob.FAILED
+            ).order_by('job_id', 'index').values_list('pk', flat=True)[:limit])
+
+            if not candidate_ids:
+                return []
+
+            # batches claimed by another worker since they were read are no longer queued and are left out
+            batch_model.objects.filter(pk__in=candidate_ids, status=ConstructionJob.QUEUED).update(
+                status     = ConstructionJob.RUNNING,
+                worker     = worker,
+                started_at = timezone.now(),
+                attempts   = F('attempts') + 1
+            )
+
+            claimed = list(batch_model.objects.filter(
+                pk__in=candidate_ids, status=ConstructionJob.RUNNING, worker=worker
+            ).values_list('pk', 'job_id'))
+
+            TemporalGraphEngine.get_construction_job_model().objects.filter(
+                pk__in={job_id for _, job_id in claimed}, status=ConstructionJob.QUEUED
+            ).update(status=ConstructionJob.RUNNING, started_at=timezone.now())
+
+        return [batch_id for batch_id, _ in claimed]
+
+    def requeue_stale_construction_batches(self, timeout):
+        """
+        Queues again the batches claimed more than timeout seconds ago, e.g. by a worker that died.
+        Writing a batch twice is harmless: edge properties are set, not added. Stale batches of a failed job fail
+
+        :param timeout: [Int] seconds
+        :return: [Int] number of batches queued again
+        """
+        stale_batches = TemporalGraphEngine.get_construction_batch_model().objects.filter(
+            status=ConstructionJob.RUNNING,
+            started_at__lt=timezone.now() - timedelta(seconds=timeout)
+        )
+
+        stale_batches.filter(job__status=ConstructionJob.FAILED).update(status=ConstructionJob.FAILED, worker=None,
+                                                                         error='Job failed')
+
+        return stale_batches.exclude(job__status=ConstructionJob.FAILED).update(status=ConstructionJob.QUEUED,
+                                                                                worker=None)
+
+    def run_construction_batch(self, batch_id):
+        """
+        Writes a claimed batch to the graph backend. A failed batch is queued again, or fails its job once it was
+        attempted CONSTRUCTION_JOB_MAX_ATTEMPTS times, along with the batches of the job left. A batch of a job
+        failed by another batch fails without being written. The last batch of a job to land finishes the job
+
+        :param batch_id: [Int]
+        :return: [Bool] True if the batch landed
+        """
+        batch_model = TemporalGraphEngine.get_construction_batch_model()
+        job_model   = TemporalGraphEngine.get_construction_job_model()
+
+        batch = batch_model.objects.select_related('job__graph_version').get(pk=batch_id)
+        job   = batch.job
+
+        if job.status == ConstructionJob.FAILED:
+            batch_model.objects.filter(pk=batch.pk).update(status=ConstructionJob.FAILED, error='Job failed')
+
+            return False
+
+        error = None
+        start = time.perf_counter()
+
+        if job.graph_version.committed:
+            error = f'TemporalGraph with id:{job.graph_version.temporal_graph_id} and version: ' \
+                    f'{job.graph_version.version_id} was committed before the batch landed'
+        else:
+            try:
+                edges, edges_weight_id = as_payload_edges(json.loads(batch.payload), job.weight_id)
+
+                # batches are already written in parallel by the workers
+                if not self.write_edges(self.get_graph_client(job.graph_version.graph_uuid), edges, edges_weight_id,
+                                        job.batch_size, shards=1):
+                    error = f'Failed to write {len(edges)} edges'
+            except Exception as e:
+                error = f'Failed to write batch: {e}'
+
+        duration = time.perf_counter() - start
+
+        if error:
+            logger.error(f'Construction batch {batch.index} of job {job.pk}: {error}')
+
+            # a version committed under the batch cannot be written, retrying would not help. Neither can a job
+            # failed by another batch meanwhile
+            if batch.attempts < CONSTRUCTION_JOB_MAX_ATTEMPTS and not job.graph_version.committed and \
+                    batch_model.objects.filter(pk=batch.pk).exclude(job__status=ConstructionJob.FAILED).update(
+                        status=ConstructionJob.QUEUED, worker=None, error=error):
+                return False
+
+            with transaction.atomic():
+                batch_model.objects.filter(pk=batch.pk).update(status=ConstructionJob.FAILED, error=error,
+                                                               duration=duration)
+
+                # the first batch to fail the job is reported as its error
+                job_model.objects.filter(pk=job.pk).exclude(status=ConstructionJob.FAILED).update(
+                    status=ConstructionJob.FAILED, error=f'Batch {batch.index}: {error}')
+
+                batch_model.objects.filter(job_id=job.pk, status=ConstructionJob.QUEUED).update(
+                    status=ConstructionJob.FAILED, error='Job failed')
+
+            return False
+
+        with transaction.atomic():
+            batch_model.objects.filter(pk=batch.pk).update(status=ConstructionJob.DONE, error=None,
+                                                           duration=duration)
+
+            job_model.objects.filter(pk=job.pk).update(batches_done = F('batches_done') + 1,
+                                                       edges_done   = F('edges_done') + batch.num_edges)
+
+        self.finish_construction_job(job)
+
+        return True
+
+    def finish_construction_job(self, job):
+        """
+        Marks job done once all its batches landed and commits its version once every job of the version is done.
+        A failed job does not hold the version back: it is superseded by the jobs enqueued for the version after it,
+        e.g. its retry. Called after every batch: conditional updates ensure a job finishes and a version commits
+        exactly once
+
+        :param job: [ConstructionJob]
+        :return:
+        """
+        job_model = TemporalGraphEngine.get_construction_job_model()
+
+        finished = job_model.objects.filter(
+            pk=job.pk,
+            batches_done=F('num_batches'),
+            status__in=(ConstructionJob.QUEUED, ConstructionJob.RUNNING)
+        ).update(status=ConstructionJob.DONE, committed_at=timezone.now())
+
+        if not finished:
+            return
+
+        graph_version = job.graph_version
+        live_jobs     = job_model.objects.filter(graph_version=graph_version).exclude(status=ConstructionJob.FAILED)
+
+        if not live_jobs.filter(commit=True).exists() or live_jobs.exclude(status=ConstructionJob.DONE).exists():
+            return
+
+        # the version is committed by the first finishing job to flip it
+        with transaction.atomic():
+            committed = TemporalGraphEngine.get_graph_version_model().objects.filter(
+                pk=graph_version.pk, committed=False).update(committed=True, committed_at=timezone.now())
+
+        if not committed:
+            return
+
+        graph_version.refresh_from_db()
+
+        self.get_graph_client(graph_version.graph_uuid).commit()
+        self.publish_graph_version(graph_version)
+
+        logger.info(f'Committed {graph_version.graph_uuid} after its construction jobs landed')
+
+    def get_construction_job_status(self, job_id):
+        """
+        :param job_id: [Int]
+        :return: {
+              "job_id": 1, "temporal_graph_id": "tg", "weight_id": "w", "version_id": 3, "status": "running",
+              "commit": true, "committed": false, "error": null,
+              "num_batches": 4, "batches_done": 2, "num_edges": 40000, "edges_done": 20000, "progress": 0.5,
+              "created_at": 1508956621, "started_at": 1508956622, "finished_at": null,
+              "edges_per_second": 51234.5,
+              "batches": [{"index": 0, "status": "done", "attempts": 1, "num_edges": 10000, "duration": 0.19,
+                           "edges_per_second": 52631.5, "error": null}, {..}]
+          } or None if the job does not exist. edges_per_second of the job is the sum of the rates of its
+          landed batches, i.e. its throughput with every batch written in parallel
+        """
+        job = TemporalGraphEngine.get_construction_job_model().objects.select_related('graph_version').filter(
+            pk=job_id).first()
+
+        if job is None:
+            return None
+
+        batches = [{
+            'index':            batch.index,
+            'status':           batch.status,
+            'attempts':         batch.attempts,
+            'num_edges':        batch.num_edges,
+            'duration':         batch.duration,
+            'edges_per_second': batch.num_edges / batch.duration if batch.duration else None,
+            'error':            batch.error,
+        } for batch in job.batches.defer('payload').order_by('index')]
+
+        landed = [batch for batch in batches if batch['status'] == ConstructionJob.DONE and batch['duration']]
+
+        return {
+            'job_id':            job.pk,
+            'temporal_graph_id': job.graph_version.temporal_graph_id,
+            'weight_id':         job.weight_id,
+            'version_id':        job.graph_version.version_id,
+            'status':            job.status,
+            'commit':            job.commit,
+            'committed':         job.graph_version.committed,
+            'error':             job.error,
+            'num_batches':       job.num_batches,
+            'batches_done':      job.batches_done,
+            'num_edges':         job.num_edges,
+            'edges_done':        job.edges_done,
+            'progress':          job.batches_done / job.num_batches if job.num_batches else 1.0,
+            'created_at':        unix_timestamp(job.created_at),
+            'started_at':        unix_timestamp(job.started_at) if job.started_at else None,
+            'finished_at':       unix_timestamp(job.committed_at) if job.committed_at else None,
+            'edges_per_second':  sum(batch['edges_per_second'] for batch in landed) if landed else None,
+            'batches':           batches,
+        }
+
+    def get_edge_weight(self,
+                        temporal_graph_id,
+                        weight_id,
+                        source_vertex_id,
+                        target_vertex_id,
+                        version_id = None,
+                        timestamp  = None
+                        ):
+        """
+        Retrieve weight of an edge of a (committed) temporal graph version at a given point in time
 
-        :param graph_uuid:
-        :return:
+        :param temporal_graph_id: [String]
+        :param weight_id: [String]
+        :param source_vertex_id: [String]
+        :param target_vertex_id: [String]
+        :param version_id: [Int] If version_id is passed in, timestamp is ignored and the edge of
+                 the graph at this specific version is returned
+        :param timestamp: [Int] Unix epoch. edge of the graph at this point in time
+        :return: [Float] weight if edge with weight_id exists
+                           else None (if version of graph doesn't exist or edge does not exist)
         """
-        return NeoGraphClient(graph_uuid)
 
-    @classmethod
-    def get_graph_version_model(cls):
+        graph_version = self.get_graph_version(temporal_graph_id, version_id, timestamp)
+
+        if graph_version:
+            return self.get_graph_version_edge_weight(graph_version, source_vertex_id, target_vertex_id, weight_id)
+        else:
+            return None
+
+    def get_edge_weights(self,
+                         temporal_graph_id,
+                         weight_id,
+                         edge_pairs,
+                         version_id = None,
+                         timestamp  = None
+                         ):
         """
-        ORM to get and set Graph Versions
+        Retrieve weights of many edges of a (committed) temporal graph version at a given point in time.
+        The version is resolved once and the weights are read with a single batched GraphClient call
 
-        :return:
+        :param temporal_graph_id: [String]
+        :param weight_id: [String]
+        :param edge_pairs: List[(source_vertex_id, target_vertex_id)]
+        :param version_id: [Int] If version_id is passed in, timestamp is ignored
+        :param timestamp: [Int] Unix epoch
+        :return: List[Float or None] weights in the order of edge_pairs
+                 None if version of graph doesn't exist
         """
-        return GraphVersion
 
-    @classmethod
-    def get_user_edge_weight_model(cls):
+        graph_version = self.get_graph_version(temporal_graph_id, version_id, timestamp)
+
+        if graph_version:
+            edge_pairs = [(str(source_vertex_id), str(target_vertex_id)) for source_vertex_id, target_vertex_id
+                          in edge_pairs]
+
+            return self.get_graph_version_edge_weights(graph_version, edge_pairs, weight_id)
+        else:
+            return None
+
+    def get_edge_weight_maps(self,
+                             temporal_graph_id,
+                             edge_pairs,
+                             weight_ids = None,
+                             version_id = None,
+                             timestamp  = None
+                             ):
         """
-        ORM to get and set User Edge Weights
+        Retrieve several weights of one or many edges of a (committed) temporal graph version at a given point
+        in time, in one round trip per version of the chain rather than one per weight
 
-        :return:
+        :param temporal_graph_id: [String]
+        :param edge_pairs: List[(source_vertex_id, target_vertex_id)]
+        :param weight_ids: List[String] weights to retrieve, every weight of the edges if None
+        :param version_id: [Int] If version_id is passed in, timestamp is ignored
+        :param timestamp: [Int] Unix epoch
+        :return: List[Dict[weight_id, Float or None]] weights in the order of edge_pairs, see
+                 get_graph_version_edge_weight_maps. None if version of graph doesn't exist
         """
-        return UserEdgeWeight
 
-    def get_graph_version(self, temporal_graph_id, version_id = None, timestamp = None):
+        graph_version = self.get_graph_version(temporal_graph_id, version_id, timestamp)
+
+        if graph_version:
+            edge_pairs = [(str(source_vertex_id), str(target_vertex_id)) for source_vertex_id, target_vertex_id
+                          in edge_pairs]
+
+            weight_ids = None if weight_ids is None else [str(weight_id) for weight_id in dict.fromkeys(weight_ids)]
+
+            return self.get_graph_version_edge_weight_maps(graph_version, edge_pairs, weight_ids)
+        else:
+            return None
+
+    def get_adjacent_edges(self,
+                           temporal_graph_id,
+                           weight_id,
+                           source_vertex_id,
+                           version_id = None,
+                           timestamp  = None,
+                           page_size  = None
+                           ):
         """
-        Retrieves the committed version of a temporal graph based on (in order of priority):
-         1. version_id - retrieve specific verison
-         2. timestamp  - retrieves the committed version at this point in time
-         3. latest version of temporal graph
-        :param temporal_graph_id:
-        :param version_id:
-        :param timestamp:
-        :return:
+        Stream the outgoing edges of a vertex of a (committed) temporal graph version at a given point in time
+
+        :param temporal_graph_id: [String]
+        :param weight_id: [String]
+        :param source_vertex_id: [String]
+        :param version_id: [Int] If version_id is passed in, timestamp is ignored
+        :param timestamp: [Int] Unix epoch
+        :param page_size: [Int] edges fetched from the graph backend at a time
+        :return: Iterator[(target_vertex_id, weight)] ordered by target_vertex_id.
+                 None if version of graph doesn't exist
         """
-        if version_id:
-            # retrieve specific version
-             graph_version = TemporalGraphEngine.get_graph_version_model().objects.get_latest_or_none('committed_at',
-                 temporal_graph_id=temporal_graph_id,
-                 version_id=int(version_id),
-                 committed=True
-            )
-        elif timestamp:
-            # retrieve latest version committed before this timestamp (latest at that point)
-            graph_version = TemporalGraphEngine.get_graph_version_model().objects.get_latest_or_none('committed_at',
-                temporal_graph_id=temporal_graph_id,
-                committed_at__lte=timestamp,
-                committed=True
-            )
-        else:
-            # get latest graph verison
-            graph_version = TemporalGraphEngine.get_graph_version_model().objects.get_latest_or_none('committed_at',
-                temporal_graph_id=temporal_graph_id,
-                committed=True
-            )
 
-        return graph_version
+        graph_version = self.get_graph_version(temporal_graph_id, version_id, timestamp)
 
-    def get_graph_version_edge_weight(self, graph_version, source_vertex_id, target_vertex_id, weight_id):
+        if graph_version:
+            return self.iter_graph_version_adjacent_edges(graph_version, source_vertex_id, weight_id, page_size)
+        else:
+            return None
+
+    def iter_graph_version_adjacent_edges(self, graph_version, source_vertex_id, weight_id, page_size = None):
         """
-        Retrieves edge weight of a particular graph_version
+        Streams the outgoing edges of a vertex of graph_version, resolving deltas through the parent chain
 
         :param graph_version: [GraphVersion]
         :param source_vertex_id: [String]
-        :param target_vertex_id: [String]
         :param weight_id: [String]
-        :return: [Float] weight or None if it does not exist
+        :param page_size: [Int] edges fetched from the graph backend at a time
+        :return: Iterator[(target_vertex_id, weight)] ordered by target_vertex_id
         """
-        graph_client = self.get_graph_client(graph_version.graph_uuid)
+        streams = [self.get_read_graph_client(chain_version).get_adjacent_edges(source_vertex_id, weight_id, page_size)
+                   for chain_version in self.get_version_chain(graph_version)]
 
-        weight = graph_client.get_edge_property(source_vertex_id, target_vertex_id, weight_id)
+        for depth, (target_vertex_id, prop_value) in merge_delta_streams(streams, key=lambda edge: edge[0]):
+            weight = as_weight(prop_value)
 
-        if not weight:
-            return None
-        else:
-            return weight
+            if not is_tombstone(weight):
+                yield target_vertex_id, weight
 
-    def construct_graph(self,
-                        temporal_graph_id,
-                        weight_id,
-                        version_id,
-                        vertex_edge_pairs,
-                        commit = False):
+    def get_neighbourhood(self,
+                          temporal_graph_id,
+                          weight_id,
+                          source_vertex_id,
+                          hops = 2,
+                          top_n = None,
+                          aggregation = 'product',
+                          version_id = None,
+                          timestamp = None
+                          ):
         """
-        Construct/add to an uncommitted temporal graph.
-        Once a graph version is committed, it is immutable and cannot be modified
+        Retrieves the vertices reachable from a vertex in up to hops edges, scored by their best path:
+        the product or sum of the edge weights along it.
 
+        Traversal is breadth first, reading the adjacent edges of a whole hop's frontier in one batched call per
+        version of the chain. With top_n, only the top_n best scored vertices reached at each hop are kept and
+        expanded further
 
         :param temporal_graph_id: [String]
         :param weight_id: [String]
-        :param version_id: [Int]
-        :param vertex_edge_pairs: List[{
-              "source_vertex_id": "vert1",
-              "target_vertex_id": "vert2"
-              "weight":0.65
-          },{..}]
-        :param commit: [Bool]
-        :return: [Bool]. True if successfully constructed
-                       False if data format error or trying to append to an immutable graph
+        :param source_vertex_id: [String]
+        :param hops: [Int] at most MAX_HOPS
+        :param top_n: [Int] vertices kept per hop, all if None
+        :param aggregation: [String] 'product' or 'sum', see PATH_AGGREGATIONS
+        :param version_id: [Int] If version_id is passed in, timestamp is ignored
+        :param timestamp: [Int] Unix epoch
+        :return: List[(vertex_id, weight, hops)] ordered by descending weight, hops being the length of the best
+                 path. None if version of graph doesn't exist
         """
+        if not 1 <= hops <= MAX_HOPS:
+            raise ValueError(f'hops must be between 1 and {MAX_HOPS}')
 
-        graph_version, created = TemporalGraphEngine.get_graph_version_model().objects.get_or_create(
-            temporal_graph_id = temporal_graph_id,
-            version_id        = int(version_id)
-        )
+        if aggregation not in PATH_AGGREGATIONS:
+            raise ValueError(f'aggregation must be one of {sorted(PATH_AGGREGATIONS)}')
 
-        if graph_version.committed:
-            # graph_version has been previously committed
-            logger.error(f'TemporalGraph with id:{temporal_graph_id} and version: {version_id} cannot be'
-                         f' modified since it has previously been COMMITTED')
+        graph_version = self.get_graph_version(temporal_graph_id, version_id, timestamp)
 
-            return False
-        else:
-            graph_client = self.get_graph_client(graph_version.graph_uuid)
+        if not graph_version:
+            return None
 
-            for vertex_edge in vertex_edge_pairs:
-                graph_client.set_edge_property(vertex_edge['source_vertex_id'],
-                                               vertex_edge['target_vertex_id'],
-                                               weight_id,
-                                               float(vertex_edge['weight'])
-                                               )
+        empty_path_weight, combine = PATH_AGGREGATIONS[aggregation]
 
-        if commit:
-            graph_version.commit_version()
+        # vertex_id -> (weight, hops) of the best path found so far
+        reached  = { source_vertex_id: (empty_path_weight, 0) }
+        frontier = { source_vertex_id: empty_path_weight }
 
-        return True
+        for hop in range(1, hops + 1):
+            adjacent_edges = self.read_graph_version_many_adjacent_edges(graph_version, list(frontier), weight_id)
 
-    def get_edge_weight(self,
-                        temporal_graph_id,
-                        weight_id,
-                        source_vertex_id,
-                        target_vertex_id,
-                        version_id = None,
-                        timestamp  = None
-                        ):
+            candidates = {}
+
+            for vertex_id, path_weight in frontier.items():
+                for target_vertex_id, weight in adjacent_edges.get(vertex_id, []):
+                    if target_vertex_id == source_vertex_id:
+                        continue
+
+                    candidate_weight = combine(path_weight, weight)
+
+                    if candidate_weight > candidates.get(target_vertex_id, float('-inf')):
+                        candidates[target_vertex_id] = candidate_weight
+
+            if top_n is not None:
+                candidates = dict(heapq.nlargest(top_n, candidates.items(), key=operator.itemgetter(1)))
+
+            # only vertices whose best path improved are expanded again
+            frontier = {}
+
+            for vertex_id, path_weight in candidates.items():
+                if vertex_id not in reached or path_weight > reached[vertex_id][0]:
+                    reached[vertex_id]  = (path_weight, hop)
+                    frontier[vertex_id] = path_weight
+
+            if not frontier:
+                break
+
+        return sorted(((vertex_id, weight, path_hops) for vertex_id, (weight, path_hops) in reached.items()
+                       if vertex_id != source_vertex_id),
+                      key=lambda vertex: (-vertex[1], vertex[0]))
+
+    def read_graph_version_many_adjacent_edges(self, graph_version, source_vertex_ids, weight_id):
         """
-        Retrieve weight of an edge of a (committed) temporal graph version at a given point in time
+        Reads the outgoing edges of many vertices of graph_version, one batched read per version of the chain
+
+        :param graph_version: [GraphVersion]
+        :param source_vertex_ids: List[String]
+        :param weight_id: [String]
+        :return: Dict[source_vertex_id, List[(target_vertex_id, weight)]]
+        """
+        # source_vertex_id -> {target_vertex_id: weight}, the most recent version of the chain holding an edge wins
+        resolved = {}
+
+        for chain_version in self.get_version_chain(graph_version):
+            graph_client = self.get_read_graph_client(chain_version)
+
+            adjacent_edges = graph_client.get_many_adjacent_edges(source_vertex_ids, weight_id)
+
+            if adjacent_edges is None:
+                raise IOError(f'Failed to read adjacent edges of {len(source_vertex_ids)} vertices of '
+                              f'{chain_version.graph_uuid}')
+
+            for source_vertex_id, edges in adjacent_edges.items():
+                targets = resolved.setdefault(source_vertex_id, {})
+
+                for target_vertex_id, prop_value in edges:
+                    weight = as_weight(prop_value)
+
+                    if weight is not None:
+                        targets.setdefault(target_vertex_id, weight)
+
+        return {source_vertex_id: [(target_vertex_id, weight) for target_vertex_id, weight in targets.items()
+                                   if not is_tombstone(weight)]
+                for source_vertex_id, targets in resolved.items()}
+
+    def get_graph_analytics(self,
+                            temporal_graph_id,
+                            weight_id,
+                            analyses = analytics.ANALYSES,
+                            top = 10,
+                            vertex_ids = None,
+                            version_id = None,
+                            timestamp = None):
+        """
+        Whole-graph analytics of the edges with weight_id of a committed temporal graph version, see analytics.
+        Results are cached per version
 
         :param temporal_graph_id: [String]
         :param weight_id: [String]
-        :param source_vertex_id: [String]
-        :param target_vertex_id: [String]
-        :param version_id: [Int] If version_id is passed in, timestamp is ignored and the edge of
-                 the graph at this specific version is returned
-        :param timestamp: [Int] Unix epoch. edge of the graph at this point in time
-        :return: [Float] weight if edge with weight_id exists
-                           else None (if version of graph doesn't exist or edge does not exist)
+        :param analyses: List[String] subset of analytics.ANALYSES
+        :param top: [Int] number of best scored vertices reported per vertex measure
+        :param vertex_ids: List[String] vertices whose measures are reported
+        :param version_id: [Int] If version_id is passed in, timestamp is ignored
+        :param timestamp: [Int] Unix epoch
+        :return: {
+              "num_vertices": 3, "num_edges": 2,
+              "pagerank": {"iterations": 12, "converged": true, "top": [(vertex_id, score), ..],
+                           "vertices": {vertex_id: score}},
+              "degree": {"top_in_degree": [..], "top_out_degree": [..], "top_in_strength": [..],
+                         "top_out_strength": [..], "vertices": {vertex_id: {"in_degree": 1, ..}}},
+              "weights": {"count": 2, "mean": 0.5, .., "histogram": {"bin_edges": [..], "counts": [..]}}
+          } or None if the version of the graph doesn't exist
+        :raises ValueError: if an analysis is unknown
         """
+        unknown = set(analyses) - set(analytics.ANALYSES)
+
+        if unknown:
+            raise ValueError(f'Unknown analyses {", ".join(sorted(unknown))}, '
+                             f'expected some of {", ".join(analytics.ANALYSES)}')
 
         graph_version = self.get_graph_version(temporal_graph_id, version_id, timestamp)
 
-        if graph_version:
-            return self.get_graph_version_edge_weight(graph_version, source_vertex_id, target_vertex_id, weight_id)
-        else:
+        if not graph_version:
             return None
 
+        graph_arrays = self.get_graph_arrays(graph_version, weight_id)
+        positions    = {vertex_id: graph_arrays.vertex_position(vertex_id) for vertex_id in vertex_ids or []}
+
+        result = { 'num_vertices': graph_arrays.num_vertices, 'num_edges': graph_arrays.num_edges }
+
+        for analysis in analyses:
+            analysis_result = self.get_graph_version_analysis(graph_version, weight_id, analysis)
+
+            if analysis == 'pagerank':
+                scores = analysis_result['scores']
+
+                result[analysis] = {
+                    'iterations': analysis_result['iterations'],
+                    'converged':  analysis_result['converged'],
+                    'top':        analytics.top_vertices(graph_arrays, scores, top),
+                    'vertices':   {vertex_id: None if position is None else scores[position].item()
+                                   for vertex_id, position in positions.items()},
+                }
+            elif analysis == 'degree':
+                result[analysis] = {f'top_{measure}': analytics.top_vertices(graph_arrays, values, top)
+                                    for measure, values in analysis_result.items()}
+
+                result[analysis]['vertices'] = {
+                    vertex_id: None if position is None else
+                        {measure: values[position].item() for measure, values in analysis_result.items()}
+                    for vertex_id, position in positions.items()
+                }
+            else:
+                result[analysis] = analysis_result
+
+        return result
+
+    def get_graph_version_analysis(self, graph_version, weight_id, analysis):
+        """
+        :param graph_version: [GraphVersion] committed
+        :param weight_id: [String]
+        :param analysis: [String] one of analytics.ANALYSES
+        :return: result of analytics.analyse, cached
+        """
+        cache_key = (graph_version.graph_uuid, weight_id, analysis)
+        result    = TemporalGraphEngine.analytics_cache.get(cache_key)
+
+        if result is MISSING:
+            def analyse_and_cache():
+                graph_arrays    = self.get_graph_arrays(graph_version, weight_id)
+
+                with timed('analytics'):
+                    analysis_result = analytics.analyse(analysis, graph_arrays)
+
+                TemporalGraphEngine.analytics_cache.set(cache_key, analysis_result)
+
+                return analysis_result
+
+            result = TemporalGraphEngine.analytics_flights.do(cache_key, analyse_and_cache)
+
+        return result
+
+    def get_graph_arrays(self, graph_version, weight_id):
+        """
+        :param graph_version: [GraphVersion] committed
+        :param weight_id: [String]
+        :return: [GraphArrays] edges of graph_version with weight_id, cached
+        """
+        cache_key    = (graph_version.graph_uuid, weight_id)
+        graph_arrays = TemporalGraphEngine.graph_arrays_cache.get(cache_key)
+
+        if graph_arrays is MISSING:
+            def load_and_cache():
+                with timed('graph_arrays_load'):
+                    loaded = self.read_graph_arrays(graph_version, weight_id)
+
+                TemporalGraphEngine.graph_arrays_cache.set(cache_key, loaded)
+
+                return loaded
+
+            graph_arrays = TemporalGraphEngine.analytics_flights.do(cache_key, load_and_cache)
+
+        return graph_arrays
+
+    def read_graph_arrays(self, graph_version, weight_id):
+        """
+        Loads the edges of graph_version with weight_id, bypassing the cache. A version held whole by a graph in
+        memory is read from its arrays, any other is streamed from its version chain
+
+        :param graph_version: [GraphVersion]
+        :param weight_id: [String]
+        :return: [GraphArrays]
+        """
+        chain = self.get_version_chain(graph_version)
+
+        if len(chain) == 1 and memory_graph_store.is_compact(graph_version.graph_uuid):
+            return analytics.GraphArrays.from_compact_graph(memory_graph_store.get(graph_version.graph_uuid), weight_id)
+
+        return analytics.GraphArrays.from_edges(self.iter_graph_version_edges(graph_version, weight_id))
+
     def get_user_edge_weight(self,
                         temporal_graph_id,
                         weight_id,
@@ -187,26 +1910,89 @@ class TemporalGraphEngine():
                  the graph at this specific version is returned
         :param timestamp:[Int] Unix epoch. user edge of the graph at this point in time
         :return: [Float] user-edge weight if exists, else edge weight
-                           else None (if version of graph doesn't exist or edge does not exist)
+                           else None (if version of graph doesn't exist, edge does not exist or the user-edge
+                           weight is null)
         """
 
         graph_version = self.get_graph_version(temporal_graph_id, version_id, timestamp)
 
         if graph_version:
-            user_edge_weight = TemporalGraphEngine.get_user_edge_weight_model().objects.get_latest_or_none(
-                'committed_at',
-                user_id=user_id,
-                source_vertex_id=source_vertex_id,
-                target_vertex_id=target_vertex_id,
-                weight_id=weight_id,
-                graph_version=graph_version
-            )
+            with timed('db_query'):
+                user_edge_weight = TemporalGraphEngine.get_user_edge_weight_model().objects.get_latest_or_none(
+                    'committed_at',
+                    user_id=user_id,
+                    source_vertex_id=source_vertex_id,
+                    target_vertex_id=target_vertex_id,
+                    weight_id=weight_id,
+                    graph_version=graph_version
+                )
 
             if user_edge_weight:
                 return user_edge_weight.weight
             else:
                 return self.get_graph_version_edge_weight(graph_version, source_vertex_id, target_vertex_id, weight_id)
 
+    def get_user_top_neighbours(self,
+                                temporal_graph_id,
+                                weight_id,
+                                source_vertex_id,
+                                user_id,
+                                k = 10,
+                                version_id = None,
+                                timestamp  = None,
+                                page_size  = None
+                                ):
+        """
+        Retrieve the k outgoing edges of a vertex with the highest weights for a specific user: user-edge weights
+        override edge weights, a null user-edge weight hides the edge from the user.
+
+        The user's overrides for the vertex are read in one query and merged with the streamed adjacent edges
+        in a single pass, keeping the k best in a heap
+
+        :param temporal_graph_id: [String]
+        :param weight_id: [String]
+        :param source_vertex_id: [String]
+        :param user_id: [Int]
+        :param k: [Int] number of neighbours returned
+        :param version_id: [Int] If version_id is passed in, timestamp is ignored
+        :param timestamp: [Int] Unix epoch
+        :param page_size: [Int] edges fetched from the graph backend at a time
+        :return: List[(target_vertex_id, weight, is_user_weight)] ordered by descending weight.
+                 None if version of graph doesn't exist
+        """
+
+        graph_version = self.get_graph_version(temporal_graph_id, version_id, timestamp)
+
+        if not graph_version:
+            return None
+
+        # target_vertex_id -> latest user-edge weight
+        with timed('db_query'):
+            overrides = dict(TemporalGraphEngine.get_user_edge_weight_model().objects.filter(
+                graph_version=graph_version,
+                user_id=user_id,
+                source_vertex_id=source_vertex_id,
+                weight_id=weight_id
+            ).order_by('committed_at').values_list('target_vertex_id', 'weight'))
+
+        def effective_edges():
+            for target_vertex_id, weight in self.iter_graph_version_adjacent_edges(graph_version, source_vertex_id,
+                                                                                   weight_id, page_size):
+                if target_vertex_id in overrides:
+                    user_weight = overrides.pop(target_vertex_id)
+
+                    if user_weight is not None:
+                        yield target_vertex_id, user_weight, True
+                else:
+                    yield target_vertex_id, weight, False
+
+            # edges that only exist for the user
+            for target_vertex_id, user_weight in sorted(overrides.items()):
+                if user_weight is not None:
+                    yield target_vertex_id, user_weight, True
+
+        return heapq.nlargest(k, effective_edges(), key=operator.itemgetter(1))
+
     def set_user_edge_weight(self,
                         temporal_graph_id,
                         weight_id,
@@ -226,37 +2012,121 @@ class TemporalGraphEngine():
         :return: True if successfully set all user-edges
         """
 
+        results = self.set_user_edge_weights(temporal_graph_id, weight_id, vertex_edge_pairs)
+
+        return results is not None and all(results)
+
+    def set_user_edge_weights(self,
+                              temporal_graph_id,
+                              weight_id,
+                              vertex_edge_pairs,
+                              batch_size = USER_EDGE_WEIGHT_BATCH_SIZE
+                              ):
+        """
+        Bulk set user edge weights for latest graph version of temporal_graph_id.
+
+        Base edges of all pairs are checked with one batched graph read. User edge weights are then upserted in
+        batches of batch_size (one SELECT, one UPDATE and one INSERT per batch) inside a single transaction
+
+        :param temporal_graph_id: [String]
+        :param weight_id: [String]
+        :param vertex_edge_pairs: List[{
+              "user_id":123,
+              "source_vertex_id": "vert1",
+              "target_vertex_id": "vert2",
+              "weight": 0.72
+          }, {..}]. A null weight hides the edge from the user
+        :param batch_size: [Int] user edge weights per database statement
+        :return: List[Bool] per pair, True if written. False if it is malformed, its base edge does not exist or
+                 the write failed. None if temporal graph has no committed version
+        """
+
         graph_version = self.get_graph_version(temporal_graph_id, None, None)
 
-        if graph_version:
-            graph_client = self.get_graph_client(graph_version.graph_uuid)
+        if not graph_version:
+            return None
 
-            successful_writes = []
+        # None at the position of a malformed pair, so that the other pairs are still written
+        user_edges = []
 
-            for user_vertex_edge_pair in vertex_edge_pairs:
-                user_id          = user_vertex_edge_pair['user_id']
-                source_vertex_id = user_vertex_edge_pair['source_vertex_id']
-                target_vertex_id = user_vertex_edge_pair['target_vertex_id']
-                weight           = user_vertex_edge_pair['weight']
+        for user_vertex_edge_pair in vertex_edge_pairs:
+            try:
+                user_edges.append(as_user_edge(user_vertex_edge_pair))
+            except (KeyError, TypeError, ValueError) as error:
+                logger.error(f'Malformed user-edge weight {user_vertex_edge_pair} of TemporalGraph with '
+                             f'id:{temporal_graph_id}, error: {error}')
 
-                base_weight = graph_client.get_edge_property(source_vertex_id, target_vertex_id, weight_id)
+                user_edges.append(None)
 
-                if base_weight:
-                    user_edge_weight, created = TemporalGraphEngine.get_user_edge_weight_model().objects.get_or_create(
-                        graph_version=graph_version,
-                        user_id=user_id,
-                        source_vertex_id=source_vertex_id,
-                        target_vertex_id=target_vertex_id,
-                        weight_id=weight_id
-                    )
-                    user_edge_weight.weight = weight
-                    user_edge_weight.save()
+        valid_edges  = [user_edge for user_edge in user_edges if user_edge is not None]
 
-                    user_edge_weight.commit_version()
+        edge_pairs   = list({(source_vertex_id, target_vertex_id)
+                             for user_id, source_vertex_id, target_vertex_id, weight in valid_edges})
 
-                    successful_writes.append(True)
-            # TODO(lcotingkeh): accumulate errors and return to user
+        base_weights = self.get_graph_version_edge_weights(graph_version, edge_pairs, weight_id)
+        base_edges   = {edge_pair for edge_pair, base_weight in zip(edge_pairs, base_weights) if base_weight is not None}
 
-            return len(successful_writes) == len(vertex_edge_pairs)
-        else:
-            return False
\ No newline at end of file
+        # (user_id, source_vertex_id, target_vertex_id) -> weight. The last weight of a repeated user edge wins
+        weights = {(user_id, source_vertex_id, target_vertex_id): weight
+                   for user_id, source_vertex_id, target_vertex_id, weight in valid_edges
+                   if (source_vertex_id, target_vertex_id) in base_edges}
+
+        try:
+            with timed('db_query'), transaction.atomic():
+                keys = list(weights.keys())
+
+                for start in range(0, len(keys), batch_size):
+                    self.upsert_user_edge_weights(graph_version, weight_id,
+                                                  {key: weights[key] for key in keys[start:start + batch_size]})
+        except Exception as error:
+            logger.error(f'Failed to write {len(weights)} user-edge weights of TemporalGraph with '
+                         f'id:{temporal_graph_id}, error: {error}')
+
+            return [False] * len(user_edges)
+
+        return [user_edge is not None and user_edge[:3] in weights for user_edge in user_edges]
+
+    def upsert_user_edge_weights(self, graph_version, weight_id, weights):
+        """
+        Updates existing and creates missing user edge weights of graph_version
+
+        :param graph_version: [GraphVersion]
+        :param weight_id: [String]
+        :param weights: Dict[(user_id, source_vertex_id, target_vertex_id), weight]
+        :return:
+        """
+        user_edge_weight_model = TemporalGraphEngine.get_user_edge_weight_model()
+
+        committed_at = datetime.now()
+
+        # superset of the existing rows, narrowed down below
+        candidates = user_edge_weight_model.objects.filter(
+            graph_version=graph_version,
+            weight_id=weight_id,
+            user_id__in={user_id for user_id, source_vertex_id, target_vertex_id in weights},
+            source_vertex_id__in={source_vertex_id for user_id, source_vertex_id, target_vertex_id in weights},
+            target_vertex_id__in={target_vertex_id for user_id, source_vertex_id, target_vertex_id in weights}
+        ).values_list('pk', 'user_id', 'source_vertex_id', 'target_vertex_id')
+
+        existing = {(user_id, source_vertex_id, target_vertex_id): pk
+                    for pk, user_id, source_vertex_id, target_vertex_id in candidates
+                    if (user_id, source_vertex_id, target_vertex_id) in weights}
+
+        if existing:
+            user_edge_weight_model.objects.filter(pk__in=existing.values()).update(
+                weight=Case(*[When(pk=pk, then=Value(weights[key])) for key, pk in existing.items()],
+                            output_field=FloatField()),
+                committed_at=committed_at
+            )
+
+        user_edge_weight_model.objects.bulk_create([
+            user_edge_weight_model(graph_version=graph_version,
+                                   user_id=user_id,
+                                   source_vertex_id=source_vertex_id,
+                                   target_vertex_id=target_vertex_id,
+                                   weight_id=weight_id,
+                                   weight=weight,
+                                   committed_at=committed_at)
+            for (user_id, source_vertex_id, target_vertex_id), weight in weights.items()
+            if (user_id, source_vertex_id, target_vertex_id) not in existing
+        ])
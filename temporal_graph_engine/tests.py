@@ -1,3 +1,891 @@
-from django.test import TestCase
+import itertools
+import json
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from api.streaming import RecordError, parse_ndjson
+from graph_client.graph_client import TOMBSTONE
+from graph_client.memory_graph_client import InMemoryGraphClient, memory_graph_store
+from temporal_graph_engine import analytics, sharded_ingestion
+from temporal_graph_engine.analytics import GraphArrays
+from temporal_graph_engine.caches import LRUCache, TTLCache, SingleFlight, MISSING
+from temporal_graph_engine.temporal_graph_engine import TemporalGraphEngine, diff_edge_streams, \
+    merge_delta_streams
+from temporal_graph_engine.version_index import VersionIndex, unix_timestamp
+from time_series_client.models.graph_version import GraphVersion
+
+ENGINE_LOGGER = 'temporal_graph_engine.temporal_graph_engine'
+
+
+def edge(source_vertex_id, target_vertex_id, weight):
+    return {'source_vertex_id': source_vertex_id, 'target_vertex_id': target_vertex_id, 'weight': weight}
+
+
+class FakeClock():
+    def __init__(self, now = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class EngineTestCase(TestCase):
+    """
+    Runs the engine against the in-memory graph backend, starting from empty caches and graphs
+    """
+
+    def setUp(self):
+        backend = mock.patch('temporal_graph_engine.temporal_graph_engine.GRAPH_BACKEND', 'memory')
+        backend.start()
+        self.addCleanup(backend.stop)
+
+        version_index = mock.patch.object(TemporalGraphEngine, 'version_index', VersionIndex(GraphVersion, grace=0))
+        version_index.start()
+        self.addCleanup(version_index.stop)
+
+        self.clear()
+        self.addCleanup(self.clear)
+
+        self.tge = TemporalGraphEngine()
+
+    def clear_caches(self):
+        for cache in (TemporalGraphEngine.edge_weight_cache, TemporalGraphEngine.graph_version_cache,
+                      TemporalGraphEngine.latest_version_cache, TemporalGraphEngine.graph_arrays_cache,
+                      TemporalGraphEngine.analytics_cache):
+            cache.clear()
+
+    def clear(self):
+        self.clear_caches()
+
+        for graph_uuid in memory_graph_store.graph_uuids():
+            memory_graph_store.drop(graph_uuid)
+
+
+class LRUCacheTest(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        # reading a makes b the least recently used
+        self.assertEqual(cache.get('a'), 1)
+
+        cache.set('c', 3)
+
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_caches_none(self):
+        cache = LRUCache(2)
+
+        cache.set('a', None)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_invalidate(self):
+        cache = LRUCache(2)
+
+        cache.set('a', 1)
+        cache.invalidate('a')
+
+        self.assertIs(cache.get('a'), MISSING)
+
+    def test_disabled(self):
+        cache = LRUCache(0)
+
+        cache.set('a', 1)
+
+        self.assertIs(cache.get('a'), MISSING)
+
+
+class TTLCacheTest(SimpleTestCase):
+    def test_expires_after_ttl(self):
+        clock = FakeClock()
+        cache = TTLCache(5, clock=clock)
+
+        cache.set('a', 1)
+
+        clock.now += 4.9
+        self.assertEqual(cache.get('a'), 1)
+
+        clock.now += 0.1
+        self.assertIs(cache.get('a'), MISSING)
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate(self):
+        cache = TTLCache(5, clock=FakeClock())
+
+        cache.set('a', 1)
+        cache.invalidate('a')
+
+        self.assertIs(cache.get('a'), MISSING)
+
+
+class SingleFlightTest(SimpleTestCase):
+    num_callers = 8
+
+    def run_callers(self, single_flight, loader):
+        """
+        :param single_flight: SingleFlight shared by the callers
+        :param loader: callable blocking until released
+        :return: results or exceptions of the callers
+        """
+        outcomes = [None] * self.num_callers
+
+        def call(index):
+            try:
+                outcomes[index] = single_flight.do('key', loader)
+            except Exception as e:
+                outcomes[index] = e
+
+        threads = [threading.Thread(target=call, args=(index,)) for index in range(self.num_callers)]
+
+        for thread in threads:
+            thread.start()
+
+        # wait until every follower joined the flight of the leader
+        deadline = time.monotonic() + 5
+
+        while single_flight.shared < self.num_callers - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+        return threads, outcomes
+
+    def join(self, threads):
+        for thread in threads:
+            thread.join(5)
+
+            self.assertFalse(thread.is_alive())
+
+    def test_concurrent_callers_share_result(self):
+        single_flight = SingleFlight()
+        release       = threading.Event()
+        loads         = []
+
+        def loader():
+            loads.append(1)
+            release.wait(5)
+
+            return object()
+
+        threads, outcomes = self.run_callers(single_flight, loader)
+
+        release.set()
+        self.join(threads)
+
+        self.assertEqual(len(loads), 1)
+        self.assertEqual((single_flight.calls, single_flight.shared), (1, self.num_callers - 1))
+        self.assertTrue(all(outcome is outcomes[0] for outcome in outcomes))
+
+        # the flight is over, so the next call loads again
+        single_flight.do('key', loader)
+
+        self.assertEqual(len(loads), 2)
+
+    def test_concurrent_callers_share_exception(self):
+        single_flight = SingleFlight()
+        release       = threading.Event()
+        loads         = []
+
+        def loader():
+            loads.append(1)
+            release.wait(5)
+
+            raise ValueError('load failed')
+
+        threads, outcomes = self.run_callers(single_flight, loader)
+
+        release.set()
+        self.join(threads)
+
+        self.assertEqual(len(loads), 1)
+        self.assertIsInstance(outcomes[0], ValueError)
+        self.assertTrue(all(outcome is outcomes[0] for outcome in outcomes))
+
+
+class LatestVersionCacheTest(EngineTestCase):
+    def test_commit_invalidates_latest_version(self):
+        self.assertTrue(self.tge.construct_graph('tg', 'w', 1, [edge('a', 'b', 0.5)], commit=True))
+
+        # versions committed within the same second would tie on committed_at
+        GraphVersion.objects.filter(version_id=1).update(committed_at=timezone.now() - timedelta(seconds=10))
+
+        self.assertEqual(self.tge.get_graph_version('tg').version_id, 1)
+        self.assertEqual(self.tge.get_edge_weight('tg', 'w', 'a', 'b'), 0.5)
+
+        self.assertTrue(self.tge.construct_graph('tg', 'w', 2, [edge('a', 'b', 0.7)], commit=True))
+
+        # without the invalidation on commit, version 1 would be served from the cache until it expires
+        self.assertEqual(self.tge.get_graph_version('tg').version_id, 2)
+        self.assertEqual(self.tge.get_edge_weight('tg', 'w', 'a', 'b'), 0.7)
+
+
+class VersionIndexTest(TestCase):
+    def setUp(self):
+        self.base = datetime(2026, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+        self.v1   = self.commit_version(1, 0)
+        self.v2   = self.commit_version(2, 10)
+
+        # timestamps as stored, see UnixDateTimeField
+        self.t1   = unix_timestamp(GraphVersion.objects.get(pk=self.v1.pk).committed_at)
+        self.t2   = unix_timestamp(GraphVersion.objects.get(pk=self.v2.pk).committed_at)
+
+        self.clock = FakeClock(self.t1 + 100)
+        self.index = VersionIndex(GraphVersion, grace=5, clock=self.clock)
+
+    def commit_version(self, version_id, seconds):
+        return GraphVersion.objects.create(temporal_graph_id='tg', version_id=version_id, committed=True,
+                                           committed_at=self.base + timedelta(seconds=seconds))
+
+    def resolve(self, timestamp):
+        graph_version = self.index.resolve('tg', timestamp)
+
+        return graph_version.version_id if graph_version else None
+
+    def test_boundaries(self):
+        self.assertIsNone(self.resolve(self.t1 - 1))
+        self.assertEqual(self.resolve(self.t1), 1)
+        self.assertEqual(self.resolve(self.t2 - 1), 1)
+        self.assertEqual(self.resolve(self.t2), 2)
+        self.assertEqual(self.resolve(self.t2 + 1000), 2)
+
+        self.assertIsNone(self.index.resolve('other', self.t2))
+
+    def test_refreshes_past_synced_part_only(self):
+        self.assertEqual(self.resolve(self.t2), 2)
+        self.assertEqual(self.index.refreshes, 1)
+
+        # committed by another process, after the timeline was synced up to clock - grace
+        self.commit_version(3, 97)
+
+        self.assertEqual(self.resolve(self.t1 + 95), 2)
+        self.assertEqual(self.index.refreshes, 1)
+
+        self.assertEqual(self.resolve(self.t1 + 97), 3)
+        self.assertEqual(self.index.refreshes, 2)
+
+    def test_adds_versions_committed_by_this_process(self):
+        self.assertEqual(self.resolve(self.t2), 2)
+
+        self.index.add(self.commit_version(3, 50))
+
+        self.assertEqual(self.resolve(self.t1 + 60), 3)
+        self.assertEqual(self.index.refreshes, 1)
+
+    def test_versions_committed_in_the_same_second(self):
+        self.commit_version(3, 10)
+
+        self.assertEqual(self.resolve(self.t2), 3)
+
+
+class UserEdgeWeightTest(EngineTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.tge.construct_graph('tg', 'w', 1, [edge('a', 'b', 0.5), edge('a', 'c', 0.4)], commit=True)
+
+    def user_edge(self, target_vertex_id, weight, user_id = 7):
+        return {'user_id': user_id, 'source_vertex_id': 'a', 'target_vertex_id': target_vertex_id, 'weight': weight}
+
+    def test_null_weight_is_stored(self):
+        self.assertEqual(self.tge.set_user_edge_weights('tg', 'w', [self.user_edge('b', 0.9)]), [True])
+        self.assertEqual(self.tge.get_user_edge_weight('tg', 'w', 'a', 'b', 7), 0.9)
+
+        # updates the existing user-edge weight, then creates one
+        self.assertEqual(self.tge.set_user_edge_weights('tg', 'w', [self.user_edge('b', None),
+                                                                    self.user_edge('c', None)]), [True, True])
+
+        self.assertIsNone(self.tge.get_user_edge_weight('tg', 'w', 'a', 'b', 7))
+        self.assertIsNone(self.tge.get_user_edge_weight('tg', 'w', 'a', 'c', 7))
+        self.assertEqual(self.tge.get_user_edge_weight('tg', 'w', 'a', 'b', 8), 0.5)
+
+    def test_malformed_pairs_fail_alone(self):
+        with self.assertLogs(ENGINE_LOGGER, 'ERROR'):
+            results = self.tge.set_user_edge_weights('tg', 'w', [
+                self.user_edge('b', 'heavy'),
+                self.user_edge('b', 0.8),
+                {'user_id': 7, 'source_vertex_id': 'a', 'target_vertex_id': 'c'},
+                self.user_edge('c', 0.1, user_id='someone'),
+                self.user_edge('missing', 0.3),
+                self.user_edge('c', 0.2),
+            ])
+
+        self.assertEqual(results, [False, True, False, False, False, True])
+        self.assertEqual(self.tge.get_user_edge_weight('tg', 'w', 'a', 'b', 7), 0.8)
+        self.assertEqual(self.tge.get_user_edge_weight('tg', 'w', 'a', 'c', 7), 0.2)
+
+        with self.assertLogs(ENGINE_LOGGER, 'ERROR'):
+            self.assertFalse(self.tge.set_user_edge_weight('tg', 'w', [self.user_edge('b', [])]))
+
+
+class UserTopNeighboursTest(EngineTestCase):
+    def test_user_edge_weights_override_and_hide_edges(self):
+        self.tge.construct_graph('tg', 'w', 1, [edge('a', 'b', 0.5), edge('a', 'c', 0.4), edge('a', 'd', 0.3)],
+                                 commit=True)
+
+        self.assertTrue(self.tge.set_user_edge_weight('tg', 'w', [
+            {'user_id': 7, 'source_vertex_id': 'a', 'target_vertex_id': 'b', 'weight': None},
+            {'user_id': 7, 'source_vertex_id': 'a', 'target_vertex_id': 'd', 'weight': 0.9},
+        ]))
+
+        self.assertEqual(self.tge.get_user_top_neighbours('tg', 'w', 'a', 7, k=3),
+                         [('d', 0.9, True), ('c', 0.4, False)])
+
+        self.assertEqual(self.tge.get_user_top_neighbours('tg', 'w', 'a', 8, k=2),
+                         [('b', 0.5, False), ('c', 0.4, False)])
+
+
+class MergeDeltaStreamsTest(SimpleTestCase):
+    def test_most_recent_stream_wins(self):
+        delta    = [('a', 1.0), ('c', TOMBSTONE)]
+        snapshot = [('a', 0.0), ('b', 2.0), ('c', 3.0)]
+
+        self.assertEqual(list(merge_delta_streams([delta, snapshot], key=lambda item: item[0])),
+                         [(0, ('a', 1.0)), (1, ('b', 2.0)), (0, ('c', TOMBSTONE))])
+
+    def test_empty_streams(self):
+        self.assertEqual(list(merge_delta_streams([[], [('a', 1.0)], []], key=lambda item: item[0])),
+                         [(1, ('a', 1.0))])
+
+
+class DiffEdgeStreamsTest(SimpleTestCase):
+    def setUp(self):
+        self.from_edges = [('a', 'b', 0.5), ('a', 'c', 0.4), ('b', 'a', 1.0), ('b', 'c', 0.2)]
+        self.to_edges   = [('a', 'b', 0.5), ('a', 'd', 0.1), ('b', 'a', 1.05), ('b', 'c', -0.2), ('c', 'a', 0.3)]
+
+    def test_changes_ordered_by_edge(self):
+        self.assertEqual(list(diff_edge_streams(self.from_edges, self.to_edges)), [
+            ('removed', 'a', 'c', 0.4, None),
+            ('added', 'a', 'd', None, 0.1),
+            ('reweighted', 'b', 'a', 1.0, 1.05),
+            ('reweighted', 'b', 'c', 0.2, -0.2),
+            ('added', 'c', 'a', None, 0.3),
+        ])
+
+    def test_threshold(self):
+        # b->a changes by 0.05 and b->c by 0.4, additions and removals are reported whatever their weight
+        self.assertEqual([change[:3] for change in diff_edge_streams(self.from_edges, self.to_edges, 0.1)],
+                         [('removed', 'a', 'c'), ('added', 'a', 'd'), ('reweighted', 'b', 'c'), ('added', 'c', 'a')])
+
+        # a change equal to the threshold is ignored
+        self.assertEqual(list(diff_edge_streams([('a', 'b', 1.0)], [('a', 'b', 1.5)], 0.5)), [])
+
+    def test_one_empty_stream(self):
+        self.assertEqual([change[0] for change in diff_edge_streams(self.from_edges, [])], ['removed'] * 4)
+        self.assertEqual([change[0] for change in diff_edge_streams([], self.to_edges)], ['added'] * 5)
+        self.assertEqual(list(diff_edge_streams([], [])), [])
+
+    def test_streams_are_consumed_lazily(self):
+        consumed = []
+
+        def stream(name, edges):
+            for edge_tuple in edges:
+                consumed.append(name)
+
+                yield edge_tuple
+
+        changes = diff_edge_streams(stream('from', self.from_edges), stream('to', self.to_edges))
+
+        self.assertEqual(next(changes), ('removed', 'a', 'c', 0.4, None))
+        self.assertEqual(consumed, ['from', 'to', 'from', 'to'])
+
+
+class DiffVersionsTest(EngineTestCase):
+    def test_diff_of_delta_version(self):
+        self.tge.construct_graph('tg', 'w', 1, [edge('a', 'b', 0.5), edge('a', 'c', 0.4), edge('b', 'c', 0.2)],
+                                 commit=True)
+        self.tge.construct_graph('tg', 'w', 2, [edge('a', 'c', None), edge('b', 'c', 0.25), edge('c', 'a', 0.3)],
+                                 commit=True, parent_version_id=1)
+
+        self.assertEqual(list(self.tge.diff_versions('tg', 'w', 1, 2, page_size=1)), [
+            ('removed', 'a', 'c', 0.4, None),
+            ('reweighted', 'b', 'c', 0.2, 0.25),
+            ('added', 'c', 'a', None, 0.3),
+        ])
+
+        self.assertEqual([change[:3] for change in self.tge.diff_versions('tg', 'w', 2, 1, threshold=0.1)],
+                         [('added', 'a', 'c'), ('removed', 'c', 'a')])
+
+    def test_missing_version_and_negative_threshold(self):
+        self.tge.construct_graph('tg', 'w', 1, [edge('a', 'b', 0.5)], commit=True)
+
+        self.assertIsNone(self.tge.diff_versions('tg', 'w', 1, 2))
+
+        with self.assertRaises(ValueError):
+            self.tge.diff_versions('tg', 'w', 1, 1, threshold=-1)
+
+
+class DeltaVersionTest(EngineTestCase):
+    """
+    Version 1 is a snapshot. Version 2 is a delta of it removing a->c, reweighting a->b and adding a->e.
+    Version 3 is a delta of version 2 adding a->c back and removing b->c
+    """
+
+    def setUp(self):
+        super().setUp()
+
+        self.tge.construct_graph('tg', 'w', 1, [edge('a', 'b', 0.5), edge('a', 'c', 0.4), edge('a', 'd', 0.3),
+                                                edge('b', 'c', 0.2)], commit=True)
+        self.tge.construct_graph('tg', 'w', 2, [edge('a', 'c', None), edge('a', 'b', 0.9), edge('a', 'e', 0.1)],
+                                 commit=True, parent_version_id=1)
+        self.tge.construct_graph('tg', 'w', 3, [edge('a', 'c', 0.6), edge('b', 'c', None)],
+                                 commit=True, parent_version_id=2)
+
+        self.edge_pairs = [('a', 'b'), ('a', 'c'), ('a', 'd'), ('a', 'e'), ('b', 'c')]
+
+    def graph_version(self, version_id):
+        return GraphVersion.objects.get(temporal_graph_id='tg', version_id=version_id)
+
+    def assert_reads(self):
+        expected = {
+            1: [0.5, 0.4, 0.3, None, 0.2],
+            2: [0.9, None, 0.3, 0.1, 0.2],
+            3: [0.9, 0.6, 0.3, 0.1, None],
+        }
+
+        for version_id, weights in expected.items():
+            self.assertEqual([self.tge.get_edge_weight('tg', 'w', source_vertex_id, target_vertex_id, version_id)
+                              for source_vertex_id, target_vertex_id in self.edge_pairs], weights)
+
+            self.clear_caches()
+
+            self.assertEqual(self.tge.get_edge_weights('tg', 'w', self.edge_pairs, version_id), weights)
+
+        self.assertEqual(list(self.tge.get_adjacent_edges('tg', 'w', 'a', version_id=2, page_size=1)),
+                         [('b', 0.9), ('d', 0.3), ('e', 0.1)])
+        self.assertEqual(list(self.tge.get_adjacent_edges('tg', 'w', 'a', version_id=3)),
+                         [('b', 0.9), ('c', 0.6), ('d', 0.3), ('e', 0.1)])
+        self.assertEqual(list(self.tge.get_adjacent_edges('tg', 'w', 'b', version_id=3)), [])
+
+    def test_reads_resolve_the_parent_chain(self):
+        self.assertEqual([graph_version.version_id for graph_version in
+                          self.tge.get_version_chain(self.graph_version(3))], [3, 2, 1])
+
+        self.assert_reads()
+
+    def test_commit_does_not_compact(self):
+        with mock.patch('temporal_graph_engine.temporal_graph_engine.MAX_DELTA_DEPTH', 2):
+            self.tge.construct_graph('tg', 'w', 4, [edge('a', 'f', 0.7)], commit=True, parent_version_id=3)
+
+            self.assertFalse(self.graph_version(4).snapshot)
+            self.assertEqual([graph_version.version_id for graph_version in
+                              self.tge.get_graph_versions_due_for_compaction('tg')], [3, 4])
+
+    def test_compact_then_read(self):
+        self.assertTrue(self.tge.compact_graph_version(self.graph_version(2)))
+
+        graph_version = self.graph_version(2)
+
+        self.assertTrue(graph_version.snapshot)
+        self.assertEqual(graph_version.delta_depth, 0)
+        self.assertEqual(len(self.tge.get_version_chain(graph_version)), 1)
+        self.assertTrue(memory_graph_store.is_compact(graph_version.graph_uuid))
+
+        self.clear_caches()
+        self.assert_reads()
+
+    def test_failed_compaction_is_not_committed(self):
+        graph_uuid = self.graph_version(2).graph_uuid
+
+        with mock.patch.object(InMemoryGraphClient, 'set_edge_properties', return_value=False), \
+                self.assertLogs(ENGINE_LOGGER, 'ERROR'):
+            self.assertFalse(self.tge.compact_graph_version(self.graph_version(2)))
+
+        self.assertFalse(memory_graph_store.is_compact(graph_uuid))
+        self.assertFalse(self.graph_version(2).snapshot)
+
+        self.assert_reads()
+
+        # compacting again completes the copy
+        self.assertTrue(self.tge.compact_graph_version(self.graph_version(2)))
+        self.assertTrue(memory_graph_store.is_compact(graph_uuid))
+
+    def test_compaction_skips_inherited_tombstones(self):
+        self.tge.construct_graph('tg', 'w', 4, [edge('a', 'f', 0.7)], commit=True, parent_version_id=3)
+
+        self.assertTrue(self.tge.compact_graph_version(self.graph_version(4)))
+
+        # b->c removed by version 3 is not copied into the snapshot
+        self.assertEqual(list(InMemoryGraphClient(self.graph_version(4).graph_uuid).get_edges('w')),
+                         [('a', 'b', 0.9), ('a', 'c', 0.6), ('a', 'd', 0.3), ('a', 'e', 0.1), ('a', 'f', 0.7)])
+
+        self.clear_caches()
+        self.assert_reads()
+
+    def test_compaction_rebases_descendants(self):
+        self.tge.construct_graph('tg', 'w', 4, [edge('a', 'f', 0.7)], commit=True, parent_version_id=3)
+
+        with mock.patch('temporal_graph_engine.temporal_graph_engine.MAX_DELTA_DEPTH', 2):
+            self.assertEqual([graph_version.version_id for graph_version in
+                              self.tge.get_graph_versions_due_for_compaction('tg')], [3, 4])
+
+            self.assertTrue(self.tge.compact_graph_version(self.graph_version(2)))
+
+            self.assertEqual([self.graph_version(version_id).delta_depth for version_id in (1, 2, 3, 4)],
+                             [0, 0, 1, 2])
+            self.assertEqual([graph_version.version_id for graph_version in
+                              self.tge.get_graph_versions_due_for_compaction('tg')], [4])
+
+
+class IngestGraphTest(EngineTestCase):
+    def setUp(self):
+        super().setUp()
+
+        batch_size = mock.patch('temporal_graph_engine.temporal_graph_engine.INGESTION_BATCH_SIZE', 2)
+        batch_size.start()
+        self.addCleanup(batch_size.stop)
+
+        self.records    = [edge('a', 'b', 0.1), edge('a', 'c', 0.2), edge('b', 'c', 0.3), edge('c', 'a', 0.4),
+                           edge('c', 'd', 0.5)]
+        self.edge_pairs = [(record['source_vertex_id'], record['target_vertex_id']) for record in self.records]
+
+    def lines(self, records):
+        return [json.dumps(record).encode('utf-8') + b'\n' for record in records]
+
+    def test_malformed_line_keeps_ingested_batches(self):
+        with self.assertRaises(RecordError) as context:
+            self.tge.ingest_graph('tg', 'w', 1, parse_ndjson(self.lines(self.records[:4]) + [b'{"weight": \n']))
+
+        self.assertEqual(context.exception.line_number, 5)
+        self.assertEqual(self.tge.get_ingestion_progress('tg', 'w', 1), 4)
+
+    def test_resume_skips_ingested_records(self):
+        self.assertEqual(self.tge.ingest_graph('tg', 'w', 1, parse_ndjson(self.lines(self.records[:3]))), (True, 3))
+
+        # the client resumes from record 1: records 1 and 2 were ingested already, their resent weights are ignored
+        resent = [edge('a', 'c', 0.9), edge('b', 'c', 0.9)] + self.records[3:]
+
+        self.assertEqual(self.tge.ingest_graph('tg', 'w', 1, parse_ndjson(self.lines(resent)), offset=1, commit=True),
+                         (True, 5))
+
+        self.assertEqual(self.tge.get_edge_weights('tg', 'w', self.edge_pairs, 1), [0.1, 0.2, 0.3, 0.4, 0.5])
+
+    def test_resume_at_progress(self):
+        self.tge.ingest_graph('tg', 'w', 1, iter(self.records[:2]))
+
+        self.assertEqual(self.tge.ingest_graph('tg', 'w', 1, iter(self.records[2:]), offset=2, commit=True),
+                         (True, 5))
+
+        self.assertEqual(self.tge.get_edge_weights('tg', 'w', self.edge_pairs, 1), [0.1, 0.2, 0.3, 0.4, 0.5])
+
+    def test_offset_past_progress_is_rejected(self):
+        self.tge.ingest_graph('tg', 'w', 1, iter(self.records[:2]))
+
+        # record 2 was never ingested, accepting record 3 onwards would leave a gap
+        with self.assertLogs(ENGINE_LOGGER, 'ERROR'):
+            self.assertEqual(self.tge.ingest_graph('tg', 'w', 1, iter(self.records[3:]), offset=3), (False, 2))
+
+        self.assertEqual(self.tge.get_ingestion_progress('tg', 'w', 1), 2)
+        self.assertFalse(GraphVersion.objects.get(temporal_graph_id='tg', version_id=1).committed)
+
+
+class ParallelInMemoryGraphClient(InMemoryGraphClient):
+    supports_parallel_writes = True
+
+
+class SerialPool():
+    """
+    Writes the partitions of write_sharded in the calling process
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def starmap(self, fn, iterable):
+        self.calls.append(list(iterable))
+
+        return list(itertools.starmap(fn, self.calls[-1]))
+
+
+class ShardedIngestionTest(SimpleTestCase):
+    def setUp(self):
+        self.edges = [(f'v{source}', f'v{(source * 7 + offset) % 40}', float(source + offset))
+                      for source in reversed(range(40)) for offset in (3, 1, 2)]
+
+        self.addCleanup(memory_graph_store.drop, 'tg_v1')
+
+    def test_partitions_hold_every_edge_of_a_source(self):
+        partitions = sharded_ingestion.partition_edges(self.edges, 4)
+
+        self.assertEqual(len(partitions), 4)
+        self.assertEqual(sorted(edge for partition in partitions for edge in partition), sorted(self.edges))
+
+        sources = [{edge[0] for edge in partition} for partition in partitions]
+
+        for index, partition_sources in enumerate(sources):
+            for other_sources in sources[index + 1:]:
+                self.assertFalse(partition_sources & other_sources)
+
+        for partition in partitions:
+            self.assertEqual(partition, sorted(partition, key=lambda edge: (edge[0], edge[1])))
+
+    def test_repeated_edges_keep_payload_order(self):
+        edges = [('a', 'b', 1.0), ('c', 'a', 2.0), ('a', 'b', 3.0), ('a', 'a', 4.0), ('a', 'b', 5.0)]
+
+        partitions = sharded_ingestion.partition_edges(edges, 1)
+
+        self.assertEqual(partitions, [[('a', 'a', 4.0), ('a', 'b', 1.0), ('a', 'b', 3.0), ('a', 'b', 5.0),
+                                       ('c', 'a', 2.0)]])
+
+    def test_empty_partitions_are_dropped(self):
+        self.assertEqual(sharded_ingestion.partition_edges([('a', 'b', 1.0)], 8), [[('a', 'b', 1.0)]])
+        self.assertEqual(sharded_ingestion.partition_edges([], 8), [])
+
+    def test_shards_are_stable(self):
+        # crc32, not the per-process hash(), so that every process partitions alike
+        self.assertEqual([sharded_ingestion.shard_of(vertex_id, 4) for vertex_id in ('a', 'b', 'c', 'd')],
+                         [zlib.crc32(vertex_id.encode('utf-8')) % 4 for vertex_id in ('a', 'b', 'c', 'd')])
+
+    def test_write_sharded(self):
+        pool   = SerialPool()
+        client = ParallelInMemoryGraphClient('tg_v1')
+
+        self.assertTrue(sharded_ingestion.write_sharded(client, self.edges + [('v0', 'v3', 9.0)], 'w', None, 4,
+                                                        pool=pool))
+
+        self.assertEqual(len(pool.calls[0]), 4)
+        self.assertEqual(client.get_edge_property('v0', 'v3', 'w'), 9.0)
+        self.assertEqual(len(list(client.get_edges('w'))), len({edge[:2] for edge in self.edges}))
+
+    def test_write_sharded_property_maps(self):
+        client = ParallelInMemoryGraphClient('tg_v1')
+
+        self.assertTrue(sharded_ingestion.write_sharded(client, [('a', 'b', {'w1': 0.5, 'w2': 0.7})], None, None, 4,
+                                                        pool=SerialPool()))
+
+        self.assertEqual([client.get_edge_property('a', 'b', weight_id) for weight_id in ('w1', 'w2')], [0.5, 0.7])
+
+    def test_failed_vertices_write_nothing(self):
+        pool   = SerialPool()
+        client = ParallelInMemoryGraphClient('tg_v1')
+
+        with mock.patch.object(client, 'set_vertices', return_value=False):
+            self.assertFalse(sharded_ingestion.write_sharded(client, self.edges, 'w', None, 4, pool=pool))
+
+        self.assertEqual(pool.calls, [])
+
+    def test_serial_fallback(self):
+        tge   = TemporalGraphEngine()
+        edges = self.edges[:10]
+
+        with mock.patch('temporal_graph_engine.temporal_graph_engine.MIN_SHARDED_EDGES', 10), \
+                mock.patch.object(sharded_ingestion, 'write_sharded', return_value=True) as write_sharded:
+
+            # the in-memory backend does not support parallel writes
+            self.assertTrue(tge.write_edges(InMemoryGraphClient('tg_v1'), edges, 'w', shards=4))
+
+            # payloads below MIN_SHARDED_EDGES, or a single shard, are written serially
+            self.assertTrue(tge.write_edges(ParallelInMemoryGraphClient('tg_v1'), edges[:9], 'w', shards=4))
+            self.assertTrue(tge.write_edges(ParallelInMemoryGraphClient('tg_v1'), edges, 'w', shards=1))
+
+            self.assertEqual(write_sharded.call_count, 0)
+            self.assertEqual(len(list(InMemoryGraphClient('tg_v1').get_edges('w'))), 10)
+
+            self.assertTrue(tge.write_edges(ParallelInMemoryGraphClient('tg_v1'), edges, 'w', shards=4))
+
+            self.assertEqual(write_sharded.call_count, 1)
+
+class AnalyticsTest(SimpleTestCase):
+    """
+    a splits its rank 1:3 between b and c, which both pass theirs back to a. With damping d and 3 vertices:
+      a = d (b + c) + (1 - d) / 3 = d (1 - a) + 0.05, so a = 0.9 / 1.85 = 18 / 37
+      b = d a / 4 + 0.05, c = 3 d a / 4 + 0.05
+    """
+
+    def setUp(self):
+        # edges are not sorted, vertices are numbered in sorted order
+        self.graph_arrays = GraphArrays.from_edges([('c', 'a', 1.0), ('a', 'b', 1.0), ('a', 'c', 3.0),
+                                                    ('b', 'a', 1.0)])
+
+    def pagerank(self, graph_arrays):
+        return analytics.pagerank(graph_arrays, damping=0.85, tolerance=1e-12, max_iterations=1000)
+
+    def test_from_edges(self):
+        self.assertEqual(self.graph_arrays.vertex_ids, ['a', 'b', 'c'])
+        self.assertEqual(self.graph_arrays.sources.tolist(), [2, 0, 0, 1])
+        self.assertEqual(self.graph_arrays.targets.tolist(), [0, 1, 2, 0])
+        self.assertEqual(self.graph_arrays.vertex_position('c'), 2)
+        self.assertIsNone(self.graph_arrays.vertex_position('d'))
+
+    def test_pagerank(self):
+        result = self.pagerank(self.graph_arrays)
+        a      = 18 / 37
+
+        self.assertTrue(result['converged'])
+        np.testing.assert_allclose(result['scores'], [a, 0.85 * a / 4 + 0.05, 0.85 * 3 * a / 4 + 0.05])
+
+    def test_pagerank_dangling_vertex(self):
+        """
+        b has no outgoing edge, its rank is spread over a and b:
+          a = d b / 2 + 0.075, b = d (a + b / 2) + 0.075, so a = 0.5 / 1.425 = 20 / 57
+        """
+        result = self.pagerank(GraphArrays.from_edges([('a', 'b', 2.0)]))
+
+        self.assertTrue(result['converged'])
+        np.testing.assert_allclose(result['scores'], [20 / 57, 37 / 57])
+
+    def test_pagerank_negative_weight_passes_no_rank(self):
+        # negative weights are clipped to 0, so only the edge to c carries rank
+        with_negative = self.pagerank(GraphArrays.from_edges([('a', 'b', -1.0), ('a', 'c', 1.0)]))
+        unweighted    = self.pagerank(GraphArrays.from_edges([('a', 'b', 0.0), ('a', 'c', 1.0)]))
+
+        np.testing.assert_allclose(with_negative['scores'], unweighted['scores'])
+        self.assertAlmostEqual(with_negative['scores'].sum(), 1.0)
+
+    def test_pagerank_empty_graph(self):
+        result = analytics.pagerank(GraphArrays.from_edges([]))
+
+        self.assertEqual((len(result['scores']), result['iterations'], result['converged']), (0, 0, True))
+
+    def test_degrees(self):
+        result = analytics.degrees(self.graph_arrays)
+
+        self.assertEqual({measure: values.tolist() for measure, values in result.items()}, {
+            'in_degree':    [2, 1, 1],
+            'out_degree':   [2, 1, 1],
+            'in_strength':  [2.0, 1.0, 3.0],
+            'out_strength': [4.0, 1.0, 1.0],
+        })
+
+    def test_weight_stats(self):
+        result = analytics.weight_stats(self.graph_arrays.weights, bins=2)
+
+        self.assertEqual({key: result[key] for key in ('count', 'sum', 'min', 'max', 'mean')},
+                         {'count': 4, 'sum': 6.0, 'min': 1.0, 'max': 3.0, 'mean': 1.5})
+
+        # deviations from the mean are -0.5, -0.5, 1.5 and -0.5
+        self.assertAlmostEqual(result['std'], 0.75 ** 0.5)
+
+        # percentiles interpolate linearly between the sorted weights 1, 1, 1, 3
+        self.assertEqual(result['percentiles']['50'], 1.0)
+        self.assertAlmostEqual(result['percentiles']['99'], 2.94)
+
+        self.assertEqual(result['histogram'], {'bin_edges': [1.0, 2.0, 3.0], 'counts': [3, 1]})
+
+    def test_weight_stats_empty(self):
+        result = analytics.weight_stats(np.zeros(0))
+
+        self.assertEqual((result['count'], result['mean'], result['histogram']['counts']), (0, None, []))
+
+    def test_top_vertices_break_ties_by_vertex_id(self):
+        in_degree = analytics.degrees(self.graph_arrays)['in_degree']
+
+        self.assertEqual(analytics.top_vertices(self.graph_arrays, in_degree, 2), [('a', 2), ('b', 1)])
+        self.assertEqual(analytics.top_vertices(self.graph_arrays, in_degree, 0), [])
+
+
+class GraphAnalyticsTest(EngineTestCase):
+    def test_dangling_vertex(self):
+        self.tge.construct_graph('tg', 'w', 1, [edge('a', 'b', 2.0), edge('b', 'c', None)], commit=True)
+
+        result = self.tge.get_graph_analytics('tg', 'w', vertex_ids=['a', 'c'], version_id=1)
+
+        # the edge without weight is no edge of w, so c is not a vertex of the graph
+        self.assertEqual((result['num_vertices'], result['num_edges']), (2, 1))
+
+        self.assertEqual([vertex_id for vertex_id, _ in result['pagerank']['top']], ['b', 'a'])
+        self.assertAlmostEqual(result['pagerank']['vertices']['a'], 20 / 57, places=5)
+        self.assertIsNone(result['pagerank']['vertices']['c'])
+
+        self.assertEqual(result['degree']['vertices']['a'],
+                         {'in_degree': 0, 'out_degree': 1, 'in_strength': 0.0, 'out_strength': 2.0})
+        self.assertEqual(result['weights']['count'], 1)
+
+    def test_unknown_analysis(self):
+        with self.assertRaises(ValueError):
+            self.tge.get_graph_analytics('tg', 'w', analyses=['centrality'])
+
+
+class ConstructionJobTest(EngineTestCase):
+    def setUp(self):
+        super().setUp()
+
+        max_attempts = mock.patch('temporal_graph_engine.temporal_graph_engine.CONSTRUCTION_JOB_MAX_ATTEMPTS', 1)
+        max_attempts.start()
+        self.addCleanup(max_attempts.stop)
+
+        self.edges = [edge('a', 'b', 0.5), edge('a', 'c', 0.4)]
+
+    def graph_version(self):
+        return GraphVersion.objects.get(temporal_graph_id='tg', version_id=1)
+
+    def run_batches(self, batch_ids):
+        return [self.tge.run_construction_batch(batch_id) for batch_id in batch_ids]
+
+    def fail_job(self):
+        """
+        Both batches of a job are claimed, the first fails the job, the second is not written
+        """
+        job = self.tge.enqueue_construction_job('tg', 'w', 1, self.edges, commit=True, job_batch_size=1)
+
+        with mock.patch.object(TemporalGraphEngine, 'write_edges', return_value=False) as write_edges, \
+                self.assertLogs(ENGINE_LOGGER, 'ERROR'):
+            self.assertEqual(self.run_batches(self.tge.claim_construction_batches('worker', 10)), [False, False])
+
+        self.assertEqual(write_edges.call_count, 1)
+
+        return job
+
+    def test_failed_job_fails_its_batches(self):
+        job    = self.fail_job()
+        status = self.tge.get_construction_job_status(job.pk)
+
+        self.assertEqual((status['status'], status['error']), ('failed', 'Batch 0: Failed to write 1 edges'))
+        self.assertEqual([batch['status'] for batch in status['batches']], ['failed', 'failed'])
+        self.assertFalse(status['committed'])
+
+    def test_batches_of_failed_job_are_not_claimed(self):
+        job = self.tge.enqueue_construction_job('tg', 'w', 1, self.edges, commit=True, job_batch_size=1)
+
+        with mock.patch.object(TemporalGraphEngine, 'write_edges', return_value=False), \
+                self.assertLogs(ENGINE_LOGGER, 'ERROR'):
+            self.run_batches(self.tge.claim_construction_batches('worker', 1))
+
+        # the batch left was failed with its job, a batch queued again meanwhile is skipped all the same
+        TemporalGraphEngine.get_construction_batch_model().objects.filter(job=job).update(status='queued')
+
+        self.assertEqual(self.tge.claim_construction_batches('worker', 10), [])
+
+    def test_retry_commits_version(self):
+        self.fail_job()
+
+        retry = self.tge.enqueue_construction_job('tg', 'w', 1, self.edges, commit=True, job_batch_size=1)
+
+        batch_ids = self.tge.claim_construction_batches('worker', 10)
+
+        self.assertEqual(sorted(batch_ids), sorted(retry.batches.values_list('pk', flat=True)))
+        self.assertEqual(self.run_batches(batch_ids), [True, True])
+
+        graph_version = self.graph_version()
+
+        self.assertTrue(graph_version.committed)
+        self.assertIsNotNone(graph_version.committed_at)
+        self.assertEqual(self.tge.get_edge_weights('tg', 'w', [('a', 'b'), ('a', 'c')]), [0.5, 0.4])
+
+    def test_version_waits_for_every_live_job(self):
+        self.fail_job()
+
+        self.tge.enqueue_construction_job('tg', 'w', 1, self.edges[:1], commit=True)
+        self.tge.enqueue_construction_job('tg', 'w', 1, self.edges[1:])
+
+        self.run_batches(self.tge.claim_construction_batches('worker', 1))
+
+        self.assertFalse(self.graph_version().committed)
+
+        self.run_batches(self.tge.claim_construction_batches('worker', 1))
+
+        self.assertTrue(self.graph_version().committed)
@@ -0,0 +1,148 @@
+import bisect
+import threading
+import time
+
+from temporal_graph.instrumentation import timed
+
+
+def unix_timestamp(dt):
+    """
+    Converts a committed_at datetime to the Unix timestamp it is stored as (see UnixDateTimeField)
+
+    :param dt: [datetime]
+    :return: [Int]
+    """
+    return int(time.mktime(dt.timetuple()))
+
+
+class VersionTimeline():
+    """
+    Committed versions of a single temporal graph, sorted by committed_at
+
+    """
+
+    def __init__(self):
+        self.committed_ats = []
+        self.versions      = []
+        self.version_pks   = set()
+
+        # every version committed at or before synced_until is in the timeline
+        self.synced_until  = None
+
+        self.lock          = threading.Lock()
+
+    def add(self, graph_version):
+        if graph_version.pk in self.version_pks:
+            return
+
+        committed_at = unix_timestamp(graph_version.committed_at)
+
+        # versions committed in the same second are ordered by insertion
+        index = bisect.bisect_right(self.committed_ats, committed_at)
+
+        self.committed_ats.insert(index, committed_at)
+        self.versions.insert(index, graph_version)
+        self.version_pks.add(graph_version.pk)
+
+    def latest_at(self, timestamp):
+        index = bisect.bisect_right(self.committed_ats, timestamp)
+
+        return self.versions[index - 1] if index else None
+
+    @property
+    def last_committed_at(self):
+        return self.committed_ats[-1] if self.committed_ats else None
+
+
+class VersionIndex():
+    """
+    In-memory index resolving (temporal_graph_id, timestamp) to the version committed at that point in time.
+
+    Versions are append-only, so each temporal graph's timeline is loaded once and then refreshed incrementally:
+    only versions committed since the last known commit are read, and only when a timestamp past the synced
+    part of the timeline is requested. Versions committed by this process are added as they commit.
+
+    grace covers commits whose committed_at was set shortly before the row was saved by another process
+
+    """
+
+    def __init__(self, graph_version_model, grace = 5, clock = time.time):
+        self.graph_version_model = graph_version_model
+        self.grace               = grace
+        self.clock               = clock
+
+        self._timelines = {}
+        self._lock      = threading.Lock()
+
+        self.refreshes  = 0
+
+    def get_timeline(self, temporal_graph_id):
+        timeline = self._timelines.get(temporal_graph_id)
+
+        if timeline is None:
+            with self._lock:
+                timeline = self._timelines.setdefault(temporal_graph_id, VersionTimeline())
+
+        return timeline
+
+    def resolve(self, temporal_graph_id, timestamp):
+        """
+        Retrieves the latest version of temporal_graph_id committed at or before timestamp
+
+        :param temporal_graph_id: [String]
+        :param timestamp: [Int] Unix epoch
+        :return: [GraphVersion] or None if no version was committed by then
+        """
+        timeline = self.get_timeline(temporal_graph_id)
+
+        with timeline.lock:
+            if timeline.synced_until is None or timestamp > timeline.synced_until:
+                self.refresh(temporal_graph_id, timeline)
+
+            return timeline.latest_at(timestamp)
+
+    def refresh(self, temporal_graph_id, timeline):
+        """
+        Reads versions committed since the last version in timeline. Caller must hold timeline.lock
+
+        :param temporal_graph_id: [String]
+        :param timeline: [VersionTimeline]
+        :return:
+        """
+        synced_until = int(self.clock()) - self.grace
+
+        filters = { 'temporal_graph_id': temporal_graph_id, 'committed': True }
+
+        if timeline.last_committed_at is not None:
+            filters['committed_at__gte'] = timeline.last_committed_at
+
+        with timed('db_query'):
+            graph_versions = list(self.graph_version_model.objects.filter(**filters).order_by('committed_at', 'id'))
+
+        for graph_version in graph_versions:
+            timeline.add(graph_version)
+
+        timeline.synced_until = synced_until
+
+        self.refreshes += 1
+
+    def add(self, graph_version):
+        """
+        Records a version committed by this process
+
+        :param graph_version: [GraphVersion] committed version
+        :return:
+        """
+        timeline = self.get_timeline(graph_version.temporal_graph_id)
+
+        with timeline.lock:
+            # an unloaded timeline picks the version up on its first full load
+            if timeline.synced_until is not None:
+                timeline.add(graph_version)
+
+    def stats(self):
+        return {
+            'temporal_graphs': len(self._timelines),
+            'versions':        sum(len(timeline.versions) for timeline in list(self._timelines.values())),
+            'refreshes':       self.refreshes,
+        }
@@ -0,0 +1,158 @@
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from time_series_client.models.graph_version import GraphVersion
+from time_series_client.models.user_edge_weight import UserEdgeWeight
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Seeds graph versions and user-edge weights, then reports query plans and latency of the hot ' \
+           'GraphVersion and UserEdgeWeight lookups. Seeded rows are rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--temporal-graphs', type=int, default=10)
+        parser.add_argument('--versions', type=int, default=50)
+        parser.add_argument('--user-edges', type=int, default=1000000)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--vertices', type=int, default=10000)
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+
+        try:
+            with transaction.atomic():
+                graph_versions = self.seed_graph_versions(options['temporal_graphs'], options['versions'])
+                self.seed_user_edge_weights(graph_versions, options)
+
+                results = {
+                    'vendor':  connection.vendor,
+                    'queries': [self.measure(name, queryset, options['queries'])
+                                for name, queryset in self.hot_queries(graph_versions, options)],
+                }
+
+                raise Rollback()
+        except Rollback:
+            pass
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def seed_graph_versions(self, num_temporal_graphs, num_versions):
+        start = datetime.now() - timedelta(days=num_versions)
+
+        GraphVersion.objects.bulk_create([
+            GraphVersion(temporal_graph_id=f'bench_{g}',
+                         version_id=v,
+                         committed=True,
+                         committed_at=start + timedelta(days=v))
+            for g in range(num_temporal_graphs) for v in range(num_versions)
+        ])
+
+        return list(GraphVersion.objects.filter(temporal_graph_id__startswith='bench_'))
+
+    def seed_user_edge_weights(self, graph_versions, options):
+        rows    = []
+        now     = datetime.now()
+        created = 0
+
+        for _ in range(options['user_edges']):
+            rows.append(UserEdgeWeight(graph_version=self.random.choice(graph_versions),
+                                       user_id=self.random.randrange(options['users']),
+                                       source_vertex_id=f'v{self.random.randrange(options["vertices"])}',
+                                       target_vertex_id=f'v{self.random.randrange(options["vertices"])}',
+                                       weight_id='bench',
+                                       weight=self.random.random(),
+                                       committed_at=now))
+
+            if len(rows) == options['batch_size']:
+                created += self.bulk_create_ignoring_duplicates(rows)
+                rows     = []
+
+        created += self.bulk_create_ignoring_duplicates(rows)
+
+        self.stderr.write(f'Seeded {len(graph_versions)} graph versions and {created} user-edge weights')
+
+    def bulk_create_ignoring_duplicates(self, rows):
+        # random rows may repeat a (graph_version, user, edge, weight_id) combination
+        unique_rows = {(row.graph_version_id, row.user_id, row.source_vertex_id, row.target_vertex_id): row
+                       for row in rows}
+
+        try:
+            with transaction.atomic():
+                UserEdgeWeight.objects.bulk_create(unique_rows.values())
+
+            return len(unique_rows)
+        except Exception:
+            created = 0
+
+            for row in unique_rows.values():
+                try:
+                    with transaction.atomic():
+                        row.save()
+                    created += 1
+                except Exception:
+                    pass
+
+            return created
+
+    def hot_queries(self, graph_versions, options):
+        graph_version = self.random.choice(graph_versions)
+        committed_at  = int(time.mktime(graph_version.committed_at.timetuple()))
+
+        yield 'latest_graph_version', GraphVersion.objects.filter(
+            temporal_graph_id=graph_version.temporal_graph_id,
+            committed=True
+        ).order_by('-committed_at')[:1]
+
+        yield 'graph_version_at_timestamp', GraphVersion.objects.filter(
+            temporal_graph_id=graph_version.temporal_graph_id,
+            committed_at__lte=committed_at,
+            committed=True
+        ).order_by('-committed_at')[:1]
+
+        user_edge_weight = UserEdgeWeight.objects.filter(weight_id='bench').first()
+
+        if user_edge_weight:
+            yield 'user_edge_weight', UserEdgeWeight.objects.filter(
+                user_id=user_edge_weight.user_id,
+                source_vertex_id=user_edge_weight.source_vertex_id,
+                target_vertex_id=user_edge_weight.target_vertex_id,
+                weight_id=user_edge_weight.weight_id,
+                graph_version_id=user_edge_weight.graph_version_id
+            ).order_by('-committed_at')[:1]
+
+    def measure(self, name, queryset, num_queries):
+        sql, params = queryset.query.sql_with_params()
+
+        explain = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+
+        with connection.cursor() as cursor:
+            cursor.execute(explain + sql, params)
+            plan = [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+
+        latencies = []
+
+        for _ in range(num_queries):
+            start = time.perf_counter()
+            list(queryset.all())
+            latencies.append(time.perf_counter() - start)
+
+        latencies.sort()
+
+        return {
+            'query':  name,
+            'plan':   plan,
+            'p50_ms': latencies[len(latencies) // 2] * 1000,
+            'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        }
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-18 20:14
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_series_client', '0008_auto_20171030_0124'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='graphversion',
+            index=models.Index(fields=['temporal_graph_id', 'committed', 'committed_at'], name='graph_version_committed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useredgeweight',
+            index=models.Index(fields=['graph_version', 'user_id', 'source_vertex_id', 'target_vertex_id', 'weight_id', 'committed_at'], name='user_edge_weight_lookup_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-18 20:19
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_series_client', '0009_auto_20261018_2014'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='graphversion',
+            name='delta_depth',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='graphversion',
+            name='parent',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='time_series_client.GraphVersion'),
+        ),
+        migrations.AddField(
+            model_name='graphversion',
+            name='snapshot',
+            field=models.BooleanField(default=False),
+        ),
+    ]
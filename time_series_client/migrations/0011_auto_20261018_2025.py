@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-18 20:25
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import django_unixdatetimefield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_series_client', '0010_auto_20261018_2019'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionProgress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', django_unixdatetimefield.fields.UnixDateTimeField(default=django.utils.timezone.now)),
+                ('committed_at', django_unixdatetimefield.fields.UnixDateTimeField(null=True)),
+                ('weight_id', models.CharField(max_length=64)),
+                ('ingested_records', models.BigIntegerField(default=0)),
+                ('graph_version', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingestion_progress', to='time_series_client.GraphVersion')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='ingestionprogress',
+            unique_together=set([('graph_version', 'weight_id')]),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-18 20:38
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import django_unixdatetimefield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_series_client', '0011_auto_20261018_2025'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConstructionBatch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField()),
+                ('payload', models.TextField()),
+                ('num_edges', models.IntegerField()),
+                ('status', models.CharField(choices=[('queued', 'queued'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')], default='queued', max_length=16)),
+                ('error', models.TextField(null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('worker', models.CharField(max_length=64, null=True)),
+                ('started_at', django_unixdatetimefield.fields.UnixDateTimeField(null=True)),
+                ('duration', models.FloatField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ConstructionJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', django_unixdatetimefield.fields.UnixDateTimeField(default=django.utils.timezone.now)),
+                ('committed_at', django_unixdatetimefield.fields.UnixDateTimeField(null=True)),
+                ('weight_id', models.CharField(max_length=64)),
+                ('commit', models.BooleanField(default=False)),
+                ('batch_size', models.IntegerField(null=True)),
+                ('status', models.CharField(choices=[('queued', 'queued'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')], default='queued', max_length=16)),
+                ('error', models.TextField(null=True)),
+                ('num_batches', models.IntegerField(default=0)),
+                ('batches_done', models.IntegerField(default=0)),
+                ('num_edges', models.BigIntegerField(default=0)),
+                ('edges_done', models.BigIntegerField(default=0)),
+                ('started_at', django_unixdatetimefield.fields.UnixDateTimeField(null=True)),
+                ('graph_version', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='construction_jobs', to='time_series_client.GraphVersion')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='constructionbatch',
+            name='job',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batches', to='time_series_client.ConstructionJob'),
+        ),
+        migrations.AddIndex(
+            model_name='constructionbatch',
+            index=models.Index(fields=['status', 'job', 'index'], name='construction_batch_claim_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='constructionbatch',
+            unique_together=set([('job', 'index')]),
+        ),
+    ]
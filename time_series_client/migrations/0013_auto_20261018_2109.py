@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-18 21:09
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_series_client', '0012_auto_20261018_2038'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='useredgeweight',
+            name='user_edge_weight_lookup_idx',
+        ),
+    ]
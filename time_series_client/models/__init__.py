@@ -1,2 +1,5 @@
 from time_series_client.models.graph_version import GraphVersion
-from time_series_client.models.user_edge_weight import UserEdgeWeight
\ No newline at end of file
+from time_series_client.models.user_edge_weight import UserEdgeWeight
+from time_series_client.models.ingestion_progress import IngestionProgress
+from time_series_client.models.construction_job import ConstructionJob
+from time_series_client.models.construction_batch import ConstructionBatch
\ No newline at end of file
@@ -0,0 +1,47 @@
+from time_series_client.models.construction_job import ConstructionJob
+
+from time_series_client.models.managers.core_manager import CoreManager
+
+from django.db import models
+from django_unixdatetimefield import UnixDateTimeField
+
+
+class ConstructionBatch(models.Model):
+    """
+    A batch of the payload of a ConstructionJob. A worker claims a queued batch by setting its status to running
+    and its worker token, writes its edges and records how long the write took.
+    A failed batch is queued again until it was attempted CONSTRUCTION_JOB_MAX_ATTEMPTS times
+
+    """
+    objects = CoreManager()
+
+    job         = models.ForeignKey(ConstructionJob, null=False, on_delete=models.CASCADE, related_name='batches')
+    index       = models.IntegerField(null=False)
+
+    # JSON list of vertex-edge pairs, as posted
+    payload     = models.TextField(null=False)
+    num_edges   = models.IntegerField(null=False)
+
+    status      = models.CharField(max_length=16, choices=ConstructionJob.STATUSES, default=ConstructionJob.QUEUED)
+    error       = models.TextField(null=True)
+
+    attempts    = models.IntegerField(default=0)
+    worker      = models.CharField(max_length=64, null=True)
+
+    started_at  = UnixDateTimeField(null=True)
+
+    # seconds spent writing the batch to the graph backend
+    duration    = models.FloatField(null=True)
+
+    class Meta:
+        unique_together = ('job', 'index')
+
+        indexes = [
+            # queued batches in claim order
+            models.Index(fields=['status', 'job', 'index'], name='construction_batch_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f'Construction batch [{self.index}] of job [{self.job_id}] | ' \
+               f'status [{self.status}] |' \
+               f'edges [{self.num_edges}]'
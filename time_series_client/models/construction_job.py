@@ -0,0 +1,50 @@
+from time_series_client.models.timestamp_model import TimestampModel
+from time_series_client.models.graph_version import GraphVersion
+
+from time_series_client.models.managers.core_manager import CoreManager
+
+from django.db import models
+from django_unixdatetimefield import UnixDateTimeField
+
+
+class ConstructionJob(TimestampModel):
+    """
+    Asynchronous construction of a weight of an uncommitted graph version. The payload is queued as
+    ConstructionBatches that workers write to the graph backend. committed_at is set when the last batch landed
+
+    """
+    objects = CoreManager()
+
+    QUEUED  = 'queued'
+    RUNNING = 'running'
+    DONE    = 'done'
+    FAILED  = 'failed'
+
+    STATUSES = ((QUEUED, QUEUED), (RUNNING, RUNNING), (DONE, DONE), (FAILED, FAILED))
+
+    graph_version = models.ForeignKey(GraphVersion, null=False, on_delete=models.CASCADE,
+                                      related_name='construction_jobs')
+    weight_id     = models.CharField(max_length=64, null=False)
+
+    # commit the version once every batch of every job of the version landed
+    commit        = models.BooleanField(default=False)
+
+    # edges written per backend statement, the GraphClient's default if null
+    batch_size    = models.IntegerField(null=True)
+
+    status        = models.CharField(max_length=16, choices=STATUSES, default=QUEUED)
+    error         = models.TextField(null=True)
+
+    num_batches   = models.IntegerField(default=0)
+    batches_done  = models.IntegerField(default=0)
+
+    num_edges     = models.BigIntegerField(default=0)
+    edges_done    = models.BigIntegerField(default=0)
+
+    started_at    = UnixDateTimeField(null=True)
+
+    def __str__(self):
+        return f'Construction job [{self.pk}] of graph version [{self.graph_version_id}] | ' \
+               f'weight_id [{self.weight_id}] |' \
+               f'status [{self.status}] |' \
+               f'batches [{self.batches_done}/{self.num_batches}]'
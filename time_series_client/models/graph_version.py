@@ -17,9 +17,22 @@ class GraphVersion(TimestampModel):
 
     committed         = models.BooleanField(default=False)
 
+    # A version with a parent is a delta: its graph only holds edges changed or removed since the parent,
+    # every other edge is read from the parent chain. A snapshot holds every edge of the version
+    parent            = models.ForeignKey('self', null=True, on_delete=models.PROTECT, related_name='children')
+    snapshot          = models.BooleanField(default=False)
+
+    # number of deltas between this version and the nearest snapshot, 0 for snapshots
+    delta_depth       = models.IntegerField(default=0)
+
     class Meta:
         unique_together = ('temporal_graph_id', 'version_id')
 
+        indexes = [
+            # latest committed version of a temporal graph, optionally as of a committed_at timestamp
+            models.Index(fields=['temporal_graph_id', 'committed', 'committed_at'], name='graph_version_committed_idx'),
+        ]
+
     @property
     def graph_uuid(self):
         """
@@ -29,6 +42,10 @@ class GraphVersion(TimestampModel):
         """
         return f'{self.temporal_graph_id}_v{self.version_id}'
 
+    @property
+    def is_delta(self):
+        return self.parent_id is not None and not self.snapshot
+
     def commit_version(self):
         self.committed_at = datetime.now()
         self.committed    = True
@@ -39,6 +56,7 @@ class GraphVersion(TimestampModel):
         return f'Graph temporal_graph_id [{self.temporal_graph_id}] | ' \
                f'version_id [{self.version_id}] |' \
                f'created at [{self.created_at}] |' \
-               f'committed at [{self.committed_at}]'
+               f'committed at [{self.committed_at}] |' \
+               f'parent [{self.parent_id}]'
 
 
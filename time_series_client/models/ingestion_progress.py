@@ -0,0 +1,30 @@
+from time_series_client.models.timestamp_model import TimestampModel
+from time_series_client.models.graph_version import GraphVersion
+
+from time_series_client.models.managers.core_manager import CoreManager
+
+from django.db import models
+
+
+class IngestionProgress(TimestampModel):
+    """
+    Progress of a streamed upload of a weight of an uncommitted graph version.
+    ingested_records is the resume token: the number of leading records of the stream durably written.
+    committed_at is set when the last batch was written
+
+    """
+    objects = CoreManager()
+
+    graph_version    = models.ForeignKey(GraphVersion, null=False, on_delete=models.CASCADE,
+                                         related_name='ingestion_progress')
+    weight_id        = models.CharField(max_length=64, null=False)
+
+    ingested_records = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('graph_version', 'weight_id')
+
+    def __str__(self):
+        return f'Ingestion of graph version [{self.graph_version_id}] | ' \
+               f'weight_id [{self.weight_id}] |' \
+               f'ingested records [{self.ingested_records}]'
@@ -33,4 +33,5 @@ class UserEdgeWeight(TimestampModel):
 
 
     class Meta:
+        # the unique index also serves user-edge weight lookups, see TemporalGraphEngine#get_user_edge_weight
         unique_together = ('graph_version', 'user_id', 'source_vertex_id', 'target_vertex_id', 'weight_id')